@@ -8,6 +8,8 @@ from sqlalchemy.orm import declarative_base
 from sqlalchemy import text  # ← IMPORTANTE: Importar text
 from typing import AsyncGenerator
 from .settings import settings
+from .esquema import aplicar_esquema
+from .instrumentacion import instrumentar_engine, PoolMedido
 
 # URL de conexión asíncrona a MySQL
 DATABASE_URL = f"mysql+aiomysql://{settings.DATABASE_USER}:{settings.DATABASE_PASSWORD}@{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
@@ -17,9 +19,14 @@ engine = create_async_engine(
     DATABASE_URL,
     echo=False,  # Cambiado a False para no ver tanto log
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=3600,
+    poolclass=PoolMedido  # QueuePool asíncrono + tiempo de espera por conexión (/metrics)
 )
 
+# Tiempos, filas y consultas lentas por sentencia (ver /admin/consultas)
+if settings.SQL_INSTRUMENTACION:
+    instrumentar_engine(engine.sync_engine)
+
 # Session maker asíncrono
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -51,6 +58,8 @@ async def init_db():
         async with engine.begin() as conn:
             # Verificar conexión - USAR text()
             await conn.execute(text("SELECT 1"))
+            # Columnas, índices y tablas auxiliares de los servicios
+            await aplicar_esquema(conn)
         print(" Conexión a MySQL establecida exitosamente")
     except Exception as e:
         print(f" Error al conectar con MySQL: {e}")
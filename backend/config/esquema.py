@@ -0,0 +1,221 @@
+"""
+Mantenimiento del esquema de la base de datos
+Agrega de forma idempotente las columnas, índices y tablas auxiliares
+que usan los servicios y que no forman parte del modelo original
+"""
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+
+async def tabla_existe(conn: Union[AsyncConnection, AsyncSession], tabla: str) -> bool:
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = :t
+    """)
+    result = await conn.execute(query, {"t": tabla})
+    return int(result.scalar() or 0) > 0
+
+
+async def columna_existe(conn: Union[AsyncConnection, AsyncSession], tabla: str, columna: str) -> bool:
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = :t AND column_name = :c
+    """)
+    result = await conn.execute(query, {"t": tabla, "c": columna})
+    return int(result.scalar() or 0) > 0
+
+
+async def columna_admite_nulos(conn: Union[AsyncConnection, AsyncSession], tabla: str, columna: str) -> bool:
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = :t AND column_name = :c
+          AND is_nullable = 'YES'
+    """)
+    result = await conn.execute(query, {"t": tabla, "c": columna})
+    return int(result.scalar() or 0) > 0
+
+
+async def indice_existe(conn: Union[AsyncConnection, AsyncSession], tabla: str, indice: str) -> bool:
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = :t AND index_name = :i
+    """)
+    result = await conn.execute(query, {"t": tabla, "i": indice})
+    return int(result.scalar() or 0) > 0
+
+
+# ========================================
+# CELDAS ESPACIALES
+# ========================================
+async def _aplicar_celdas_espaciales(conn: AsyncConnection):
+    """Celda de grilla en reportes_delictivos y mapeo avenida -> celdas"""
+    if not await tabla_existe(conn, "reportes_delictivos"):
+        return
+
+    if not await columna_existe(conn, "reportes_delictivos", "celda_lat"):
+        await conn.execute(text("""
+            ALTER TABLE reportes_delictivos
+            ADD COLUMN celda_lat INT NULL,
+            ADD COLUMN celda_lon INT NULL
+        """))
+
+    if not await indice_existe(conn, "reportes_delictivos", "idx_reportes_celda"):
+        await conn.execute(text("""
+            CREATE INDEX idx_reportes_celda
+            ON reportes_delictivos (celda_lat, celda_lon)
+        """))
+
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS avenida_celdas (
+            avenida_id INT NOT NULL,
+            celda_lat INT NOT NULL,
+            celda_lon INT NOT NULL,
+            PRIMARY KEY (avenida_id, celda_lat, celda_lon),
+            KEY idx_avenida_celdas_celda (celda_lat, celda_lon),
+            FOREIGN KEY (avenida_id) REFERENCES avenidas(id) ON DELETE CASCADE
+        )
+    """))
+
+
+# ========================================
+# ÍNDICE DE SEGURIDAD MATERIALIZADO
+# ========================================
+async def _aplicar_indice_seguridad(conn: AsyncConnection):
+    """Totales e índice de seguridad precalculados por avenida"""
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS indice_seguridad_avenida (
+            avenida_id INT PRIMARY KEY,
+            total_siniestros INT NOT NULL DEFAULT 0,
+            total_fallecidos INT NOT NULL DEFAULT 0,
+            total_heridos INT NOT NULL DEFAULT 0,
+            total_delitos INT NOT NULL DEFAULT 0,
+            indice_peligrosidad DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            nivel_seguridad VARCHAR(20) NOT NULL DEFAULT 'Muy Segura',
+            ultima_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            KEY idx_indice_peligrosidad (indice_peligrosidad),
+            FOREIGN KEY (avenida_id) REFERENCES avenidas(id) ON DELETE CASCADE
+        )
+    """))
+
+
+# ========================================
+# ÍNDICES DE PAGINACIÓN POR CURSOR
+# ========================================
+async def _aplicar_indices_paginacion(conn: AsyncConnection):
+    """Índices compuestos que coinciden con el ORDER BY de los listados"""
+    if not await indice_existe(conn, "siniestros", "idx_siniestros_fecha_hora_id"):
+        await conn.execute(text("""
+            CREATE INDEX idx_siniestros_fecha_hora_id
+            ON siniestros (fecha, hora, id)
+        """))
+
+    if not await tabla_existe(conn, "reportes_delictivos"):
+        return
+
+    # Reconstruye la tabla: no se hace al iniciar, solo se avisa
+    if await columna_admite_nulos(conn, "reportes_delictivos", "fecha_registro"):
+        logger.warning(
+            "reportes_delictivos.fecha_registro admite NULL; ver "
+            "database/migraciones/001_reportes_fecha_registro_not_null.sql"
+        )
+
+    if not await indice_existe(conn, "reportes_delictivos", "idx_reportes_fecha_registro_id"):
+        await conn.execute(text("""
+            CREATE INDEX idx_reportes_fecha_registro_id
+            ON reportes_delictivos (fecha_reporte, fecha_registro, id)
+        """))
+
+
+# ========================================
+# RESUMEN TEMPORAL DE SINIESTROS
+# ========================================
+async def _aplicar_resumen_temporal(conn: AsyncConnection):
+    """Franjas fecha × hora × avenida × tipo para los reportes temporales"""
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS resumen_siniestros_hora (
+            fecha DATE NOT NULL,
+            hora TINYINT NOT NULL,
+            avenida_id INT NOT NULL,
+            tipo_id INT NOT NULL,
+            anio SMALLINT NULL,
+            mes TINYINT NULL,
+            dia_semana TINYINT NULL,
+            cantidad INT NOT NULL DEFAULT 0,
+            fallecidos INT NOT NULL DEFAULT 0,
+            heridos INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (fecha, hora, avenida_id, tipo_id),
+            KEY idx_resumen_anio_mes (anio, mes),
+            KEY idx_resumen_dia_semana (dia_semana),
+            KEY idx_resumen_hora (hora)
+        )
+    """))
+
+
+async def _aplicar_resumen_diario(conn: AsyncConnection):
+    """Siniestros y delitos por día y avenida para el índice por período"""
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS resumen_avenida_dia (
+            fecha DATE NOT NULL,
+            avenida_id INT NOT NULL,
+            siniestros INT NOT NULL DEFAULT 0,
+            fallecidos INT NOT NULL DEFAULT 0,
+            heridos INT NOT NULL DEFAULT 0,
+            delitos INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (fecha, avenida_id)
+        )
+    """))
+
+
+# ========================================
+# MAPA DE CALOR DE DELITOS
+# ========================================
+async def _aplicar_heatmap(conn: AsyncConnection):
+    """Cantidad y peso de reportes por zoom, tile y celda del tile"""
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS heatmap_delitos (
+            zoom TINYINT NOT NULL,
+            tile_x INT NOT NULL,
+            tile_y INT NOT NULL,
+            bin_x TINYINT NOT NULL,
+            bin_y TINYINT NOT NULL,
+            cantidad INT NOT NULL DEFAULT 0,
+            peso INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (zoom, tile_x, tile_y, bin_x, bin_y)
+        )
+    """))
+
+
+# ========================================
+# RED VIAL (TRAMOS DE AVENIDA)
+# ========================================
+async def _aplicar_red_vial(conn: AsyncConnection):
+    """Tramos rectos de cada avenida; los extremos iguales son intersecciones"""
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS tramos_avenida (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            avenida_id INT NOT NULL,
+            lat_origen DECIMAL(10, 6) NOT NULL,
+            lon_origen DECIMAL(10, 6) NOT NULL,
+            lat_destino DECIMAL(10, 6) NOT NULL,
+            lon_destino DECIMAL(10, 6) NOT NULL,
+            doble_mano BOOLEAN NOT NULL DEFAULT TRUE,
+            KEY idx_tramos_avenida (avenida_id),
+            FOREIGN KEY (avenida_id) REFERENCES avenidas(id) ON DELETE CASCADE
+        )
+    """))
+
+
+async def aplicar_esquema(conn: AsyncConnection):
+    """Aplica todos los cambios de esquema pendientes (idempotente)"""
+    await _aplicar_celdas_espaciales(conn)
+    await _aplicar_indice_seguridad(conn)
+    await _aplicar_indices_paginacion(conn)
+    await _aplicar_resumen_temporal(conn)
+    await _aplicar_resumen_diario(conn)
+    await _aplicar_heatmap(conn)
+    await _aplicar_red_vial(conn)
@@ -0,0 +1,261 @@
+"""
+Instrumentación de las consultas SQL del engine
+Los hooks before/after_cursor_execute miden cada sentencia y la agrupan por
+sitio de llamada (la función de services/, routers/ o config/ que la ejecutó)
+y texto normalizado. Por cada grupo se acumulan: cantidad, tiempo total y
+máximo, histograma de duración y filas afectadas.
+Las sentencias que superan SQL_LENTA_UMBRAL_MS se registran en el log
+"sql.lenta" con los parámetros reemplazados por su tipo.
+"""
+
+import bisect
+import logging
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .settings import settings
+
+# Límite superior (inclusive) de cada bucket; el último bucket es +Inf
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+BUCKETS_FILAS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# Módulos cuyas funciones cuentan como sitio de llamada
+MODULOS_SITIO = ("services.", "routers.", "config.")
+
+# Caracteres del SQL normalizado que forman la clave (las sentencias
+# multi-fila solo difieren al final)
+LARGO_CLAVE_SQL = 200
+
+SITIO_DESCONOCIDO = "(desconocido)"
+CLAVE_OTRAS = ("(otras)", "(otras)")
+
+logger_lentas = logging.getLogger("sql.lenta")
+logger = logging.getLogger(__name__)
+
+_espacios = re.compile(r"\s+")
+_lista_marcadores = re.compile(r"%s(?:\s*,\s*%s)+")
+_filas_valores = re.compile(r"\(%s, \.\.\.\)(?:\s*,\s*\(%s, \.\.\.\))+")
+
+
+def normalizar_sql(sql: str) -> str:
+    """Colapsa espacios y listas de marcadores (IN, VALUES multi-fila) y recorta"""
+    sql = _espacios.sub(" ", sql).strip()
+    sql = _lista_marcadores.sub("%s, ...", sql)
+    sql = _filas_valores.sub("(%s, ...), ...", sql)
+    return sql[:LARGO_CLAVE_SQL]
+
+
+def redactar_parametros(parametros) -> object:
+    """Reemplaza cada valor por el nombre de su tipo (no se loguean datos)"""
+    if isinstance(parametros, dict):
+        return {k: type(v).__name__ for k, v in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        if parametros and isinstance(parametros[0], (list, tuple, dict)):
+            # executemany: solo la cantidad de filas y la forma de la primera
+            return {"filas": len(parametros), "primera": redactar_parametros(parametros[0])}
+        return [type(v).__name__ for v in parametros]
+    return type(parametros).__name__
+
+
+def _buscar_sitio(frame) -> Optional[str]:
+    while frame is not None:
+        modulo = frame.f_globals.get("__name__", "")
+        if modulo != __name__ and modulo.startswith(MODULOS_SITIO):
+            codigo = frame.f_code
+            # co_qualname existe desde Python 3.11
+            return f"{modulo}.{getattr(codigo, 'co_qualname', codigo.co_name)}"
+        frame = frame.f_back
+    return None
+
+
+def sitio_llamada() -> str:
+    """
+    Función de services/routers/config que ejecutó la sentencia.
+    Con el engine asíncrono los hooks corren en un greenlet hijo cuya pila no
+    incluye a los servicios: se sigue por la pila del greenlet padre, que está
+    detenido en el await de la consulta.
+    """
+    sitio = _buscar_sitio(sys._getframe())
+    if sitio is None:
+        padre = getcurrent().parent
+        if padre is not None:
+            sitio = _buscar_sitio(padre.gr_frame)
+    return sitio or SITIO_DESCONOCIDO
+
+
+def _filas_de(cursor) -> Optional[int]:
+    filas = getattr(cursor, "rowcount", -1)
+    # Los cursores de streaming no conocen la cantidad (-1 o 2**64 - 1)
+    if filas is None or filas < 0 or filas >= 2 ** 63:
+        return None
+    return filas
+
+
+class EstadisticaConsulta:
+    """Acumulados de una sentencia en un sitio de llamada"""
+
+    def __init__(self, sitio: str, sql: str):
+        self.sitio = sitio
+        self.sql = sql
+        self.cantidad = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.lentas = 0
+        self.filas = 0
+        self.max_filas = 0
+        self.histograma_ms = [0] * (len(BUCKETS_MS) + 1)
+        self.histograma_filas = [0] * (len(BUCKETS_FILAS) + 1)
+
+    def registrar(self, ms: float, filas: Optional[int], lenta: bool):
+        self.cantidad += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.lentas += lenta
+        self.histograma_ms[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        if filas is not None:
+            self.filas += filas
+            self.max_filas = max(self.max_filas, filas)
+            self.histograma_filas[bisect.bisect_left(BUCKETS_FILAS, filas)] += 1
+
+    def como_dict(self) -> dict:
+        return {
+            "sitio": self.sitio,
+            "sql": self.sql,
+            "cantidad": self.cantidad,
+            "total_ms": round(self.total_ms, 3),
+            "promedio_ms": round(self.total_ms / self.cantidad, 3) if self.cantidad else 0,
+            "max_ms": round(self.max_ms, 3),
+            "lentas": self.lentas,
+            "filas": self.filas,
+            "max_filas": self.max_filas,
+            "histograma_ms": _histograma(BUCKETS_MS, self.histograma_ms),
+            "histograma_filas": _histograma(BUCKETS_FILAS, self.histograma_filas),
+        }
+
+
+def _histograma(limites, cuentas) -> Dict[str, int]:
+    etiquetas = [str(l) for l in limites] + ["+Inf"]
+    return dict(zip(etiquetas, cuentas))
+
+
+class EstadisticasConsultas:
+    """Estadísticas por (sitio, sql), acotadas a max_consultas grupos"""
+
+    def __init__(self, max_consultas: int):
+        self.max_consultas = max_consultas
+        self.desde = time.time()
+        self._consultas: Dict[Tuple[str, str], EstadisticaConsulta] = {}
+
+    def registrar(self, sitio: str, sql: str, ms: float, filas: Optional[int], lenta: bool):
+        clave = (sitio, sql)
+        estadistica = self._consultas.get(clave)
+        if estadistica is None:
+            # Superado el máximo, las sentencias nuevas se acumulan juntas
+            if len(self._consultas) >= self.max_consultas:
+                clave = CLAVE_OTRAS
+            estadistica = self._consultas.get(clave)
+            if estadistica is None:
+                estadistica = self._consultas[clave] = EstadisticaConsulta(*clave)
+        estadistica.registrar(ms, filas, lenta)
+
+    def consultas(self) -> List[EstadisticaConsulta]:
+        return list(self._consultas.values())
+
+    def resumen(self, orden: str = "total_ms", limite: int = 50) -> dict:
+        """Grupos ordenados de mayor a menor según orden (un campo de como_dict)"""
+        filas = sorted(
+            (e.como_dict() for e in self._consultas.values()),
+            key=lambda e: e[orden],
+            reverse=True
+        )
+        return {
+            "desde": self.desde,
+            "umbral_lenta_ms": settings.SQL_LENTA_UMBRAL_MS,
+            "grupos": len(filas),
+            "sentencias": sum(e["cantidad"] for e in filas),
+            "total_ms": round(sum(e["total_ms"] for e in filas), 3),
+            "consultas": filas[:limite],
+        }
+
+    def reiniciar(self):
+        self._consultas.clear()
+        self.desde = time.time()
+
+
+estadisticas_consultas = EstadisticasConsultas(settings.SQL_ESTADISTICAS_MAX_CONSULTAS)
+
+
+def instrumentar_engine(engine: Engine):
+    """Registra los hooks de medición (para un AsyncEngine, pasar engine.sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._inicio_medicion = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        # Un error al medir nunca debe hacer fallar la consulta
+        try:
+            _registrar(cursor, statement, parameters, context)
+        except Exception:
+            logger.exception("Error en la instrumentación de consultas SQL")
+
+
+def _registrar(cursor, statement, parameters, context):
+    inicio = getattr(context, "_inicio_medicion", None)
+    if inicio is None:
+        return
+    ms = (time.perf_counter() - inicio) * 1000
+    filas = _filas_de(cursor)
+    sitio = sitio_llamada()
+    lenta = ms >= settings.SQL_LENTA_UMBRAL_MS
+    sql = normalizar_sql(statement)
+
+    estadisticas_consultas.registrar(sitio, sql, ms, filas, lenta)
+
+    if lenta:
+        logger_lentas.warning(
+            "Consulta lenta: %.1f ms, filas=%s, sitio=%s, sql=%s, parámetros=%s",
+            ms, filas, sitio, sql, redactar_parametros(parameters)
+        )
+
+
+# ========================================
+# ESPERA POR CONEXIONES DEL POOL
+# ========================================
+class EsperaPool:
+    """Tiempo que cada checkout esperó una conexión libre del pool"""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histograma_ms = [0] * (len(BUCKETS_MS) + 1)
+
+    def registrar(self, ms: float):
+        self.cantidad += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.histograma_ms[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+
+espera_pool = EsperaPool()
+
+
+class PoolMedido(AsyncAdaptedQueuePool):
+    """Pool del engine asíncrono que mide la espera de cada checkout"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera_pool.registrar((time.perf_counter() - inicio) * 1000)
@@ -26,6 +26,49 @@ class Settings(BaseSettings):
     API_VERSION: str = "1.0.0"
     API_DESCRIPTION: str = "Backend para el sistema de gestión de siniestros viales de La Rioja"
     
+    # Caché de reportes agregados
+    CACHE_REPORTES_TTL_SEGUNDOS: int = 300
+    CACHE_REPORTES_MAX_ENTRADAS: int = 256
+    
+    # Caché de tiles del mapa de calor (/reportes/heatmap/{z}/{x}/{y})
+    CACHE_TILES_TTL_SEGUNDOS: int = 300
+    CACHE_TILES_MAX_ENTRADAS: int = 2048
+    
+    # Caché de usuarios autenticados (el negativo cubre emails inexistentes o inactivos)
+    CACHE_USUARIOS_TTL_SEGUNDOS: int = 60
+    CACHE_USUARIOS_NEGATIVO_TTL_SEGUNDOS: int = 10
+    CACHE_USUARIOS_MAX_ENTRADAS: int = 1024
+    
+    # Pool de hash de passwords (bcrypt): hilos y pedidos en espera antes de responder 429
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_COLA: int = 32
+    
+    # Recarga periódica de los catálogos en memoria (avenidas, tipos de siniestro),
+    # para ver cambios hechos por otros procesos
+    CATALOGOS_TTL_SEGUNDOS: int = 300
+    
+    # Cada cuántos segundos se guarda usuarios.ultimo_acceso (escritura diferida)
+    ULTIMO_ACCESO_INTERVALO_SEGUNDOS: float = 5.0
+    
+    # Instrumentación de consultas SQL: umbral del log de consultas lentas y
+    # máximo de sentencias distintas con estadísticas propias
+    SQL_INSTRUMENTACION: bool = True
+    SQL_LENTA_UMBRAL_MS: float = 500.0
+    SQL_ESTADISTICAS_MAX_CONSULTAS: int = 500
+    
+    # Al iniciar se reconstruyen solo las tablas agregadas vacías; con True,
+    # todas (recorre siniestros y reportes_delictivos completas)
+    RECONSTRUIR_AGREGADOS_AL_INICIAR: bool = False
+    
+    # Pesos del índice de seguridad (services/motor_seguridad.py). Al cambiarlos,
+    # la tabla indice_seguridad_avenida se recalcula en el próximo inicio
+    INDICE_PESO_SINIESTROS: float = 3.0
+    INDICE_PESO_DELITOS: float = 2.0
+    INDICE_MULTIPLICADOR_FALLECIDOS: float = 1.5
+    
+    # Cada cuántos segundos se mide el retraso del event loop (/metrics)
+    METRICAS_LAG_INTERVALO_SEGUNDOS: float = 0.5
+    
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
     
@@ -0,0 +1,190 @@
+"""
+Benchmark del análisis de vehículos (GET /reportes/vehiculos)
+Compara la consulta anterior (subconsulta correlacionada por tipo de vehículo)
+con la actual (un JOIN y agregación condicional en una sola pasada) a medida
+que crece vehiculos_involucrados.
+
+Trabaja sobre tablas propias con datos sintéticos (bench_siniestros,
+bench_vehiculos) que se borran al terminar: no modifica las tablas reales.
+No son TEMPORARY porque MySQL no permite referenciar dos veces una tabla
+temporal en la misma consulta (la subconsulta correlacionada lo hace).
+
+Uso:
+    python benchmark_vehiculos.py
+    python benchmark_vehiculos.py --tamanos 100000 1000000 5000000 --repeticiones 5
+"""
+
+import argparse
+import random
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+from import_data import DB_CONFIG
+
+TAMANOS = [10_000, 100_000, 1_000_000]
+REPETICIONES = 3
+TAMANO_LOTE = 10_000
+
+# Vehículos por siniestro (en promedio)
+VEHICULOS_POR_SINIESTRO = 2
+
+TIPOS_VEHICULO = ['Auto', 'Moto', 'Camioneta', 'Camión', 'Colectivo', 'Bicicleta', 'Peatón', 'Otro']
+GRAVEDADES = ['baja', 'media', 'alta']
+
+SQL_CORRELACIONADA = """
+    SELECT
+        v.tipo_vehiculo,
+        COUNT(DISTINCT v.siniestro_id) AS siniestros_involucrados,
+        COUNT(*) AS total_vehiculos,
+        SUM(CASE WHEN v.es_fallecido = TRUE THEN 1 ELSE 0 END) AS fallecidos,
+        ROUND(SUM(CASE WHEN v.es_fallecido = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS tasa_mortalidad,
+        (
+            SELECT COUNT(*)
+            FROM bench_vehiculos v2
+            INNER JOIN bench_siniestros s2 ON v2.siniestro_id = s2.id
+            WHERE v2.tipo_vehiculo = v.tipo_vehiculo
+            AND s2.nivel_gravedad = 'alta'
+        ) AS siniestros_gravedad_alta
+    FROM bench_vehiculos v
+    GROUP BY v.tipo_vehiculo
+    ORDER BY fallecidos DESC, total_vehiculos DESC
+"""
+
+# Misma consulta que services/reportes.py::obtener_analisis_vehiculos
+SQL_UNA_PASADA = """
+    SELECT
+        v.tipo_vehiculo,
+        COUNT(DISTINCT v.siniestro_id) AS siniestros_involucrados,
+        COUNT(*) AS total_vehiculos,
+        SUM(CASE WHEN v.es_fallecido = TRUE THEN 1 ELSE 0 END) AS fallecidos,
+        ROUND(SUM(CASE WHEN v.es_fallecido = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS tasa_mortalidad,
+        SUM(CASE WHEN s.nivel_gravedad = 'alta' THEN 1 ELSE 0 END) AS siniestros_gravedad_alta
+    FROM bench_vehiculos v
+    LEFT JOIN bench_siniestros s ON s.id = v.siniestro_id
+    GROUP BY v.tipo_vehiculo
+    ORDER BY fallecidos DESC, total_vehiculos DESC
+"""
+
+
+def borrar_tablas(cursor):
+    cursor.execute("DROP TABLE IF EXISTS bench_vehiculos, bench_siniestros")
+
+
+def crear_tablas(cursor):
+    """Tablas con las columnas e índices que usan las consultas"""
+    borrar_tablas(cursor)
+    cursor.execute("""
+        CREATE TABLE bench_siniestros (
+            id INT PRIMARY KEY,
+            nivel_gravedad ENUM('baja', 'media', 'alta') NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE bench_vehiculos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            siniestro_id INT NOT NULL,
+            tipo_vehiculo VARCHAR(50),
+            es_fallecido BOOLEAN DEFAULT FALSE,
+            KEY idx_bench_siniestro (siniestro_id)
+        )
+    """)
+
+
+def completar_hasta(conn, cursor, cant_siniestros, cant_vehiculos, actuales):
+    """Inserta filas sintéticas hasta llegar a los tamaños pedidos"""
+    siniestros_actuales, vehiculos_actuales = actuales
+
+    for inicio in range(siniestros_actuales, cant_siniestros, TAMANO_LOTE):
+        fin = min(inicio + TAMANO_LOTE, cant_siniestros)
+        cursor.executemany(
+            "INSERT INTO bench_siniestros (id, nivel_gravedad) VALUES (%s, %s)",
+            [(i + 1, random.choices(GRAVEDADES, weights=[6, 3, 1])[0]) for i in range(inicio, fin)]
+        )
+        conn.commit()
+
+    for inicio in range(vehiculos_actuales, cant_vehiculos, TAMANO_LOTE):
+        fin = min(inicio + TAMANO_LOTE, cant_vehiculos)
+        cursor.executemany(
+            "INSERT INTO bench_vehiculos (siniestro_id, tipo_vehiculo, es_fallecido) VALUES (%s, %s, %s)",
+            [
+                (random.randint(1, cant_siniestros), random.choice(TIPOS_VEHICULO), random.random() < 0.02)
+                for _ in range(inicio, fin)
+            ]
+        )
+        conn.commit()
+
+    cursor.execute("ANALYZE TABLE bench_siniestros, bench_vehiculos")
+    cursor.fetchall()
+
+
+def medir(cursor, sql, repeticiones):
+    """Mejor tiempo (s) de varias ejecuciones y el resultado de la última"""
+    mejor = None
+    filas = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql)
+        filas = cursor.fetchall()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, filas
+
+
+def _por_tipo(filas):
+    """Filas ordenadas por tipo_vehiculo (NULL al final)"""
+    return sorted(filas, key=lambda f: (f[0] is None, f[0] or ''))
+
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark del análisis de vehículos")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS,
+                        help="filas de vehiculos_involucrados a medir (por defecto 10k, 100k y 1M)")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES,
+                        help=f"ejecuciones por consulta; se toma la mejor (por defecto {REPETICIONES})")
+    parser.add_argument('--semilla', type=int, default=42,
+                        help="semilla de los datos sintéticos")
+    return parser.parse_args()
+
+
+def main():
+    args = parsear_argumentos()
+    random.seed(args.semilla)
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"✗ Error al conectar: {e}")
+        return
+
+    cursor = conn.cursor()
+    try:
+        crear_tablas(cursor)
+
+        print(f"  {'vehículos':>10} {'correlacionada':>15} {'una pasada':>12} {'mejora':>8}")
+        print("-" * 50)
+
+        actuales = (0, 0)
+        for tamano in sorted(args.tamanos):
+            cant_siniestros = max(1, tamano // VEHICULOS_POR_SINIESTRO)
+            completar_hasta(conn, cursor, cant_siniestros, tamano, actuales)
+            actuales = (max(actuales[0], cant_siniestros), max(actuales[1], tamano))
+
+            t_correlacionada, filas_correlacionada = medir(cursor, SQL_CORRELACIONADA, args.repeticiones)
+            t_una_pasada, filas_una_pasada = medir(cursor, SQL_UNA_PASADA, args.repeticiones)
+
+            # Los empates en el ORDER BY pueden salir en distinto orden
+            if _por_tipo(filas_correlacionada) != _por_tipo(filas_una_pasada):
+                print(f"✗ Resultados distintos con {tamano} vehículos")
+
+            mejora = t_correlacionada / t_una_pasada if t_una_pasada > 0 else 0
+            print(f"  {tamano:>10,} {t_correlacionada:>13.3f} s {t_una_pasada:>10.3f} s {mejora:>7.1f}x")
+    finally:
+        borrar_tablas(cursor)
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
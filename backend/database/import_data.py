@@ -1,13 +1,42 @@
 """
 Script para importar datos de CSVs a la base de datos MySQL
 Sistema de Gestión de Siniestros Viales - CSVs con separador ;
+
+Carga masiva por lotes:
+- Limpieza vectorizada con pandas (sin recorrer fila por fila)
+- Inserción con executemany (INSERT multi-fila) o LOAD DATA LOCAL INFILE
+- Checkpoint por tabla en la propia base: cada lote se confirma junto con la
+  última fila cargada, de modo que una carga interrumpida se reanuda desde
+  ese punto con solo volver a ejecutar el script
+- Pipeline en paralelo: las tablas se cargan según sus dependencias (claves
+  foráneas), las independientes a la vez y cada una con su propia conexión
+  de un pool; las tablas grandes se dividen en particiones con varios workers
+- Al terminar, reconstruye las tablas agregadas del backend (celdas, índice de
+  seguridad, resúmenes y heatmap) con services/mantenimiento.py
+
+Uso:
+    python import_data.py                  # reanuda desde el último checkpoint
+    python import_data.py --desde-cero     # borra los checkpoints y carga todo
+    python import_data.py --lote 20000 --load-data
+    python import_data.py --hilos 6 --bloque 100000
 """
 
+import argparse
+import asyncio
+import csv
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import pandas as pd
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
 import bcrypt
-import os
 
 # Configuración de conexión a MySQL
 DB_CONFIG = {
@@ -18,365 +47,725 @@ DB_CONFIG = {
     'database': 'siniestros_viales'
 }
 
-def conectar_db():
-    """Establece conexión con MySQL"""
+# Carpeta del backend, para usar services/mantenimiento.py
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Filas por lote (una transacción por lote)
+TAMANO_LOTE = 5000
+
+# Tablas cargadas a la vez (una conexión del pool por tabla)
+HILOS = 4
+
+VALORES_VERDADEROS = ['true', '1', 'si', 'sí', 'yes']
+
+# Detección de formato de los CSV
+BYTES_MUESTRA = 64 * 1024
+ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+SEPARADORES = ';,\t'
+
+def crear_pool(tamano, load_data=False):
+    """Pool de conexiones para el pipeline (get_connection no espera: debe alcanzar)"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            print("✓ Conexión exitosa a MySQL")
-            return conn
+        pool = pooling.MySQLConnectionPool(
+            pool_name="importacion",
+            pool_size=min(tamano, pooling.CNX_POOL_MAXSIZE),
+            allow_local_infile=load_data,
+            **DB_CONFIG
+        )
+        print(f"✓ Pool de {pool.pool_size} conexiones a MySQL")
+        return pool
     except Error as e:
         print(f"✗ Error al conectar: {e}")
         return None
 
-def leer_csv_seguro(nombre_archivo):
-    """Lee CSV con diferentes encodings y separadores"""
-    encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-    separadores = [';', ',', '\t']
-    
-    for encoding in encodings:
-        for sep in separadores:
-            try:
-                df = pd.read_csv(nombre_archivo, encoding=encoding, sep=sep)
-                if len(df.columns) > 1:
-                    print(f"   ✓ Leído con encoding: {encoding}, separador: '{sep}'")
-                    print(f"   Columnas: {list(df.columns)[:5]}...")
-                    return df
-            except:
-                continue
-    
-    print(f"   ✗ No se pudo leer: {nombre_archivo}")
-    return None
-
-def importar_usuarios(conn):
-    """Importa usuarios (crea por defecto)"""
-    usuarios_default = [
-        ('admin@rutasegura.com', 'admin123', 'Administrador Sistema', 'admin', '2024-01-15'),
-        ('editor@rutasegura.com', 'editor123', 'Carlos Rodriguez', 'editor', '2024-01-15'),
-        ('consultor@rutasegura.com', 'consultor123', 'Ana Martinez', 'consultor', '2024-01-15')
-    ]
-    
+def conexiones_necesarias(hilos):
+    """Conexiones en uso a la vez en el peor caso: las `hilos` tablas con más workers en curso"""
+    workers = sorted((TABLAS.get(t, {}).get('workers', 1) for t in DEPENDENCIAS), reverse=True)
+    return sum(workers[:hilos])
+
+_salida = threading.Lock()
+
+def _log(tabla, mensaje):
+    # Con varias tablas en paralelo, cada línea indica a cuál corresponde
+    with _salida:
+        print(f"   [{tabla}] {mensaje}")
+
+def detectar_formato(nombre_archivo, bytes_muestra=BYTES_MUESTRA):
+    """
+    Detecta encoding y separador leyendo solo los primeros bytes del archivo.
+    Devuelve (encoding, separador) o None si no parece un CSV.
+    """
+    with open(nombre_archivo, 'rb') as f:
+        muestra = f.read(bytes_muestra)
+        completo = len(muestra) < bytes_muestra
+
+    # Si la muestra corta el archivo, se descarta la última línea (incompleta,
+    # incluso a mitad de un carácter multibyte)
+    if not completo and b'\n' in muestra:
+        muestra = muestra[:muestra.rindex(b'\n')]
+
+    # latin-1 acepta cualquier byte: es el último recurso
+    for encoding in ENCODINGS:
+        try:
+            texto = muestra.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+
+    lineas = [l for l in texto.splitlines() if l.strip()]
+    if not lineas:
+        return None
+
+    try:
+        separador = csv.Sniffer().sniff('\n'.join(lineas[:50]), delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        # Sin muestra suficiente: el separador más frecuente en el encabezado
+        separador = max(SEPARADORES, key=lineas[0].count)
+        if lineas[0].count(separador) == 0:
+            return None
+
+    return encoding, separador
+
+def _encabezado(nombre_archivo, encoding, separador):
+    """Nombres de columna normalizados una sola vez (sin espacios ni BOM)"""
+    with open(nombre_archivo, encoding=encoding, errors='replace', newline='') as f:
+        return [c.replace('\ufeff', '').strip() for c in next(csv.reader(f, delimiter=separador), [])]
+
+def _leer_bloques(nombre_archivo, encodings, tamano_bloque, opciones):
+    """
+    Bloques del CSV. Si aparece un byte inválido más allá de la muestra, se
+    sigue con el próximo encoding desde la primera fila todavía no leída.
+    """
+    leidas = 0
+    for i, encoding in enumerate(encodings):
+        desplazamiento = leidas
+        saltar = {'skiprows': range(1, leidas + 1)} if leidas else {}
+        try:
+            with pd.read_csv(nombre_archivo, encoding=encoding, chunksize=tamano_bloque,
+                             **saltar, **opciones) as lector:
+                for df in lector:
+                    df.index += desplazamiento
+                    leidas += len(df)
+                    yield df
+            return
+        except UnicodeDecodeError:
+            _log(nombre_archivo, f"⚠ Byte inválido para {encoding} en la fila {leidas + 1}; "
+                                 f"se continúa con {encodings[i + 1]}")
+
+def leer_csv_seguro(nombre_archivo, dtypes=None, tamano_bloque=None):
+    """
+    Lee un CSV con el formato detectado por detectar_formato.
+    dtypes: {columna: tipo}; si se indica, solo se leen esas columnas.
+    tamano_bloque: si se indica, devuelve un iterador de DataFrames de ese
+    tamaño (el índice sigue siendo el número de fila del archivo).
+    Ante un byte inválido no se reemplaza texto: se cambia de encoding
+    (latin-1, el último, acepta cualquier byte).
+    """
+    formato = detectar_formato(nombre_archivo)
+    if formato is None:
+        _log(nombre_archivo, "✗ No se pudo leer")
+        return None
+
+    encoding, separador = formato
+    _log(nombre_archivo, f"✓ Leído con encoding: {encoding}, separador: '{separador}'")
+
+    nombres = _encabezado(nombre_archivo, encoding, separador)
+    opciones = {'sep': separador, 'header': 0, 'names': nombres}
+    if dtypes:
+        columnas = [c for c in nombres if c in dtypes]
+        opciones['usecols'] = columnas
+        opciones['dtype'] = {c: dtypes[c] for c in columnas}
+
+    encodings = ENCODINGS[ENCODINGS.index(encoding):]
+    if tamano_bloque is not None:
+        return _leer_bloques(nombre_archivo, encodings, tamano_bloque, opciones)
+
+    for i, encoding in enumerate(encodings):
+        try:
+            return pd.read_csv(nombre_archivo, encoding=encoding, **opciones)
+        except UnicodeDecodeError:
+            _log(nombre_archivo, f"⚠ Byte inválido para {encoding}; se relee con {encodings[i + 1]}")
+
+# ========================================
+# LIMPIEZA VECTORIZADA
+# ========================================
+def _texto(serie, por_defecto=None):
+    """Texto recortado; vacíos y NaN -> por_defecto"""
+    serie = serie.astype('string').str.strip()
+    serie = serie.mask(serie.isna() | (serie == ''), por_defecto)
+    return serie.astype(object).where(serie.notna(), None)
+
+def _entero(serie):
+    """Entero; vacíos, texto y decimales -> NA"""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    return numeros.where((numeros % 1 == 0).fillna(False)).astype('Int64')
+
+def _booleano(serie):
+    if serie.dtype == bool:
+        return serie
+    # Vacíos -> False
+    return serie.astype('string').str.strip().str.lower().isin(VALORES_VERDADEROS).fillna(False).astype(bool)
+
+def _fecha(serie):
+    """Acepta YYYY-MM-DD y DD/MM/YYYY; valores inválidos -> NaT"""
+    texto = serie.astype('string').str.strip()
+    iso = pd.to_datetime(texto, format='%Y-%m-%d', errors='coerce')
+    local = pd.to_datetime(texto, format='%d/%m/%Y', errors='coerce')
+    return iso.fillna(local).dt.date
+
+def _columna(df, nombre, por_defecto=None):
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series(por_defecto, index=df.index, dtype=object)
+
+def limpiar_avenidas(df):
+    return pd.DataFrame({
+        'nombre': _texto(df['nombre']),
+        'tipo': _texto(df['tipo']),
+        'zona': _texto(df['zona']),
+        'longitud_km': pd.to_numeric(df['longitud_km'], errors='coerce'),
+    })
+
+def limpiar_tipos_siniestro(df):
+    return pd.DataFrame({
+        'nombre': _texto(df['nombre']),
+        'gravedad': _texto(df['gravedad']),
+        'descripcion': _texto(_columna(df, 'descripcion')),
+    })
+
+def limpiar_siniestros(df):
+    return pd.DataFrame({
+        'fecha': _fecha(df['fecha']),
+        'hora': _texto(df['hora']),
+        'avenida_id': _entero(df['avenida_id']),
+        'tipo_id': _entero(df['tipo_id']),
+        'nivel_gravedad': _texto(df['nivel_gravedad']),
+        'victimas_fatales': _entero(df['victimas_fatales']).fillna(0),
+        'heridos': _entero(df['heridos']).fillna(0),
+        'num_vehiculos': _entero(df['num_vehiculos']).fillna(0),
+        'dia_semana': _texto(df['dia_semana']),
+        'es_fin_de_semana': _booleano(df['es_fin_de_semana']),
+        'usuario_id': _entero(df['usuario_id']),
+        'observaciones': _texto(_columna(df, 'observaciones')),
+    })
+
+def limpiar_vehiculos(df):
+    return pd.DataFrame({
+        'siniestro_id': _entero(df['siniestro_id']),
+        'tipo_vehiculo': _texto(df['tipo_vehiculo']),
+        'marca': _texto(_columna(df, 'marca'), 'Indefinido'),
+        'modelo': _texto(_columna(df, 'modelo'), 'Indefinido'),
+        'rol': _texto(df['rol']),
+        'es_fallecido': _booleano(_columna(df, 'es_fallecido', False)),
+    })
+
+def limpiar_tramos(df):
+    return pd.DataFrame({
+        'avenida_id': _entero(df['avenida_id']),
+        'lat_origen': pd.to_numeric(df['lat_origen'], errors='coerce'),
+        'lon_origen': pd.to_numeric(df['lon_origen'], errors='coerce'),
+        'lat_destino': pd.to_numeric(df['lat_destino'], errors='coerce'),
+        'lon_destino': pd.to_numeric(df['lon_destino'], errors='coerce'),
+        'doble_mano': _booleano(_columna(df, 'doble_mano').fillna('true')),
+    })
+
+def limpiar_delitos(df):
+    return pd.DataFrame({
+        'latitud': pd.to_numeric(df['latitud'], errors='coerce'),
+        'longitud': pd.to_numeric(df['longitud'], errors='coerce'),
+        'tipo_delito': _texto(df['tipo_delito']),
+        'descripcion_breve': _texto(df['descripcion_breve']),
+        'fecha_reporte': _fecha(df['fecha_reporte']),
+    })
+
+# Definición de cada tabla importada desde CSV
+# dtypes: columnas leídas del CSV y su tipo (el resto se ignora). Los números
+# se leen como texto: limpiar_* los convierte y una celda inválida solo
+# descarta su fila en lugar de abortar la tabla
+# obligatorias: columnas sin las cuales la fila se descarta
+# workers: particiones cargadas en paralelo. Solo para tablas que nadie
+# referencia: los ids autoincrementales del resto deben seguir el orden del CSV
+# opcional: si falta el archivo, la tabla se omite sin error
+TABLAS = {
+    'avenidas': {
+        'archivo': 'AVENIDAS.csv',
+        'limpiar': limpiar_avenidas,
+        'dtypes': {'nombre': 'string', 'tipo': 'string', 'zona': 'string', 'longitud_km': 'string'},
+        'obligatorias': ['nombre'],
+    },
+    'tipos_siniestro': {
+        'archivo': 'TIPOS_SINIESTRO.csv',
+        'limpiar': limpiar_tipos_siniestro,
+        'dtypes': {'nombre': 'string', 'gravedad': 'string', 'descripcion': 'string'},
+        'obligatorias': ['nombre'],
+    },
+    'siniestros': {
+        'archivo': 'SINIESTROS.csv',
+        'limpiar': limpiar_siniestros,
+        'dtypes': {
+            'fecha': 'string', 'hora': 'string', 'avenida_id': 'string', 'tipo_id': 'string',
+            'nivel_gravedad': 'string', 'victimas_fatales': 'string', 'heridos': 'string',
+            'num_vehiculos': 'string', 'dia_semana': 'string', 'es_fin_de_semana': 'string',
+            'usuario_id': 'string', 'observaciones': 'string',
+        },
+        'obligatorias': ['fecha', 'hora', 'avenida_id', 'tipo_id', 'usuario_id'],
+    },
+    'vehiculos_involucrados': {
+        'archivo': 'VEHICULOS_INVOLUCRADOS.csv',
+        'limpiar': limpiar_vehiculos,
+        'dtypes': {
+            'siniestro_id': 'string', 'tipo_vehiculo': 'string', 'marca': 'string',
+            'modelo': 'string', 'rol': 'string', 'es_fallecido': 'string',
+        },
+        'obligatorias': ['siniestro_id'],
+        'workers': 4,
+    },
+    'reportes_delictivos': {
+        'archivo': 'DELITOS.csv',
+        'limpiar': limpiar_delitos,
+        'dtypes': {
+            'latitud': 'string', 'longitud': 'string', 'tipo_delito': 'string',
+            'descripcion_breve': 'string', 'fecha_reporte': 'string',
+        },
+        'obligatorias': ['latitud', 'longitud', 'tipo_delito', 'fecha_reporte'],
+    },
+    'tramos_avenida': {
+        'archivo': 'TRAMOS.csv',
+        'limpiar': limpiar_tramos,
+        'dtypes': {
+            'avenida_id': 'string', 'lat_origen': 'string', 'lon_origen': 'string',
+            'lat_destino': 'string', 'lon_destino': 'string', 'doble_mano': 'string',
+        },
+        'obligatorias': ['avenida_id', 'lat_origen', 'lon_origen', 'lat_destino', 'lon_destino'],
+        'opcional': True,
+    },
+}
+
+# Grafo de dependencias (claves foráneas): una tabla empieza cuando
+# terminaron todas las que referencia
+DEPENDENCIAS = {
+    'usuarios': [],
+    'avenidas': [],
+    'tipos_siniestro': [],
+    'reportes_delictivos': [],
+    'siniestros': ['usuarios', 'avenidas', 'tipos_siniestro'],
+    'vehiculos_involucrados': ['siniestros'],
+    'tramos_avenida': ['avenidas'],
+}
+
+# ========================================
+# CHECKPOINTS
+# ========================================
+def crear_tabla_checkpoint(conn):
     cursor = conn.cursor()
-    count = 0
-    
-    for email, password, nombre, rol, fecha_registro in usuarios_default:
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        query = """
-            INSERT INTO usuarios (email, password_hash, nombre, rol, fecha_registro, activo)
-            VALUES (%s, %s, %s, %s, %s, 1)
-            ON DUPLICATE KEY UPDATE nombre = VALUES(nombre)
-        """
-        
-        cursor.execute(query, (email, password_hash, nombre, rol, fecha_registro))
-        count += 1
-    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS importacion_checkpoint (
+            tabla VARCHAR(64) PRIMARY KEY,
+            archivo VARCHAR(255) NOT NULL,
+            ultima_fila INT NOT NULL,
+            actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
     conn.commit()
     cursor.close()
-    print(f"   ✓ Creados {count} usuarios")
-    return count
 
-def importar_avenidas(conn):
-    """Importa avenidas desde CSV"""
-    archivo = 'AVENIDAS.csv'
-    
-    if not os.path.exists(archivo):
-        print(f"   ✗ {archivo} no encontrado")
-        return 0
-    
-    try:
-        df = leer_csv_seguro(archivo)
-        if df is None:
-            return 0
-        
-        cursor = conn.cursor()
-        count = 0
-        
-        df.columns = df.columns.str.strip()
-        
-        for _, row in df.iterrows():
-            query = """
-                INSERT INTO avenidas (nombre, tipo, zona, longitud_km)
-                VALUES (%s, %s, %s, %s)
-            """
-            
-            values = (
-                str(row['nombre']).strip(),
-                str(row['tipo']).strip(),
-                str(row['zona']).strip(),
-                float(row['longitud_km'])
-            )
-            
-            cursor.execute(query, values)
-            count += 1
-        
+def leer_checkpoint(conn, tabla):
+    """Última fila del CSV ya cargada (-1 si no hay checkpoint)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT ultima_fila FROM importacion_checkpoint WHERE tabla = %s", (tabla,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else -1
+
+def borrar_checkpoints(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM importacion_checkpoint")
+    conn.commit()
+    cursor.close()
+
+def _guardar_checkpoint(cursor, tabla, archivo, ultima_fila):
+    """Se ejecuta dentro de la transacción del lote"""
+    cursor.execute("""
+        INSERT INTO importacion_checkpoint (tabla, archivo, ultima_fila)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE archivo = VALUES(archivo), ultima_fila = VALUES(ultima_fila)
+    """, (tabla, archivo, int(ultima_fila)))
+
+def _clave_particion(tabla, inicio, fin):
+    """Checkpoint de una partición: filas del CSV en [inicio, fin)"""
+    return f"{tabla}[{inicio}:{fin}]"
+
+def preparar_particiones(conn, tabla, archivo, df, workers):
+    """
+    Divide las filas pendientes en rangos contiguos del CSV, uno por worker.
+    Los rangos se registran como checkpoints antes de empezar, así una carga
+    reanudada reutiliza los mismos rangos aunque cambie la cantidad de workers.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT tabla FROM importacion_checkpoint WHERE tabla LIKE %s", (f"{tabla}[%",))
+    rangos = []
+    for (clave,) in cursor.fetchall():
+        coincidencia = re.search(r"\[(\d+):(\d+)\]$", clave)
+        if coincidencia:
+            rangos.append((int(coincidencia.group(1)), int(coincidencia.group(2))))
+    rangos.sort()
+
+    # Filas nuevas: posteriores a los rangos existentes o a una carga sin particiones
+    desde = max([fin for _, fin in rangos], default=leer_checkpoint(conn, tabla) + 1)
+    nuevas = df.index[df.index >= desde]
+    if len(nuevas):
+        tamano = math.ceil(len(nuevas) / workers)
+        for i in range(0, len(nuevas), tamano):
+            inicio, fin = int(nuevas[i]), int(nuevas[min(i + tamano, len(nuevas)) - 1]) + 1
+            _guardar_checkpoint(cursor, _clave_particion(tabla, inicio, fin), archivo, inicio - 1)
+            rangos.append((inicio, fin))
         conn.commit()
-        cursor.close()
-        print(f"   ✓ Importados {count} registros")
-        return count
-        
-    except Exception as e:
-        print(f"   ✗ Error: {e}")
-        conn.rollback()
-        return 0
+    cursor.close()
 
-def importar_tipos_siniestro(conn):
-    """Importa tipos de siniestro desde CSV"""
-    archivo = 'TIPOS_SINIESTRO.csv'
-    
-    if not os.path.exists(archivo):
-        print(f"   ✗ {archivo} no encontrado")
-        return 0
-    
+    return [
+        (_clave_particion(tabla, inicio, fin), df[(df.index >= inicio) & (df.index < fin)])
+        for inicio, fin in rangos
+    ]
+
+# ========================================
+# CARGA POR LOTES
+# ========================================
+def load_data_disponible(conn):
+    """True si el servidor acepta LOAD DATA LOCAL INFILE"""
     try:
-        df = leer_csv_seguro(archivo)
-        if df is None:
-            return 0
-        
         cursor = conn.cursor()
-        count = 0
-        
-        df.columns = df.columns.str.strip()
-        
-        for _, row in df.iterrows():
-            query = """
-                INSERT INTO tipos_siniestro (nombre, gravedad, descripcion)
-                VALUES (%s, %s, %s)
-            """
-            
-            descripcion = None
-            if 'descripcion' in df.columns and pd.notna(row.get('descripcion')):
-                descripcion = str(row['descripcion']).strip()
-            
-            values = (
-                str(row['nombre']).strip(),
-                str(row['gravedad']).strip(),
-                descripcion
-            )
-            
-            cursor.execute(query, values)
-            count += 1
-        
-        conn.commit()
+        cursor.execute("SHOW GLOBAL VARIABLES LIKE 'local_infile'")
+        row = cursor.fetchone()
         cursor.close()
-        print(f"   ✓ Importados {count} registros")
-        return count
-        
-    except Exception as e:
-        print(f"   ✗ Error: {e}")
-        conn.rollback()
-        return 0
+        return bool(row) and str(row[1]).upper() in ('ON', '1')
+    except Error:
+        return False
 
-def importar_siniestros(conn):
-    """Importa siniestros desde CSV"""
-    archivo = 'SINIESTROS.csv'
-    
-    if not os.path.exists(archivo):
-        print(f"   ✗ {archivo} no encontrado")
-        return 0
-    
+def _filas(lote):
+    """Tuplas con tipos nativos de Python (NaN/NA -> None)"""
+    lote = lote.astype(object).where(lote.notna(), None)
+    return list(lote.itertuples(index=False, name=None))
+
+def _insertar_executemany(cursor, tabla, columnas, filas):
+    # mysql-connector reescribe executemany de un INSERT como INSERT multi-fila
+    marcadores = ", ".join(["%s"] * len(columnas))
+    query = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({marcadores})"
+    cursor.executemany(query, filas)
+
+def _insertar_load_data(cursor, tabla, columnas, filas):
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False) as tmp:
+        writer = csv.writer(tmp, lineterminator='\n')
+        for fila in filas:
+            writer.writerow(['\\N' if v is None else v for v in fila])
+        ruta = tmp.name
     try:
-        df = leer_csv_seguro(archivo)
-        if df is None:
-            return 0
-        
-        cursor = conn.cursor()
-        count = 0
-        
-        df.columns = df.columns.str.strip()
-        
-        for _, row in df.iterrows():
-            query = """
-                INSERT INTO siniestros (
-                    fecha, hora, avenida_id, tipo_id, nivel_gravedad,
-                    victimas_fatales, heridos, num_vehiculos, dia_semana,
-                    es_fin_de_semana, usuario_id, observaciones
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            observaciones = None
-            if 'observaciones' in df.columns and pd.notna(row.get('observaciones')):
-                observaciones = str(row['observaciones']).strip()
-            
-            values = (
-                row['fecha'],
-                row['hora'],
-                int(row['avenida_id']),
-                int(row['tipo_id']),
-                str(row['nivel_gravedad']).strip(),
-                int(row['victimas_fatales']),
-                int(row['heridos']),
-                int(row['num_vehiculos']),
-                str(row['dia_semana']).strip(),
-                bool(int(row['es_fin_de_semana'])),
-                int(row['usuario_id']),
-                observaciones
-            )
-            
-            cursor.execute(query, values)
-            count += 1
-        
-        conn.commit()
-        cursor.close()
-        print(f"   ✓ Importados {count} registros")
-        return count
-        
-    except Exception as e:
-        print(f"   ✗ Error: {e}")
-        conn.rollback()
-        return 0
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {tabla}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({', '.join(columnas)})
+        """, (ruta,))
+    finally:
+        os.remove(ruta)
+
+def cargar_dataframe(conn, tabla, archivo, df, tamano_lote=TAMANO_LOTE, usar_load_data=False, clave=None):
+    """
+    Inserta el DataFrame limpio por lotes, a partir del checkpoint `clave`
+    (por defecto, el de la tabla). El índice del DataFrame es el número de fila
+    del CSV: cada lote se confirma junto con el checkpoint, así que nunca se
+    cargan filas dos veces.
+    """
+    clave = clave or tabla
+    ultima = leer_checkpoint(conn, clave)
+    pendientes = df[df.index > ultima]
+    if ultima >= 0 and len(pendientes) < len(df):
+        _log(clave, f"↻ Reanudando después de la fila {ultima} ({len(pendientes)} pendientes)")
+
+    columnas = list(df.columns)
+    cursor = conn.cursor()
+    count = 0
 
-def importar_vehiculos(conn):
-    """Importa vehículos involucrados desde CSV"""
-    archivo = 'VEHICULOS_INVOLUCRADOS.csv'
-    
-    if not os.path.exists(archivo):
-        print(f"   ✗ {archivo} no encontrado")
-        return 0
-    
     try:
-        df = leer_csv_seguro(archivo)
-        if df is None:
-            return 0
-        
-        cursor = conn.cursor()
-        count = 0
-        
-        df.columns = df.columns.str.strip()
-        
-        for _, row in df.iterrows():
-            query = """
-                INSERT INTO vehiculos_involucrados (
-                    siniestro_id, tipo_vehiculo, marca, modelo, rol, es_fallecido
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            marca = row.get('marca', 'Indefinido')
-            if pd.isna(marca) or str(marca).strip() == '':
-                marca = 'Indefinido'
-            
-            modelo = row.get('modelo', 'Indefinido')
-            if pd.isna(modelo) or str(modelo).strip() == '':
-                modelo = 'Indefinido'
-            
-            es_fallecido = row.get('es_fallecido', False)
-            if pd.isna(es_fallecido):
-                es_fallecido = False
-            if isinstance(es_fallecido, str):
-                es_fallecido = es_fallecido.lower() in ['true', '1', 'si', 'sí', 'yes']
-            
-            values = (
-                int(row['siniestro_id']),
-                str(row['tipo_vehiculo']).strip(),
-                str(marca).strip(),
-                str(modelo).strip(),
-                str(row['rol']).strip(),
-                bool(es_fallecido)
-            )
-            
-            cursor.execute(query, values)
-            count += 1
-        
-        conn.commit()
-        cursor.close()
-        print(f"   ✓ Importados {count} registros")
-        return count
-        
-    except Exception as e:
-        print(f"   ✗ Error: {e}")
+        for inicio in range(0, len(pendientes), tamano_lote):
+            lote = pendientes.iloc[inicio:inicio + tamano_lote]
+            filas = _filas(lote)
+            if usar_load_data:
+                _insertar_load_data(cursor, tabla, columnas, filas)
+            else:
+                _insertar_executemany(cursor, tabla, columnas, filas)
+            _guardar_checkpoint(cursor, clave, archivo, lote.index[-1])
+            conn.commit()
+            count += len(filas)
+    except Exception:
         conn.rollback()
-        return 0
-def importar_delitos(conn):
-    archivo = 'DELITOS.csv'
-    
-    if not os.path.exists(archivo):
-        print(f"   ✗ {archivo} no encontrado")
-        return 0
-    
+        raise
+    finally:
+        cursor.close()
+
+    return count
+
+def _cargar_particion(pool, tabla, archivo, clave, df, tamano_lote, usar_load_data):
+    conn = pool.get_connection()
+    try:
+        return cargar_dataframe(conn, tabla, archivo, df, tamano_lote, usar_load_data, clave=clave)
+    finally:
+        conn.close()
+
+def _cargar_bloque(pool, tabla, archivo, limpio, workers, tamano_lote, usar_load_data):
+    if workers <= 1:
+        return _cargar_particion(pool, tabla, archivo, None, limpio, tamano_lote, usar_load_data)
+
+    conn = pool.get_connection()
     try:
-        df = leer_csv_seguro(archivo)
-        if df is None:
+        particiones = preparar_particiones(conn, tabla, archivo, limpio, workers)
+    finally:
+        conn.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = [
+            executor.submit(_cargar_particion, pool, tabla, archivo, clave, parte, tamano_lote, usar_load_data)
+            for clave, parte in particiones
+        ]
+        return sum(f.result() for f in futuros)
+
+def importar_tabla(pool, tabla, tamano_lote=TAMANO_LOTE, usar_load_data=False, tamano_bloque=None):
+    """
+    Lee, limpia y carga una tabla definida en TABLAS. Devuelve la cantidad de filas.
+    Con tamano_bloque, el CSV se procesa por bloques y la memoria no depende
+    del tamaño del archivo.
+    """
+    definicion = TABLAS[tabla]
+    archivo = definicion['archivo']
+    workers = definicion.get('workers', 1)
+
+    if not os.path.exists(archivo):
+        if definicion.get('opcional'):
+            _log(tabla, f"⚠ {archivo} no encontrado; se omite")
             return 0
-        
+        raise FileNotFoundError(f"{archivo} no encontrado")
+
+    datos = leer_csv_seguro(archivo, definicion['dtypes'], tamano_bloque)
+    if datos is None:
+        raise ValueError(f"No se pudo leer {archivo}")
+
+    if workers > 1:
+        _log(tabla, f"{workers} workers en paralelo")
+
+    count = 0
+    descartadas = 0
+    bloques = [datos] if tamano_bloque is None else datos
+    for df in bloques:
+        limpio = definicion['limpiar'](df)
+
+        invalidas = limpio[definicion['obligatorias']].isna().any(axis=1)
+        descartadas += int(invalidas.sum())
+        limpio = limpio[~invalidas]
+
+        count += _cargar_bloque(pool, tabla, archivo, limpio, workers, tamano_lote, usar_load_data)
+
+    if descartadas:
+        _log(tabla, f"⚠ {descartadas} filas descartadas por datos faltantes o inválidos")
+    return count
+
+def importar_usuarios(pool):
+    """Importa usuarios (crea por defecto)"""
+    usuarios_default = [
+        ('admin@rutasegura.com', 'admin123', 'Administrador Sistema', 'admin', '2024-01-15'),
+        ('editor@rutasegura.com', 'editor123', 'Carlos Rodriguez', 'editor', '2024-01-15'),
+        ('consultor@rutasegura.com', 'consultor123', 'Ana Martinez', 'consultor', '2024-01-15')
+    ]
+
+    filas = [
+        (email, bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'), nombre, rol, fecha_registro)
+        for email, password, nombre, rol, fecha_registro in usuarios_default
+    ]
+
+    conn = pool.get_connection()
+    try:
         cursor = conn.cursor()
-        count = 0
-        
-        df.columns = df.columns.str.strip()
-        
-        for _, row in df.iterrows():
-            query = """
-                INSERT INTO reportes_delictivos (
-                    latitud, longitud, tipo_delito, descripcion_breve, fecha_reporte
-                ) VALUES (%s, %s, %s, %s, %s)
-            """
-            
-            values = (
-                float(row['latitud']),
-                float(row['longitud']),
-                str(row['tipo_delito']).strip(),
-                str(row['descripcion_breve']).strip(),
-                row['fecha_reporte']
-            )
-            
-            cursor.execute(query, values)
-            count += 1
-        
+        cursor.executemany("""
+            INSERT INTO usuarios (email, password_hash, nombre, rol, fecha_registro, activo)
+            VALUES (%s, %s, %s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE nombre = VALUES(nombre)
+        """, filas)
         conn.commit()
         cursor.close()
-        print(f"   ✓ Importados {count} registros")
-        return count
-        
-    except Exception as e:
-        print(f"   ✗ Error: {e}")
-        conn.rollback()
-        return 0
+    finally:
+        conn.close()
+    return len(filas)
+
+def _importar_nodo(pool, tabla, opciones):
+    """Carga una tabla del grafo y mide su duración"""
+    inicio = time.perf_counter()
+    if tabla == 'usuarios':
+        count = importar_usuarios(pool)
+    else:
+        count = importar_tabla(pool, tabla, **opciones)
+    return count, time.perf_counter() - inicio
+
+def ejecutar_pipeline(pool, opciones, hilos=HILOS):
+    """
+    Recorre el grafo de DEPENDENCIAS: lanza cada tabla en cuanto terminan las
+    que referencia. Si una tabla falla, las que dependen de ella se omiten.
+    Devuelve {tabla: (registros, segundos)} y la lista de tablas no cargadas.
+    """
+    pendientes = dict(DEPENDENCIAS)
+    completadas = set()
+    en_curso = {}
+    resultados = {}
+    fallidas = []
+
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        while pendientes or en_curso:
+            listas = [t for t, deps in pendientes.items() if all(d in completadas for d in deps)]
+            for tabla in listas:
+                del pendientes[tabla]
+                _log(tabla, "iniciando...")
+                en_curso[executor.submit(_importar_nodo, pool, tabla, opciones)] = tabla
+
+            if not en_curso:
+                break
+
+            terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                tabla = en_curso.pop(futuro)
+                try:
+                    count, segundos = futuro.result()
+                except Exception as e:
+                    _log(tabla, f"✗ Error: {e}")
+                    _log(tabla, "Los lotes ya confirmados quedan registrados; vuelva a ejecutar para reanudar")
+                    fallidas.append(tabla)
+                    continue
+                resultados[tabla] = (count, segundos)
+                completadas.add(tabla)
+                _log(tabla, f"✓ {count} registros en {segundos:.2f} s")
+
+    for tabla in pendientes:
+        _log(tabla, "⚠ Omitida: falló una tabla de la que depende")
+        fallidas.append(tabla)
+
+    return resultados, fallidas
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Importa los CSV a la base de datos MySQL")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                        help=f"filas por lote/transacción (por defecto {TAMANO_LOTE})")
+    parser.add_argument('--bloque', type=int, default=None,
+                        help="lee cada CSV por bloques de N filas (por defecto, completo)")
+    parser.add_argument('--hilos', type=int, default=HILOS,
+                        help=f"tablas cargadas en paralelo (por defecto {HILOS})")
+    parser.add_argument('--desde-cero', action='store_true',
+                        help="ignora los checkpoints y vuelve a cargar todo")
+    parser.add_argument('--load-data', action='store_true',
+                        help="usa LOAD DATA LOCAL INFILE si el servidor lo permite")
+    return parser.parse_args()
+
+def reconstruir_agregados():
+    """
+    Reconstruye las tablas agregadas del backend con los datos importados.
+    Aplica antes el esquema del backend, por si todavía no se inició nunca.
+    Los backends en ejecución recargan la red vial al vencer su TTL.
+    """
+    if DIRECTORIO_BACKEND not in sys.path:
+        sys.path.insert(0, DIRECTORIO_BACKEND)
+    from sqlalchemy.engine import URL
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from config.esquema import aplicar_esquema
+    from services.mantenimiento import reconstruir_agregados as reconstruir
+
+    url = URL.create(
+        "mysql+aiomysql",
+        username=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        host=DB_CONFIG['host'],
+        port=DB_CONFIG['port'],
+        database=DB_CONFIG['database']
+    )
+
+    async def ejecutar():
+        engine = create_async_engine(url)
+        try:
+            async with engine.begin() as conn:
+                await aplicar_esquema(conn)
+            return await reconstruir(engine, forzar=True)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(ejecutar())
 
 def main():
     """Función principal"""
+    args = parsear_argumentos()
+
     print("=" * 50)
     print("  IMPORTACIÓN DE DATOS - SINIESTROS VIALES")
     print("=" * 50)
-    
-    conn = conectar_db()
-    
-    if not conn:
+
+    # Cada tabla en curso usa una conexión; una tabla particionada usa una por
+    # worker. get_connection no espera y el pool admite hasta CNX_POOL_MAXSIZE
+    # conexiones, así que se reducen los hilos hasta que el peor caso entre
+    hilos = max(args.hilos, 1)
+    while hilos > 1 and conexiones_necesarias(hilos) > pooling.CNX_POOL_MAXSIZE:
+        hilos -= 1
+    if hilos < args.hilos:
+        print(f"⚠ --hilos reducido a {hilos}: el pool admite hasta {pooling.CNX_POOL_MAXSIZE} conexiones")
+    pool = crear_pool(conexiones_necesarias(hilos), load_data=args.load_data)
+
+    if not pool:
         return
-    
+
     try:
-        resultados = {}
-        
-        print("\n1. Importando usuarios...")
-        resultados['usuarios'] = importar_usuarios(conn)
-        
-        print("\n2. Importando avenidas...")
-        resultados['avenidas'] = importar_avenidas(conn)
-        
-        print("\n3. Importando tipos de siniestro...")
-        resultados['tipos_siniestro'] = importar_tipos_siniestro(conn)
-        
-        print("\n4. Importando siniestros...")
-        resultados['siniestros'] = importar_siniestros(conn)
-        
-        print("\n5. Importando vehículos involucrados...")
-        resultados['vehiculos_involucrados'] = importar_vehiculos(conn)
-        
-        print("\n6. Importando reportes delictivos...")
-        resultados['reportes_delictivos'] = importar_delitos(conn)
-        
+        conn = pool.get_connection()
+        try:
+            crear_tabla_checkpoint(conn)
+            if args.desde_cero:
+                borrar_checkpoints(conn)
+                print("\n↺ Checkpoints borrados: se cargará todo desde el inicio")
+            usar_load_data = args.load_data and load_data_disponible(conn)
+        finally:
+            conn.close()
+
+        if args.load_data and not usar_load_data:
+            print("\n⚠ LOAD DATA LOCAL INFILE no está habilitado; se usa executemany")
+
+        print("\n⏳ Importando tablas...")
+        inicio = time.perf_counter()
+        opciones = {
+            'tamano_lote': args.lote,
+            'usar_load_data': usar_load_data,
+            'tamano_bloque': args.bloque,
+        }
+        resultados, fallidas = ejecutar_pipeline(pool, opciones, hilos)
+        duracion = time.perf_counter() - inicio
+
         # Resumen
         print("\n📊 RESUMEN DE IMPORTACIÓN:")
-        print("-" * 50)
+        print("-" * 60)
         total = 0
-        for tabla, count in resultados.items():
-            print(f"  {tabla:30} {count:3} registros")
+        for tabla, (count, segundos) in resultados.items():
+            velocidad = count / segundos if segundos > 0 else 0
+            print(f"  {tabla:25} {count:6} registros {segundos:7.2f} s {velocidad:10,.0f} filas/s")
             total += count
-        print("-" * 50)
-        print(f"  {'TOTAL':30} {total:3} registros")
-        
+        for tabla in fallidas:
+            print(f"  {tabla:25} {'no cargada':>16}")
+        print("-" * 60)
+        print(f"  {'TOTAL':25} {total:6} registros {duracion:7.2f} s")
+
         print("\n" + "=" * 50)
-        print("  ✓ IMPORTACIÓN COMPLETADA")
+        if fallidas:
+            print("  ⚠ IMPORTACIÓN INCOMPLETA")
+        else:
+            print("  ✓ IMPORTACIÓN COMPLETADA")
         print("=" * 50)
-        
+        print("\n⏳ Reconstruyendo tablas agregadas...")
+        try:
+            tablas = reconstruir_agregados()
+            print(f"✓ Reconstruidas: {', '.join(tablas)}")
+        except Exception as e:
+            print(f"✗ Error al reconstruir las tablas agregadas: {e}")
+            print("  Reintentar con: python -m services.mantenimiento --forzar (desde backend/)")
+
         print("\n🔑 CREDENCIALES DE ACCESO:")
         print("-" * 50)
         print("  Admin:")
@@ -389,14 +778,9 @@ def main():
         print("    Email: consultor@rutasegura.com")
         print("    Password: consultor123")
         print("-" * 50)
-        
+
     except Exception as e:
         print(f"\n✗ Error general: {e}")
-        
-    finally:
-        if conn.is_connected():
-            conn.close()
-            print("\n✓ Conexión cerrada")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
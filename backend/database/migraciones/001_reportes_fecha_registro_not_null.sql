@@ -0,0 +1,12 @@
+-- fecha_registro NOT NULL en reportes_delictivos
+-- La paginación por cursor ya admite NULL; con la columna NOT NULL la
+-- condición del cursor es más simple y usa mejor idx_reportes_fecha_registro_id.
+-- El ALTER reconstruye la tabla: ejecutar en una ventana sin escrituras.
+--   mysql siniestros_viales < database/migraciones/001_reportes_fecha_registro_not_null.sql
+
+UPDATE reportes_delictivos
+SET fecha_registro = TIMESTAMP(fecha_reporte)
+WHERE fecha_registro IS NULL;
+
+ALTER TABLE reportes_delictivos
+    MODIFY fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
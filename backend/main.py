@@ -4,12 +4,22 @@ FastAPI Backend
 """
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 
 from config.settings import settings
-from config.database import init_db, close_db
+from config.database import init_db, close_db, engine
+from services.mantenimiento import reconstruir_agregados
+from services.red_vial import cargar_red_vial
+from services.planes_reportes import detectar_planes
+from services.catalogos import cargar_catalogos
+from services.auth import cerrar_pool_passwords, estado_pool_passwords
+from services.accesos import iniciar_volcado_accesos, detener_volcado_accesos
+from services.metricas import (
+    MiddlewareMetricas, generar_metricas, iniciar_medicion_lag, detener_medicion_lag
+)
 
 from routers import (
     auth_router,
@@ -19,7 +29,8 @@ from routers import (
     siniestros_router,
     vehiculos_router,
     reportes_router,
-    reportes_delito_router
+    reportes_delito_router,
+    admin_router
 )
 
 # Lifecycle events
@@ -28,9 +39,19 @@ async def lifespan(app: FastAPI):
     """Manejo de eventos de inicio y cierre de la aplicación"""
     # Startup
     await init_db()
+    await reconstruir_agregados(engine, forzar=settings.RECONSTRUIR_AGREGADOS_AL_INICIAR)
+    async with engine.begin() as conn:
+        await detectar_planes(conn)
+        await cargar_catalogos(conn)
+        await cargar_red_vial(conn)
+    iniciar_volcado_accesos()
+    iniciar_medicion_lag()
     print("✅ Base de datos inicializada")
     yield
     # Shutdown
+    await detener_medicion_lag()
+    await detener_volcado_accesos()
+    cerrar_pool_passwords()
     await close_db()
     print("✅ Conexiones cerradas")
 
@@ -58,6 +79,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia y pedidos en curso por ruta (/metrics)
+app.add_middleware(MiddlewareMetricas)
+
 # Registrar routers
 app.include_router(auth_router)
 app.include_router(usuarios_router)
@@ -67,6 +91,7 @@ app.include_router(siniestros_router)
 app.include_router(vehiculos_router)
 app.include_router(reportes_router)
 app.include_router(reportes_delito_router)
+app.include_router(admin_router)
 
 # Ruta raíz
 @app.get("/")
@@ -83,7 +108,13 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "pool_passwords": estado_pool_passwords()}
+
+# Métricas en formato de texto de Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Latencias, pool de conexiones, lag del event loop, cachés y consultas SQL"""
+    return PlainTextResponse(generar_metricas(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
     import uvicorn
@@ -10,6 +10,7 @@ from .siniestros import router as siniestros_router
 from .vehiculos import router as vehiculos_router
 from .reportes import router as reportes_router
 from .reportes_delito import router as reportes_delito_router
+from .admin import router as admin_router
 
 __all__ = [
     "auth_router",
@@ -18,5 +19,6 @@ __all__ = [
     "tipos_siniestro_router",
     "siniestros_router",
     "vehiculos_router",
-    "reportes_router"
+    "reportes_router",
+    "admin_router"
 ]
\ No newline at end of file
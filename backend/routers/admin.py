@@ -0,0 +1,52 @@
+"""
+Router de administración
+Estadísticas de las consultas SQL y reconstrucción de las tablas agregadas (solo admin)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from config.database import engine
+from config.instrumentacion import estadisticas_consultas
+from routers.usuarios import verificar_admin
+from services.cache import cache_reportes, cache_tiles
+from services.mantenimiento import reconstruir_agregados
+
+router = APIRouter(prefix="/admin", tags=["Administración"])
+
+@router.get("/consultas")
+async def estadisticas_sql(
+    orden: str = Query("total_ms", pattern="^(total_ms|promedio_ms|max_ms|cantidad|lentas|filas)$"),
+    limite: int = Query(50, ge=1, le=500),
+    _: dict = Depends(verificar_admin)
+):
+    """
+    Sentencias agrupadas por sitio de llamada y SQL normalizado, con tiempos,
+    filas e histogramas, de mayor a menor según `orden`.
+    """
+    return estadisticas_consultas.resumen(orden, limite)
+
+@router.post("/consultas/reiniciar")
+async def reiniciar_estadisticas_sql(_: dict = Depends(verificar_admin)):
+    """Descarta las estadísticas acumuladas"""
+    estadisticas_consultas.reiniciar()
+    return {"reiniciado": True}
+
+@router.post("/agregados/reconstruir")
+async def reconstruir_tablas_agregadas(
+    todas: bool = Query(True, description="False: solo las tablas vacías"),
+    _: dict = Depends(verificar_admin)
+):
+    """
+    Recalcula índice de seguridad, resúmenes, heatmap y celdas desde siniestros
+    y reportes_delictivos (recorre ambas tablas completas)
+    """
+    try:
+        tablas = await reconstruir_agregados(engine, forzar=todas, espera=5)
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ya hay una reconstrucción en curso"
+        )
+    cache_reportes.invalidar()
+    cache_tiles.invalidar()
+    return {"reconstruidas": tablas}
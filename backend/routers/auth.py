@@ -35,7 +35,8 @@ async def obtener_usuario_actual(
     if token_data is None or token_data.email is None:
         raise credentials_exception
     
-    usuario = await auth_service.obtener_usuario_por_email(db, email=token_data.email)
+    # En el caso común no consulta la base: el usuario sale de la caché
+    usuario = await auth_service.obtener_usuario_activo(db, email=token_data.email)
     if usuario is None:
         raise credentials_exception
     
@@ -2,18 +2,27 @@
 Router de reportes y estadísticas
 """
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict
+from typing import List, Dict, Optional
+from datetime import date
 from decimal import Decimal
 import logging
 from sqlalchemy.exc import ProgrammingError
 
 from config.database import get_db
+from services.cache import cache_reportes
+from services import planes_reportes
+from services import heatmap
+from services.red_vial import calcular_ruta
+from services.motor_seguridad import MotorSeguridad, motor_seguridad
+from schemas.reportes import RutaRequest
+from routers.auth import obtener_usuario_actual
 from services.reportes import (
    calcular_indice_seguridad_por_avenida,
+    calcular_indice_seguridad_periodo,
     obtener_rutas_mas_seguras,
     obtener_zonas_peligrosas_analisis
 )
@@ -38,29 +47,10 @@ def _serialize_row(row) -> Dict:
 def _serialize_rows(rows) -> List[Dict]:
     return [_serialize_row(r) for r in rows]
 
-async def _table_exists(db: AsyncSession, table_name: str) -> bool:
-    sql = text("""
-        SELECT COUNT(*) FROM information_schema.tables
-        WHERE table_schema = DATABASE() AND table_name = :t
-    """)
-    r = await db.execute(sql, {"t": table_name})
-    cnt = r.scalar()
-    try:
-        return int(cnt) > 0
-    except Exception:
-        return bool(cnt)
-
-async def _column_exists(db: AsyncSession, table_name: str, column_name: str) -> bool:
-    sql = text("""
-        SELECT COUNT(*) FROM information_schema.columns
-        WHERE table_schema = DATABASE() AND table_name = :t AND column_name = :c
-    """)
-    r = await db.execute(sql, {"t": table_name, "c": column_name})
-    cnt = r.scalar()
-    try:
-        return int(cnt) > 0
-    except Exception:
-        return bool(cnt)
+def _respuesta_cacheada(clave, contenido, version: int) -> JSONResponse:
+    """Guarda el contenido en la caché de reportes y lo devuelve como JSON"""
+    cache_reportes.guardar(clave, contenido, version)
+    return JSONResponse(content=contenido)
 
 @router.get("/resumen-general")
 async def resumen_general(db: AsyncSession = Depends(get_db)):
@@ -71,6 +61,11 @@ async def resumen_general(db: AsyncSession = Depends(get_db)):
     - total_heridos: Suma de todos los heridos
     - siniestros_graves: Siniestros con al menos 1 víctima fatal
     """
+    clave = cache_reportes.clave("resumen-general")
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return JSONResponse(content=cacheado)
+    version = cache_reportes.version
     try:
         sql = text("""
           SELECT 
@@ -82,7 +77,7 @@ async def resumen_general(db: AsyncSession = Depends(get_db)):
         """)
         result = await db.execute(sql)
         row = result.mappings().first()
-        return JSONResponse(content=_serialize_row(row))
+        return _respuesta_cacheada(clave, _serialize_row(row), version)
     except Exception as e:
         logging.exception("Error en resumen_general")
         return JSONResponse(content={"detail": "Error interno"}, status_code=500)
@@ -94,64 +89,18 @@ async def siniestros_por_zona(db: AsyncSession = Depends(get_db)):
     - Si existe tabla 'zonas' y columna 'zona_id' en siniestros: hace JOIN y usa zonas.nombre.
     - Si no, intenta agrupar por 'avenida' (avenidas/avenida_id).
     - Si ninguna columna relacionada existe, agrupa por fecha (día) como fallback simple.
+    La variante se elige al iniciar (ver services/planes_reportes.py).
     """
+    clave = cache_reportes.clave("siniestros-por-zona")
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return JSONResponse(content=cacheado)
+    version = cache_reportes.version
     try:
-        # preferir zonas
-        zonas_table = await _table_exists(db, "zonas")
-        has_zona_col = await _column_exists(db, "siniestros", "zona_id")
-        if zonas_table and has_zona_col:
-            sql = text("""
-              SELECT z.nombre AS zona, COUNT(*) AS total
-              FROM siniestros s
-              JOIN zonas z ON s.zona_id = z.id
-              GROUP BY z.nombre
-              ORDER BY total DESC;
-            """)
-            result = await db.execute(sql)
-            rows = result.mappings().all()
-            return JSONResponse(content=_serialize_rows(rows))
-
-        # intentar avenidas (muchos modelos usan avenida_id)
-        avenidas_table = await _table_exists(db, "avenidas")
-        has_avenida_col = await _column_exists(db, "siniestros", "avenida_id")
-        if avenidas_table and has_avenida_col:
-            sql = text("""
-              SELECT a.nombre AS zona, 
-                     COUNT(*) AS total_siniestros,
-                     COALESCE(SUM(s.victimas_fatales), 0) AS total_fallecidos,
-                     COALESCE(SUM(s.heridos), 0) AS total_heridos
-              FROM siniestros s
-              JOIN avenidas a ON s.avenida_id = a.id
-              GROUP BY a.nombre
-              ORDER BY total_siniestros DESC;
-            """)
-            result = await db.execute(sql)
-            rows = result.mappings().all()
-            return JSONResponse(content=_serialize_rows(rows))
-
-        # si no hay tablas relacionadas, agrupar por la columna disponible (tipo_id / usuario_id) o por día
-        if await _column_exists(db, "siniestros", "tipo_id"):
-            sql = text("""
-              SELECT s.tipo_id AS zona, COUNT(*) AS total
-              FROM siniestros s
-              GROUP BY s.tipo_id
-              ORDER BY total DESC;
-            """)
-            result = await db.execute(sql)
-            rows = result.mappings().all()
-            return JSONResponse(content=_serialize_rows(rows))
-
-        # fallback final: contar por fecha (por día) para al menos devolver algo
-        sql = text("""
-          SELECT DATE(fecha) AS zona, COUNT(*) AS total
-          FROM siniestros
-          GROUP BY DATE(fecha)
-          ORDER BY total DESC
-          LIMIT 50;
-        """)
+        sql = text(await planes_reportes.obtener_plan(db, "siniestros-por-zona"))
         result = await db.execute(sql)
         rows = result.mappings().all()
-        return JSONResponse(content=_serialize_rows(rows))
+        return _respuesta_cacheada(clave, _serialize_rows(rows), version)
     except ProgrammingError:
         logging.exception("ProgrammingError en siniestros_por_zona")
         return JSONResponse({"detail": "Error de consulta en la base de datos"}, status_code=500)
@@ -166,66 +115,61 @@ async def estadisticas_por_tipo(db: AsyncSession = Depends(get_db)):
     Incluye total de siniestros, fallecidos, heridos y gravedad media por tipo.
     Si la tabla tipos_siniestro no existe, fallback por tipo_id.
     """
+    clave = cache_reportes.clave("estadisticas-por-tipo")
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return JSONResponse(content=cacheado)
+    version = cache_reportes.version
     try:
-        sql = text("""
-          SELECT 
-            t.nombre AS tipo, 
-            COUNT(*) AS total,
-            COALESCE(SUM(s.victimas_fatales), 0) AS fallecidos,
-            COALESCE(SUM(s.heridos), 0) AS heridos,
-            COALESCE(AVG(s.nivel_gravedad), 0) AS gravedad_media
-          FROM siniestros s
-          JOIN tipos_siniestro t ON s.tipo_id = t.id
-          GROUP BY t.nombre
-          ORDER BY total DESC;
-        """)
+        sql = text(await planes_reportes.obtener_plan(db, "estadisticas-por-tipo"))
         result = await db.execute(sql)
         rows = result.mappings().all()
-        return JSONResponse(content=_serialize_rows(rows))
-    except ProgrammingError:
-        logging.exception("Tabla 'tipos_siniestro' ausente, aplicando fallback por tipo_id")
-        try:
-            sql = text("""
-              SELECT 
-                s.tipo_id AS tipo, 
-                COUNT(*) AS total,
-                COALESCE(SUM(s.victimas_fatales), 0) AS fallecidos,
-                COALESCE(SUM(s.heridos), 0) AS heridos
-              FROM siniestros s
-              GROUP BY s.tipo_id
-              ORDER BY total DESC;
-            """)
-            result = await db.execute(sql)
-            rows = result.mappings().all()
-            return JSONResponse(content=_serialize_rows(rows))
-        except Exception:
-            logging.exception("Error fallback estadisticas_por_tipo")
-            return JSONResponse({"detail": "Error interno"}, status_code=500)
+        return _respuesta_cacheada(clave, _serialize_rows(rows), version)
     except Exception:
         logging.exception("Error en estadisticas_por_tipo")
         return JSONResponse({"detail": "Error interno"}, status_code=500)
 
+@router.post("/planes/refrescar")
+async def refrescar_planes(
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: dict = Depends(obtener_usuario_actual)
+):
+    """Vuelve a inspeccionar el esquema y elegir las consultas adaptativas (solo admin)"""
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo administradores pueden refrescar los planes de consulta"
+        )
+    await planes_reportes.detectar_planes(db)
+    cache_reportes.invalidar()
+    return planes_reportes.describir_planes()
+
 @router.get("/siniestros-por-dia-semana")
 async def siniestros_por_dia_semana(db: AsyncSession = Depends(get_db)):
     """
-    Compatible con MariaDB/MySQL: WEEKDAY(fecha) devuelve 0=Monday..6=Sunday,
-    sumamos 1 para obtener ISO 1..7.
+    Lee resumen_siniestros_hora, donde dia_semana ya es ISO 1..7 (1=lunes).
     Devuelve cantidad total de siniestros y fallecidos por día de la semana.
     """
+    clave = cache_reportes.clave("siniestros-por-dia-semana")
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return JSONResponse(content=cacheado)
+    version = cache_reportes.version
     try:
         sql = text("""
           SELECT 
-            (WEEKDAY(fecha) + 1) AS dia_semana,
-            COUNT(*) AS cantidad,
-            COALESCE(SUM(victimas_fatales), 0) AS fallecidos,
-            COALESCE(SUM(heridos), 0) AS heridos
-          FROM siniestros
+            dia_semana,
+            CAST(SUM(cantidad) AS SIGNED) AS cantidad,
+            CAST(SUM(fallecidos) AS SIGNED) AS fallecidos,
+            CAST(SUM(heridos) AS SIGNED) AS heridos
+          FROM resumen_siniestros_hora
+          WHERE cantidad > 0
           GROUP BY dia_semana
           ORDER BY dia_semana;
         """)
         result = await db.execute(sql)
         rows = result.mappings().all()
-        return JSONResponse(content=_serialize_rows(rows))
+        return _respuesta_cacheada(clave, _serialize_rows(rows), version)
     except Exception:
         logging.exception("Error en siniestros_por_dia_semana")
         return JSONResponse({"detail": "Error interno"}, status_code=500)
@@ -237,6 +181,11 @@ async def estadisticas(db: AsyncSession = Depends(get_db)):
     Endpoint agregado para /reportes/estadisticas.
     Devuelve estadísticas agregadas (puedes ampliar la consulta según necesites).
     """
+    clave = cache_reportes.clave("estadisticas")
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return JSONResponse(content=cacheado)
+    version = cache_reportes.version
     try:
         sql = text("""
           SELECT COUNT(*) AS total_siniestros,
@@ -246,24 +195,122 @@ async def estadisticas(db: AsyncSession = Depends(get_db)):
         """)
         result = await db.execute(sql)
         row = result.mappings().first()
-        return JSONResponse(content=_serialize_row(row))
+        return _respuesta_cacheada(clave, _serialize_row(row), version)
     except Exception as e:
         logging.exception("Error en estadisticas")
         return JSONResponse(content={"detail": "Error interno"}, status_code=500)
+
+def pesos_indice(
+    peso_siniestros: Optional[float] = Query(None, ge=0),
+    peso_delitos: Optional[float] = Query(None, ge=0),
+    multiplicador_fallecidos: Optional[float] = Query(None, ge=0)
+) -> MotorSeguridad:
+    """Pesos del índice pedidos; los no indicados son los de la configuración"""
+    return motor_seguridad.con_pesos(peso_siniestros, peso_delitos, multiplicador_fallecidos)
+
+def _clave_pesos(motor: MotorSeguridad) -> Dict:
+    return {
+        "peso_siniestros": motor.peso_siniestros,
+        "peso_delitos": motor.peso_delitos,
+        "multiplicador_fallecidos": motor.multiplicador_fallecidos,
+    }
+
 @router.get("/analisis/indice-seguridad")
-async def obtener_indice_seguridad(db: AsyncSession = Depends(get_db)):
-    return await calcular_indice_seguridad_por_avenida(db)
+async def obtener_indice_seguridad(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    vida_media_dias: Optional[float] = Query(None, gt=0),
+    motor: MotorSeguridad = Depends(pesos_indice),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Índice de seguridad por avenida. Con desde/hasta cuenta solo los hechos
+    del período; con vida_media_dias los más antiguos pesan menos (un hecho
+    de hace vida_media_dias días cuenta la mitad).
+    """
+    if desde is not None and hasta is not None and desde > hasta:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="desde debe ser anterior a hasta")
+    por_periodo = desde is not None or hasta is not None or vida_media_dias is not None
+    
+    clave = cache_reportes.clave(
+        "analisis/indice-seguridad", desde=desde, hasta=hasta,
+        vida_media_dias=vida_media_dias, **_clave_pesos(motor)
+    )
+    # Sin hasta, el decaimiento se calcula hasta hoy: la clave incluye la fecha
+    if vida_media_dias is not None and hasta is None:
+        clave += (("referencia", date.today()),)
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return cacheado
+    version = cache_reportes.version
+    if por_periodo:
+        resultado = await calcular_indice_seguridad_periodo(db, desde, hasta, vida_media_dias, motor)
+    else:
+        resultado = await calcular_indice_seguridad_por_avenida(db, motor)
+    cache_reportes.guardar(clave, resultado, version)
+    return resultado
 
 @router.get("/analisis/rutas-seguras")
 async def obtener_rutas_seguras(
-    limit: int = 5,
+    limit: int = Query(5, ge=1),
+    motor: MotorSeguridad = Depends(pesos_indice),
     db: AsyncSession = Depends(get_db)
 ):
-    return await obtener_rutas_mas_seguras(db, limit)
+    clave = cache_reportes.clave("analisis/rutas-seguras", limit=limit, **_clave_pesos(motor))
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return cacheado
+    version = cache_reportes.version
+    resultado = await obtener_rutas_mas_seguras(db, limit, motor)
+    cache_reportes.guardar(clave, resultado, version)
+    return resultado
 
 @router.get("/analisis/zonas-peligrosas")
 async def obtener_zonas_peligrosas(
-    limit: int = 5,
+    limit: int = Query(5, ge=1),
+    motor: MotorSeguridad = Depends(pesos_indice),
+    db: AsyncSession = Depends(get_db)
+):
+    clave = cache_reportes.clave("analisis/zonas-peligrosas", limit=limit, **_clave_pesos(motor))
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado is not None:
+        return cacheado
+    version = cache_reportes.version
+    resultado = await obtener_zonas_peligrosas_analisis(db, limit, motor)
+    cache_reportes.guardar(clave, resultado, version)
+    return resultado
+
+@router.post("/analisis/ruta")
+async def obtener_ruta_segura(
+    ruta: RutaRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    return await obtener_zonas_peligrosas_analisis(db, limit)
\ No newline at end of file
+    """
+    Ruta por la red de avenidas entre dos coordenadas. peso_peligro regula
+    cuánto más largo puede ser el recorrido para evitar avenidas con mayor
+    indice_peligrosidad (0 = la más corta).
+    """
+    try:
+        return await calcular_ruta(
+            db, ruta.origen_lat, ruta.origen_lon,
+            ruta.destino_lat, ruta.destino_lon, ruta.peso_peligro
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.get("/heatmap/{z}/{x}/{y}")
+async def heatmap_delitos(
+    z: int,
+    x: int,
+    y: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Mapa de calor de reportes delictivos para el tile z/x/y (Web Mercator).
+    Devuelve las celdas no vacías del tile como [bin_x, bin_y, cantidad, peso],
+    sobre una grilla de `bins` × `bins`; el peso pondera por nivel_peligrosidad
+    (baja=1, media=2, alta=3).
+    """
+    if not 0 <= z <= heatmap.ZOOM_LIMITE or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tile fuera de rango")
+    return await heatmap.obtener_tile(db, z, x, y)
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional, Union
 from config.database import get_db
-from schemas.reporte_delito import ReporteDelitoCreate, ReporteDelitoUpdate, ReporteDelitoResponse
+from schemas.reporte_delito import (
+    ReporteDelitoCreate, ReporteDelitoUpdate, ReporteDelitoResponse, ReporteDelictivoPagina
+)
 from services.reportes_delito import (
     crear_reporte_delito,
     obtener_reporte_delito_por_id,
     obtener_todos_reportes_delito,
     actualizar_reporte_delito,
     eliminar_reporte_delito,
-    contar_reportes_delito
+    contar_reportes_delito,
+    buscar_reportes_cercanos,
+    buscar_reportes_en_caja
 )
+from services.paginacion import codificar_cursor, decodificar_cursor
 
 router = APIRouter(
     prefix="/api/reportes-delito",
@@ -24,6 +31,54 @@ async def crear_reporte(
 ):
     return await crear_reporte_delito(db, reporte)
 
+# Límites de las búsquedas espaciales (acotan las celdas recorridas)
+RADIO_MAXIMO_M = 50000
+GRADOS_MAXIMOS_CAJA = 2.0
+
+# Las rutas fijas van antes de /{reporte_id}
+@router.get("/near")
+async def reportes_cercanos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0, le=RADIO_MAXIMO_M),
+    tipo_delito: Optional[str] = None,
+    nivel_peligrosidad: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Reportes a no más de radius_m metros de (lat, lon), ordenados por distancia"""
+    reportes = await buscar_reportes_cercanos(
+        db, lat, lon, radius_m, tipo_delito, nivel_peligrosidad, limit
+    )
+    return JSONResponse(content=jsonable_encoder(reportes))
+
+@router.get("/bbox")
+async def reportes_en_area(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    tipo_delito: Optional[str] = None,
+    nivel_peligrosidad: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Reportes dentro del rectángulo visible del mapa, más recientes primero"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox debe ser min_lon,min_lat,max_lon,max_lat")
+    
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="bbox fuera de rango o con mínimos mayores que máximos")
+    if max_lat - min_lat > GRADOS_MAXIMOS_CAJA or max_lon - min_lon > GRADOS_MAXIMOS_CAJA:
+        raise HTTPException(
+            status_code=400,
+            detail=f"bbox no puede abarcar más de {GRADOS_MAXIMOS_CAJA}° por lado"
+        )
+    
+    reportes = await buscar_reportes_en_caja(
+        db, (min_lat, min_lon, max_lat, max_lon), tipo_delito, nivel_peligrosidad, limit
+    )
+    return JSONResponse(content=jsonable_encoder(reportes))
+
 @router.get("/{reporte_id}", response_model=ReporteDelitoResponse)
 async def obtener_reporte(
     reporte_id: int,
@@ -34,14 +89,36 @@ async def obtener_reporte(
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
     return reporte
 
-@router.get("/", response_model=List[ReporteDelitoResponse])
+# Sin cursor: lista; con cursor: página
+@router.get("/", response_model=Union[List[ReporteDelitoResponse], ReporteDelictivoPagina])
 async def listar_reportes(
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     tipo_delito: str = None,
+    cursor: Optional[str] = Query(None, description="Paginación por cursor: vacío para la primera página"),
     db: AsyncSession = Depends(get_db)
 ):
-    return await obtener_todos_reportes_delito(db, skip, limit, tipo_delito)
+    if cursor is None:
+        return await obtener_todos_reportes_delito(db, skip, limit, tipo_delito)
+    
+    try:
+        despues_de = decodificar_cursor(cursor, 3)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    
+    # Una fila de más indica si hay página siguiente
+    reportes = await obtener_todos_reportes_delito(
+        db, 0, limit + 1, tipo_delito, despues_de=despues_de
+    )
+    hay_mas = len(reportes) > limit
+    reportes = reportes[:limit]
+    next_cursor = None
+    if hay_mas:
+        ultimo = reportes[-1]
+        next_cursor = codificar_cursor(
+            [ultimo["fecha_reporte"], ultimo["fecha_registro"], ultimo["id"]]
+        )
+    return {"items": reportes, "next_cursor": next_cursor}
 
 @router.put("/{reporte_id}", response_model=ReporteDelitoResponse)
 async def actualizar_reporte(
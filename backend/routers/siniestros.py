@@ -3,18 +3,27 @@ Router de siniestros
 Endpoints CRUD para siniestros
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
-from typing import List, Optional
-from datetime import timedelta
+from typing import List, Optional, Union
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
-from config.database import get_db
-from schemas.siniestro import SiniestroCreate, SiniestroUpdate, SiniestroOut, SiniestroResponse
+from config.database import get_db, AsyncSessionLocal
+from schemas.siniestro import (
+    SiniestroCreate, SiniestroUpdate, SiniestroResponse, SiniestroBulkResponse,
+    SiniestroListado, SiniestroPagina
+)
 from services import siniestros as siniestros_service
+from services import vehiculos as vehiculos_service
 from services.auth import obtener_usuario_actual
+from routers.auth import obtener_usuario_actual as obtener_usuario_autenticado
+from services.paginacion import codificar_cursor, decodificar_cursor
 
 router = APIRouter(prefix="/siniestros", tags=["Siniestros"])
 
@@ -22,6 +31,13 @@ router = APIRouter(prefix="/siniestros", tags=["Siniestros"])
 
 # FUNCIONES AUXILIARES
 
+# include=vehiculos anida los vehículos de cada siniestro (una consulta por página)
+INCLUDE_QUERY = Query(
+    None,
+    pattern="^vehiculos$",
+    description="`vehiculos`: agrega la lista de vehículos involucrados a cada siniestro"
+)
+
 def _sanitize_row(row: dict) -> dict:
     """Normaliza valores inconsistentes en los registros devueltos"""
     r = dict(row)
@@ -48,6 +64,25 @@ def _sanitize_row(row: dict) -> dict:
 
 
 
+# Columnas del export, en el orden del listado
+COLUMNAS_EXPORTACION = [
+    "id", "fecha", "hora", "avenida_id", "tipo_id", "nivel_gravedad",
+    "victimas_fatales", "heridos", "num_vehiculos", "dia_semana",
+    "es_fin_de_semana", "usuario_id", "observaciones", "fecha_registro",
+    "ultima_modificacion", "avenida_nombre", "tipo_nombre", "usuario_nombre"
+]
+
+
+def _fila_exportable(row: dict) -> dict:
+    """Como _sanitize_row, pero sin pasar por jsonable_encoder (fechas -> ISO)"""
+    r = _sanitize_row(row)
+    for k, v in r.items():
+        if isinstance(v, (date, datetime)):
+            r[k] = v.isoformat()
+    return r
+
+
+
 # ENDPOINTS
 
 
@@ -66,23 +101,128 @@ async def crear_siniestro(
     return await siniestros_service.crear_siniestro(db, siniestro)
 
 
-@router.get("/", response_model=List[SiniestroOut])
+@router.post("/bulk", response_model=SiniestroBulkResponse)
+async def crear_siniestros_bulk(
+    siniestros: List[dict] = Body(..., max_length=10000),
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: dict = Depends(obtener_usuario_autenticado)
+):
+    """
+    Carga masiva de siniestros (sincronización de lotes offline).
+    Cada elemento se valida como SiniestroCreate; todos quedan registrados a
+    nombre del usuario autenticado. La respuesta indica, por posición, el id
+    asignado o el motivo del rechazo.
+    """
+    if usuario_actual["rol"] not in ["admin", "editor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para crear siniestros"
+        )
+    return await siniestros_service.crear_siniestros_bulk(db, siniestros, usuario_actual["id"])
+
+
+# Sin cursor: lista; con cursor: página. Sin include=vehiculos no se agrega la clave
+@router.get(
+    "/",
+    response_model=Union[List[SiniestroListado], SiniestroPagina],
+    response_model_exclude_unset=True
+)
 async def listar_siniestros(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     avenida_id: Optional[int] = None,
     tipo_id: Optional[int] = None,
     nivel_gravedad: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Paginación por cursor: vacío para la primera página"),
+    include: Optional[str] = INCLUDE_QUERY,
     db = Depends(get_db),
     _: dict = Depends(obtener_usuario_actual)
 ):
-    """Lista siniestros con filtros opcionales"""
+    """
+    Lista siniestros con filtros opcionales.
+    Si se envía `cursor` pagina por keyset y devuelve {"items": [...], "next_cursor": ...};
+    next_cursor es null en la última página.
+    Con include=vehiculos cada siniestro trae "vehiculos", leídos con una sola
+    consulta para toda la página.
+    """
+    despues_de = None
+    if cursor is not None:
+        try:
+            despues_de = decodificar_cursor(cursor, 3)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor inválido"
+            )
+    
+    # Con cursor se pide una fila de más para saber si hay página siguiente
     raw = await siniestros_service.obtener_todos_siniestros(
-        db, skip, limit, avenida_id, tipo_id, nivel_gravedad
+        db, skip, limit if cursor is None else limit + 1,
+        avenida_id, tipo_id, nivel_gravedad, despues_de=despues_de
+    )
+    hay_mas = len(raw) > limit
+    raw = raw[:limit]
+    if include == "vehiculos":
+        await vehiculos_service.anidar_vehiculos(db, raw)
+    # Antes de jsonable_encoder, que convierte la hora (timedelta) en segundos
+    items_saneados = [_sanitize_row(r) for r in raw]
+    
+    if cursor is None:
+        return items_saneados
+    
+    next_cursor = None
+    if hay_mas:
+        ultimo = raw[-1]
+        next_cursor = codificar_cursor([ultimo["fecha"], ultimo["hora"], ultimo["id"]])
+    return {"items": items_saneados, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+async def exportar_siniestros(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    avenida_id: Optional[int] = None,
+    tipo_id: Optional[int] = None,
+    nivel_gravedad: Optional[str] = None,
+    _: dict = Depends(obtener_usuario_actual)
+):
+    """
+    Exporta todos los siniestros que cumplen los filtros como NDJSON o CSV.
+    La respuesta se transmite a medida que se leen las filas desde un cursor
+    del servidor: la memoria se mantiene constante sin importar el volumen.
+    """
+    async def generar():
+        # Sesión propia: debe vivir mientras dure la transmisión
+        async with AsyncSessionLocal() as db:
+            if formato == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORTACION)
+                writer.writeheader()
+                yield buffer.getvalue()
+            
+            async for lote in siniestros_service.iterar_siniestros(
+                db, avenida_id, tipo_id, nivel_gravedad
+            ):
+                filas = [_fila_exportable(f) for f in lote]
+                if formato == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORTACION)
+                    writer.writerows(filas)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(json.dumps(f, ensure_ascii=False) + "\n" for f in filas)
+    
+    if formato == "csv":
+        media_type = "text/csv; charset=utf-8"
+        nombre = "siniestros.csv"
+    else:
+        media_type = "application/x-ndjson"
+        nombre = "siniestros.ndjson"
+    
+    return StreamingResponse(
+        generar(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
     )
-    items = jsonable_encoder(raw)
-    items_saneados = [_sanitize_row(i) for i in items]
-    return JSONResponse(content=items_saneados)
 
 
 @router.get("/count")
@@ -103,16 +243,20 @@ async def contar_siniestros(
 @router.get("/{siniestro_id}", response_model=SiniestroResponse)
 async def obtener_siniestro(
     siniestro_id: int,
+    include: Optional[str] = INCLUDE_QUERY,
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(obtener_usuario_actual)
 ):
-    """Obtiene un siniestro por ID"""
+    """Obtiene un siniestro por ID (con include=vehiculos, junto con sus vehículos)"""
     siniestro = await siniestros_service.obtener_siniestro_por_id(db, siniestro_id)
     if not siniestro:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Siniestro no encontrado"
         )
+    if include == "vehiculos":
+        await vehiculos_service.anidar_vehiculos(db, [siniestro])
+        return JSONResponse(content=jsonable_encoder(_sanitize_row(siniestro)))
     return siniestro
 
 
@@ -32,7 +32,11 @@ from .siniestro import (
     SiniestroBase,
     SiniestroCreate, 
     SiniestroUpdate,
-    SiniestroOut
+    SiniestroOut,
+    SiniestroListado,
+    SiniestroPagina,
+    SiniestroBulkResultado,
+    SiniestroBulkResponse
 )
 
 from .vehiculo import (
@@ -47,7 +51,8 @@ from .reporte_delito import (
     ReporteDelictivoCreate,
     ReporteDelictivoUpdate,
     ReporteDelictivoOut,
-    ReporteDelictivoResponse
+    ReporteDelictivoResponse,
+    ReporteDelictivoPagina
 )
 
 __all__ = [
@@ -73,6 +78,10 @@ __all__ = [
     "SiniestroCreate",
     "SiniestroUpdate",
     "SiniestroOut",
+    "SiniestroListado",
+    "SiniestroPagina",
+    "SiniestroBulkResultado",
+    "SiniestroBulkResponse",
     "VehiculoBase",
     "VehiculoCreate",
     "VehiculoUpdate",
@@ -82,4 +91,5 @@ __all__ = [
     "ReporteDelictivoUpdate",
     "ReporteDelictivoOut",
     "ReporteDelictivoResponse",
+    "ReporteDelictivoPagina",
 ]
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
-from datetime import date, time
+from typing import List, Optional
+from datetime import date, datetime, time
 from decimal import Decimal
 
 
@@ -40,9 +40,21 @@ class ReporteDelictivoUpdate(ReporteDelictivoBase):
 class ReporteDelictivoOut(ReporteDelictivoBase):
     id: int
     usuario_id: int
-    fecha_registro: Optional[str] = None
-    ultima_modificacion: Optional[str] = None
+    fecha_registro: Optional[datetime] = None
+    ultima_modificacion: Optional[datetime] = None
     usuario_nombre: Optional[str] = None
 
 
-ReporteDelictivoResponse = ReporteDelictivoOut
\ No newline at end of file
+ReporteDelictivoResponse = ReporteDelictivoOut
+
+
+class ReporteDelictivoPagina(BaseModel):
+    """Página de la paginación por cursor; next_cursor es null en la última"""
+    items: List[ReporteDelictivoOut]
+    next_cursor: Optional[str] = None
+
+
+# Nombres que usa routers/reportes_delito.py
+ReporteDelitoCreate = ReporteDelictivoCreate
+ReporteDelitoUpdate = ReporteDelictivoUpdate
+ReporteDelitoResponse = ReporteDelictivoResponse
\ No newline at end of file
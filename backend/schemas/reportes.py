@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class ResumenGeneral(BaseModel):
@@ -68,4 +68,12 @@ class HorariosCriticos(BaseModel):
 class TopMarcas(BaseModel):
     marca: str
     cantidad: int
-    con_fallecidos: int
\ No newline at end of file
+    con_fallecidos: int
+
+class RutaRequest(BaseModel):
+    origen_lat: float = Field(..., ge=-90, le=90)
+    origen_lon: float = Field(..., ge=-180, le=180)
+    destino_lat: float = Field(..., ge=-90, le=90)
+    destino_lon: float = Field(..., ge=-180, le=180)
+    # 0: ruta más corta; valores mayores evitan avenidas peligrosas
+    peso_peligro: float = Field(1.0, ge=0, le=10)
@@ -2,9 +2,20 @@
 Schemas para Siniestro
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import date, time
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from datetime import date, datetime, time
+
+# Valores de la columna siniestros.nivel_gravedad (ENUM)
+NIVELES_GRAVEDAD = ("baja", "media", "alta")
+
+def _validar_gravedad(valor: Optional[str]) -> Optional[str]:
+    if valor is None:
+        return None
+    valor = valor.strip().lower()
+    if valor not in NIVELES_GRAVEDAD:
+        raise ValueError(f"Nivel debe ser: {', '.join(NIVELES_GRAVEDAD)}")
+    return valor
 
 class SiniestroBase(BaseModel):
     """Schema base de siniestro"""
@@ -25,6 +36,8 @@ class SiniestroCreate(SiniestroBase):
     """Schema para crear siniestro"""
     usuario_id: int = Field(..., gt=0)
     
+    _nivel_gravedad = field_validator("nivel_gravedad")(_validar_gravedad)
+    
     # NOTA: dia_semana y es_fin_de_semana se calculan automáticamente en el service
     # No es necesario que el usuario los envíe
 
@@ -33,6 +46,8 @@ class SiniestroUpdate(SiniestroBase):
     # Permitimos que todos los campos sean opcionales al actualizar
     avenida_id: Optional[int] = None
     tipo_id: Optional[int] = None
+    
+    _nivel_gravedad = field_validator("nivel_gravedad")(_validar_gravedad)
 
 class SiniestroOut(SiniestroBase):
     """Schema para respuesta de siniestro"""
@@ -42,4 +57,31 @@ class SiniestroOut(SiniestroBase):
     es_fin_de_semana: Optional[bool] = None
 
 # Alias para compatibilidad con cualquier import que espere SiniestroResponse
-SiniestroResponse = SiniestroOut
\ No newline at end of file
+SiniestroResponse = SiniestroOut
+
+class SiniestroListado(SiniestroOut):
+    """Fila de GET /siniestros/: nombres del catálogo y, con include=vehiculos, sus vehículos"""
+    usuario_id: Optional[int] = None
+    fecha_registro: Optional[datetime] = None
+    ultima_modificacion: Optional[datetime] = None
+    avenida_nombre: Optional[str] = None
+    tipo_nombre: Optional[str] = None
+    usuario_nombre: Optional[str] = None
+    vehiculos: Optional[List[dict]] = None
+
+class SiniestroPagina(BaseModel):
+    """Página de la paginación por cursor; next_cursor es null en la última"""
+    items: List[SiniestroListado]
+    next_cursor: Optional[str] = None
+
+class SiniestroBulkResultado(BaseModel):
+    """Resultado de una fila de la carga masiva"""
+    indice: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class SiniestroBulkResponse(BaseModel):
+    """Respuesta de la carga masiva de siniestros"""
+    insertados: int
+    errores: int
+    resultados: List[SiniestroBulkResultado]
@@ -0,0 +1,97 @@
+"""
+Registro diferido (write-behind) de usuarios.ultimo_acceso
+El login solo anota el acceso en memoria; una tarea de fondo vuelca los
+accesos pendientes cada pocos segundos con un único UPDATE ... CASE por lote,
+y el cierre de la aplicación vuelca lo que quede.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, text
+
+from config.database import AsyncSessionLocal
+from config.settings import settings
+
+# Usuarios por UPDATE
+TAMANO_LOTE_ACCESOS = 500
+
+# usuario_id -> último acceso aún no guardado
+_pendientes: Dict[int, datetime] = {}
+_tarea: Optional[asyncio.Task] = None
+
+
+def registrar_acceso(usuario_id: int):
+    """Anota el acceso; se guarda en el próximo volcado"""
+    _pendientes[usuario_id] = datetime.now()
+
+
+async def volcar_accesos() -> int:
+    """Guarda los accesos pendientes. Devuelve la cantidad de usuarios actualizados"""
+    if not _pendientes:
+        return 0
+
+    lote = dict(_pendientes)
+    _pendientes.clear()
+    ids = list(lote)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            for inicio in range(0, len(ids), TAMANO_LOTE_ACCESOS):
+                parte = ids[inicio:inicio + TAMANO_LOTE_ACCESOS]
+                casos = " ".join(f"WHEN :id_{n} THEN :acceso_{n}" for n in range(len(parte)))
+                valores = {"ids": parte}
+                for n, usuario_id in enumerate(parte):
+                    valores[f"id_{n}"] = usuario_id
+                    valores[f"acceso_{n}"] = lote[usuario_id]
+
+                query = text(f"""
+                    UPDATE usuarios
+                    SET ultimo_acceso = CASE id {casos} END
+                    WHERE id IN :ids
+                """).bindparams(bindparam("ids", expanding=True))
+                await db.execute(query, valores)
+            await db.commit()
+    except BaseException:
+        # También si se cancela a mitad del volcado: se reintentan en el
+        # próximo, sin pisar accesos más recientes
+        for usuario_id, acceso in lote.items():
+            _pendientes.setdefault(usuario_id, acceso)
+        raise
+
+    return len(ids)
+
+
+async def _ciclo_volcado(intervalo: float):
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await volcar_accesos()
+        except Exception:
+            logging.exception("Error al guardar ultimo_acceso")
+
+
+def iniciar_volcado_accesos():
+    """Lanza la tarea de fondo (llamar desde el lifespan)"""
+    global _tarea
+    if _tarea is None:
+        _tarea = asyncio.create_task(_ciclo_volcado(settings.ULTIMO_ACCESO_INTERVALO_SEGUNDOS))
+
+
+async def detener_volcado_accesos():
+    """Detiene la tarea de fondo y vuelca los accesos pendientes"""
+    global _tarea
+    if _tarea is not None:
+        _tarea.cancel()
+        try:
+            await _tarea
+        except asyncio.CancelledError:
+            pass
+        _tarea = None
+
+    try:
+        await volcar_accesos()
+    except Exception:
+        logging.exception("Error al guardar ultimo_acceso al cerrar")
@@ -2,17 +2,24 @@
 Servicio de autenticación y manejo de JWT
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from config.settings import settings
 from schemas.auth import TokenData
+from services.cache import cache_usuarios
+from services.accesos import registrar_acceso
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+# Marca de caché para emails sin usuario activo
+USUARIO_INEXISTENTE = object()
+
 # Configuración de bcrypt para hashear passwords
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -24,6 +31,58 @@ def hashear_password(password: str) -> str:
     """Genera hash bcrypt del password"""
     return pwd_context.hash(password)
 
+# ========================================
+# POOL DE HASH DE PASSWORDS
+# bcrypt bloquea 100-300 ms por llamada: se ejecuta en hilos aparte para no
+# frenar el event loop, con una cola acotada (429 cuando se llena)
+# ========================================
+_pool_passwords = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+# Los contadores solo se modifican desde el event loop
+_pedidos_passwords = {"en_curso": 0, "rechazados": 0}
+
+async def _en_pool_passwords(funcion: Callable, *args):
+    limite = settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_COLA
+    if _pedidos_passwords["en_curso"] >= limite:
+        _pedidos_passwords["rechazados"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas solicitudes de autenticación, intente nuevamente",
+            headers={"Retry-After": "1"},
+        )
+
+    _pedidos_passwords["en_curso"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_pool_passwords, funcion, *args)
+    finally:
+        _pedidos_passwords["en_curso"] -= 1
+
+async def verificar_password_async(password_plano: str, password_hash: str) -> bool:
+    """verificar_password en el pool de hash"""
+    return await _en_pool_passwords(verificar_password, password_plano, password_hash)
+
+async def hashear_password_async(password: str) -> str:
+    """hashear_password en el pool de hash"""
+    return await _en_pool_passwords(hashear_password, password)
+
+def estado_pool_passwords() -> dict:
+    """Ocupación del pool de hash: hilos ocupados, pedidos en cola y rechazados"""
+    workers = settings.PASSWORD_HASH_WORKERS
+    en_curso = _pedidos_passwords["en_curso"]
+    return {
+        "workers": workers,
+        "ejecutando": min(en_curso, workers),
+        "en_cola": max(en_curso - workers, 0),
+        "max_cola": settings.PASSWORD_HASH_MAX_COLA,
+        "rechazados": _pedidos_passwords["rechazados"],
+    }
+
+def cerrar_pool_passwords():
+    _pool_passwords.shutdown(wait=True)
+
 def crear_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crea token JWT"""
     to_encode = data.copy()
@@ -55,17 +114,11 @@ async def autenticar_usuario(db: AsyncSession, email: str, password: str):
     if not usuario.activo:
         return None
     
-    if not verificar_password(password, usuario.password_hash):
+    if not await verificar_password_async(password, usuario.password_hash):
         return None
     
-    # Actualizar último acceso
-    update_query = text("""
-        UPDATE usuarios
-        SET ultimo_acceso = NOW()
-        WHERE id = :id
-    """)
-    await db.execute(update_query, {"id": usuario.id})
-    await db.commit()
+    # Último acceso: se guarda en segundo plano, fuera del camino del login
+    registrar_acceso(usuario.id)
     
     return {
         "id": usuario.id,
@@ -113,6 +166,29 @@ async def obtener_usuario_por_email(db: AsyncSession, email: str):
         "ultimo_acceso": usuario.ultimo_acceso
     }
 
+async def obtener_usuario_activo(db: AsyncSession, email: str) -> Optional[dict]:
+    """
+    Usuario activo por email, a través de cache_usuarios.
+    También se cachea (con un TTL más corto) que el email no tiene usuario activo.
+    """
+    cacheado = cache_usuarios.obtener(email)
+    if cacheado is USUARIO_INEXISTENTE:
+        return None
+    if cacheado is not None:
+        return dict(cacheado)
+
+    version = cache_usuarios.version
+    usuario = await obtener_usuario_por_email(db, email)
+    if usuario is None:
+        cache_usuarios.guardar(
+            email, USUARIO_INEXISTENTE, version,
+            ttl_segundos=settings.CACHE_USUARIOS_NEGATIVO_TTL_SEGUNDOS
+        )
+        return None
+
+    cache_usuarios.guardar(email, usuario, version)
+    return dict(usuario)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 async def obtener_usuario_actual(token: str = Depends(oauth2_scheme)):
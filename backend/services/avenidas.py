@@ -6,6 +6,10 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from schemas.avenida import AvenidaCreate, AvenidaUpdate
+from services.indice_seguridad import registrar_avenida
+from services.cache import cache_reportes
+from services import catalogos
+from services.respuestas import respuesta_creada, respuesta_actualizada, cambios_de
 
 async def crear_avenida(db: AsyncSession, avenida: AvenidaCreate) -> dict:
     """Crea una nueva avenida"""
@@ -22,10 +26,14 @@ async def crear_avenida(db: AsyncSession, avenida: AvenidaCreate) -> dict:
     }
     
     result = await db.execute(query, valores)
+    avenida_id = result.lastrowid
+    await registrar_avenida(db, avenida_id)
     await db.commit()
+    cache_reportes.invalidar()
     
-    avenida_id = result.lastrowid
-    return await obtener_avenida_por_id(db, avenida_id)
+    nueva = respuesta_creada(valores, "id", avenida_id)
+    catalogos.guardar_avenida(nueva)
+    return nueva
 
 async def obtener_avenida_por_id(db: AsyncSession, avenida_id: int) -> Optional[dict]:
     """Obtiene avenida por ID"""
@@ -50,29 +58,15 @@ async def obtener_avenida_por_id(db: AsyncSession, avenida_id: int) -> Optional[
     }
 
 async def obtener_todas_avenidas(db: AsyncSession) -> List[dict]:
-    """Obtiene todas las avenidas"""
-    query = text("""
-        SELECT id, nombre, tipo, zona, longitud_km
-        FROM avenidas
-        ORDER BY nombre
-    """)
-    
-    result = await db.execute(query)
-    avenidas = result.fetchall()
-    
-    return [
-        {
-            "id": a.id,
-            "nombre": a.nombre,
-            "tipo": a.tipo,
-            "zona": a.zona,
-            "longitud_km": a.longitud_km
-        }
-        for a in avenidas
-    ]
+    """Obtiene todas las avenidas (desde el catálogo en memoria)"""
+    return await catalogos.listar_avenidas(db)
 
 async def actualizar_avenida(db: AsyncSession, avenida_id: int, avenida_update: AvenidaUpdate) -> Optional[dict]:
     """Actualiza avenida"""
+    actual = await catalogos.obtener_avenida(db, avenida_id) or await obtener_avenida_por_id(db, avenida_id)
+    if actual is None:
+        return None
+    
     campos_actualizar = []
     valores = {"id": avenida_id}
     
@@ -93,7 +87,7 @@ async def actualizar_avenida(db: AsyncSession, avenida_id: int, avenida_update:
         valores["longitud_km"] = avenida_update.longitud_km
     
     if not campos_actualizar:
-        return await obtener_avenida_por_id(db, avenida_id)
+        return actual
     
     query = text(f"""
         UPDATE avenidas
@@ -103,8 +97,11 @@ async def actualizar_avenida(db: AsyncSession, avenida_id: int, avenida_update:
     
     await db.execute(query, valores)
     await db.commit()
+    cache_reportes.invalidar()
     
-    return await obtener_avenida_por_id(db, avenida_id)
+    avenida = respuesta_actualizada(actual, cambios_de(valores))
+    catalogos.guardar_avenida(avenida)
+    return avenida
 
 async def eliminar_avenida(db: AsyncSession, avenida_id: int) -> bool:
     """Elimina avenida"""
@@ -115,5 +112,7 @@ async def eliminar_avenida(db: AsyncSession, avenida_id: int) -> bool:
     
     result = await db.execute(query, {"id": avenida_id})
     await db.commit()
+    cache_reportes.invalidar()
+    catalogos.quitar_avenida(avenida_id)
     
     return result.rowcount > 0
\ No newline at end of file
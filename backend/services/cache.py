@@ -0,0 +1,109 @@
+"""
+Caché en memoria con TTL, tamaño máximo y desalojo LRU
+Cada entrada queda asociada a la versión de datos vigente al calcularla;
+los servicios que escriben llaman a invalidar() para incrementar la versión,
+con lo que todas las entradas anteriores dejan de ser válidas.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+from config.settings import settings
+
+
+# Todas las cachés creadas, para publicar aciertos/fallos en /metrics
+caches_registradas: List["CacheTTL"] = []
+
+
+class CacheTTL:
+    """Caché LRU acotada con expiración por tiempo y contador de versión"""
+
+    def __init__(self, nombre: str, ttl_segundos: float, max_entradas: int):
+        self.nombre = nombre
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.version = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        caches_registradas.append(self)
+
+    @staticmethod
+    def clave(*partes, **params) -> Hashable:
+        """Arma una clave a partir del endpoint y sus parámetros"""
+        return partes + tuple(sorted(params.items()))
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        """Devuelve el valor guardado o None si no existe, expiró o es de otra versión"""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.fallos += 1
+            return None
+
+        version, expira, valor = entrada
+        if version != self.version or expira < time.monotonic():
+            del self._entradas[clave]
+            self.fallos += 1
+            return None
+
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return valor
+
+    def guardar(
+        self,
+        clave: Hashable,
+        valor: Any,
+        version: Optional[int] = None,
+        ttl_segundos: Optional[float] = None
+    ):
+        """
+        Guarda un valor. Si se pasa la versión leída antes de calcularlo y hubo
+        una escritura en el medio, el valor no se guarda.
+        ttl_segundos reemplaza el TTL de la caché para esta entrada.
+        """
+        if version is not None and version != self.version:
+            return
+        ttl = self.ttl_segundos if ttl_segundos is None else ttl_segundos
+        self._entradas[clave] = (self.version, time.monotonic() + ttl, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def invalidar(self):
+        """Incrementa la versión de datos y descarta las entradas existentes"""
+        self.version += 1
+        self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+# Caché de los endpoints agregados de /reportes
+cache_reportes = CacheTTL(
+    "reportes",
+    ttl_segundos=settings.CACHE_REPORTES_TTL_SEGUNDOS,
+    max_entradas=settings.CACHE_REPORTES_MAX_ENTRADAS
+)
+
+# Caché de usuarios activos por email, usada al validar tokens
+cache_usuarios = CacheTTL(
+    "usuarios",
+    ttl_segundos=settings.CACHE_USUARIOS_TTL_SEGUNDOS,
+    max_entradas=settings.CACHE_USUARIOS_MAX_ENTRADAS
+)
+
+# Nombre de usuario por id, para armar respuestas sin JOIN
+cache_nombres_usuarios = CacheTTL(
+    "nombres_usuarios",
+    ttl_segundos=settings.CACHE_USUARIOS_TTL_SEGUNDOS,
+    max_entradas=settings.CACHE_USUARIOS_MAX_ENTRADAS
+)
+
+# Tiles del mapa de calor de delitos
+cache_tiles = CacheTTL(
+    "tiles",
+    ttl_segundos=settings.CACHE_TILES_TTL_SEGUNDOS,
+    max_entradas=settings.CACHE_TILES_MAX_ENTRADAS
+)
@@ -0,0 +1,143 @@
+"""
+Catálogos en memoria para resolver nombres sin JOIN
+avenidas y tipos_siniestro son tablas chicas: se cargan completas al iniciar
+y se recargan cada CATALOGOS_TTL_SEGUNDOS. De usuarios solo se cachea el
+nombre, a medida que se pide.
+Los servicios que escriben en esas tablas actualizan el catálogo tras el commit.
+"""
+
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from typing import Dict, List, Optional, Union
+
+from config.settings import settings
+from services.cache import cache_nombres_usuarios
+
+# Orden del ENUM gravedad en MySQL (ORDER BY gravedad usa esta posición)
+ORDEN_GRAVEDAD = {"baja": 0, "media": 1, "alta": 2}
+
+_avenidas: Dict[int, dict] = {}
+_tipos: Dict[int, dict] = {}
+_cargado_en: Optional[float] = None
+
+
+async def cargar_catalogos(conn: Union[AsyncConnection, AsyncSession]):
+    """(Re)carga avenidas y tipos de siniestro completos"""
+    global _cargado_en
+    result = await conn.execute(text("""
+        SELECT id, nombre, tipo, zona, longitud_km
+        FROM avenidas
+    """))
+    avenidas = {a.id: dict(a._mapping) for a in result.fetchall()}
+
+    result = await conn.execute(text("""
+        SELECT id, nombre, gravedad, descripcion
+        FROM tipos_siniestro
+    """))
+    tipos = {t.id: dict(t._mapping) for t in result.fetchall()}
+
+    _avenidas.clear()
+    _avenidas.update(avenidas)
+    _tipos.clear()
+    _tipos.update(tipos)
+    _cargado_en = time.monotonic()
+
+
+async def asegurar_cargado(db: Union[AsyncConnection, AsyncSession]):
+    """Carga los catálogos si todavía no se cargaron o si venció su TTL"""
+    if _cargado_en is None or time.monotonic() - _cargado_en > settings.CATALOGOS_TTL_SEGUNDOS:
+        await cargar_catalogos(db)
+
+
+async def listar_avenidas(db: AsyncSession) -> List[dict]:
+    """Todas las avenidas, ordenadas por nombre"""
+    await asegurar_cargado(db)
+    return sorted((dict(a) for a in _avenidas.values()), key=lambda a: a["nombre"].casefold())
+
+
+async def listar_tipos(db: AsyncSession) -> List[dict]:
+    """Todos los tipos de siniestro, de mayor a menor gravedad y por nombre"""
+    await asegurar_cargado(db)
+    return sorted(
+        (dict(t) for t in _tipos.values()),
+        key=lambda t: (-ORDEN_GRAVEDAD.get(t["gravedad"], -1), t["nombre"].casefold())
+    )
+
+
+async def obtener_avenida(db: AsyncSession, avenida_id: int) -> Optional[dict]:
+    await asegurar_cargado(db)
+    avenida = _avenidas.get(avenida_id)
+    return dict(avenida) if avenida else None
+
+
+async def obtener_tipo(db: AsyncSession, tipo_id: int) -> Optional[dict]:
+    await asegurar_cargado(db)
+    tipo = _tipos.get(tipo_id)
+    return dict(tipo) if tipo else None
+
+
+async def nombre_usuario(db: AsyncSession, usuario_id: int) -> Optional[str]:
+    """Nombre del usuario; solo consulta la base si no está en caché"""
+    nombre = cache_nombres_usuarios.obtener(usuario_id)
+    if nombre is not None:
+        return nombre
+
+    version = cache_nombres_usuarios.version
+    result = await db.execute(
+        text("SELECT nombre FROM usuarios WHERE id = :id"), {"id": usuario_id}
+    )
+    nombre = result.scalar()
+    if nombre is not None:
+        cache_nombres_usuarios.guardar(usuario_id, nombre, version)
+    return nombre
+
+
+async def nombres_siniestro(db: AsyncSession, avenida_id: int, tipo_id: int, usuario_id: int) -> dict:
+    """avenida_nombre, tipo_nombre y usuario_nombre de un siniestro"""
+    avenida = await obtener_avenida(db, avenida_id)
+    tipo = await obtener_tipo(db, tipo_id)
+    return {
+        "avenida_nombre": avenida["nombre"] if avenida else None,
+        "tipo_nombre": tipo["nombre"] if tipo else None,
+        "usuario_nombre": await nombre_usuario(db, usuario_id),
+    }
+
+
+async def decorar_siniestros(db: AsyncSession, siniestros: List[dict], recargar: bool = True) -> List[dict]:
+    """
+    Agrega avenida_nombre y tipo_nombre a filas de siniestros leídas sin JOIN.
+    recargar=False evita consultar la base (p. ej. con un cursor de streaming abierto).
+    """
+    if recargar:
+        await asegurar_cargado(db)
+
+        # Un id desconocido puede venir de una escritura hecha en otro proceso
+        if any(s["avenida_id"] not in _avenidas or s["tipo_id"] not in _tipos for s in siniestros):
+            await cargar_catalogos(db)
+
+    for s in siniestros:
+        avenida = _avenidas.get(s["avenida_id"])
+        tipo = _tipos.get(s["tipo_id"])
+        s["avenida_nombre"] = avenida["nombre"] if avenida else None
+        s["tipo_nombre"] = tipo["nombre"] if tipo else None
+    return siniestros
+
+
+# ========================================
+# ACTUALIZACIÓN (después del commit)
+# ========================================
+def guardar_avenida(avenida: dict):
+    _avenidas[avenida["id"]] = dict(avenida)
+
+
+def quitar_avenida(avenida_id: int):
+    _avenidas.pop(avenida_id, None)
+
+
+def guardar_tipo(tipo: dict):
+    _tipos[tipo["id"]] = dict(tipo)
+
+
+def quitar_tipo(tipo_id: int):
+    _tipos.pop(tipo_id, None)
@@ -0,0 +1,128 @@
+"""
+Servicio de grilla espacial para reportes delictivos
+Cada reporte guarda la celda (celda_lat, celda_lon) en la que cae y la tabla
+avenida_celdas relaciona cada avenida con las celdas que le corresponden,
+de modo que el cruce delitos-avenidas se resuelve con un JOIN indexado.
+El mismo índice (celda_lat, celda_lon) sirve para las búsquedas por radio y
+por rectángulo: se recorren solo las celdas que cubren el área y después se
+filtra por distancia exacta (haversine).
+"""
+
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from typing import Tuple, Union
+
+# Tamaño de celda en grados (0.01° ≈ 1.1 km). Coincide con la precisión
+# ROUND(x, 2) que usaba el cálculo original del índice de seguridad.
+TAMANO_CELDA = Decimal("0.01")
+
+# Expresiones SQL para calcular la celda a partir de una coordenada
+SQL_CELDA_LAT = "ROUND(latitud / :tamano_celda)"
+SQL_CELDA_LON = "ROUND(longitud / :tamano_celda)"
+
+RADIO_TIERRA_M = 6371008.8
+
+# Distancia en metros de (r.latitud, r.longitud) a (:lat_centro, :lon_centro)
+SQL_DISTANCIA_M = f"""
+    {RADIO_TIERRA_M} * 2 * ASIN(SQRT(
+        POW(SIN(RADIANS(r.latitud - :lat_centro) / 2), 2)
+        + COS(RADIANS(:lat_centro)) * COS(RADIANS(r.latitud))
+        * POW(SIN(RADIANS(r.longitud - :lon_centro) / 2), 2)
+    ))
+"""
+
+# Rectángulo: (min_lat, min_lon, max_lat, max_lon)
+Caja = Tuple[float, float, float, float]
+
+
+def celda(coordenada) -> int:
+    """Celda de una coordenada, redondeando igual que ROUND() de MySQL"""
+    return int((Decimal(str(coordenada)) / TAMANO_CELDA).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def caja_de_radio(lat: float, lon: float, radio_m: float) -> Caja:
+    """Rectángulo mínimo que contiene al círculo de radio_m metros alrededor de (lat, lon)"""
+    angulo = radio_m / RADIO_TIERRA_M
+    delta_lat = math.degrees(angulo)
+    min_lat = max(lat - delta_lat, -90.0)
+    max_lat = min(lat + delta_lat, 90.0)
+    # Mayor diferencia de longitud de un punto del círculo (sobre la esfera)
+    seno = math.sin(angulo) / max(math.cos(math.radians(lat)), 1e-12)
+    if seno >= 1 or min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    delta_lon = math.degrees(math.asin(seno))
+    return min_lat, max(lon - delta_lon, -180.0), max_lat, min(lon + delta_lon, 180.0)
+
+
+def distancia_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia haversine en metros"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return RADIO_TIERRA_M * 2 * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def condicion_caja(caja: Caja, alias: str = "r"):
+    """
+    WHERE para los reportes dentro del rectángulo, resuelto con el índice
+    (celda_lat, celda_lon): una lista de celda_lat y un rango de celda_lon por
+    cada una. Devuelve (sql, valores, bindparam) para usar con text().bindparams().
+    """
+    min_lat, min_lon, max_lat, max_lon = caja
+    sql = f"""
+        {alias}.celda_lat IN :celdas_lat
+        AND {alias}.celda_lon BETWEEN :celda_lon_min AND :celda_lon_max
+        AND {alias}.latitud BETWEEN :caja_min_lat AND :caja_max_lat
+        AND {alias}.longitud BETWEEN :caja_min_lon AND :caja_max_lon
+    """
+    valores = {
+        "celdas_lat": list(range(celda(min_lat), celda(max_lat) + 1)),
+        "celda_lon_min": celda(min_lon),
+        "celda_lon_max": celda(max_lon),
+        "caja_min_lat": min_lat,
+        "caja_max_lat": max_lat,
+        "caja_min_lon": min_lon,
+        "caja_max_lon": max_lon,
+    }
+    return sql, valores, bindparam("celdas_lat", expanding=True)
+
+
+async def vincular_celda_reporte(db: AsyncSession, reporte_id: int):
+    """
+    Asocia la celda de un reporte con las avenidas que pasan por ella.
+    Una avenida corresponde a todas las celdas de su franja de latitud aproximada.
+    No hace commit: se ejecuta dentro de la transacción del alta/modificación.
+    """
+    query = text("""
+        INSERT IGNORE INTO avenida_celdas (avenida_id, celda_lat, celda_lon)
+        SELECT a.id, rd.celda_lat, rd.celda_lon
+        FROM reportes_delictivos rd
+        INNER JOIN avenidas a ON ROUND(a.latitud_aprox / :tamano_celda) = rd.celda_lat
+        WHERE rd.id = :id AND rd.celda_lat IS NOT NULL
+    """)
+    await db.execute(query, {"id": reporte_id, "tamano_celda": TAMANO_CELDA})
+
+
+async def reconstruir_celdas(conn: Union[AsyncConnection, AsyncSession]):
+    """
+    Completa las celdas de los reportes que aún no la tienen y regenera
+    el mapeo avenida -> celdas (ver services/mantenimiento.py)
+    """
+    await conn.execute(text(f"""
+        UPDATE reportes_delictivos
+        SET celda_lat = {SQL_CELDA_LAT},
+            celda_lon = {SQL_CELDA_LON}
+        WHERE celda_lat IS NULL AND latitud IS NOT NULL AND longitud IS NOT NULL
+    """), {"tamano_celda": TAMANO_CELDA})
+
+    await conn.execute(text("""
+        INSERT IGNORE INTO avenida_celdas (avenida_id, celda_lat, celda_lon)
+        SELECT DISTINCT a.id, rd.celda_lat, rd.celda_lon
+        FROM avenidas a
+        INNER JOIN reportes_delictivos rd
+            ON rd.celda_lat = ROUND(a.latitud_aprox / :tamano_celda)
+        WHERE a.latitud_aprox IS NOT NULL
+    """), {"tamano_celda": TAMANO_CELDA})
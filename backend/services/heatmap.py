@@ -0,0 +1,196 @@
+"""
+Mapa de calor de reportes delictivos por tiles (z/x/y, Web Mercator)
+Cada tile se divide en BINS_POR_LADO × BINS_POR_LADO celdas. La tabla
+heatmap_delitos guarda, para cada zoom entre ZOOM_MIN y ZOOM_MAX, la cantidad
+de reportes y su peso (según nivel_peligrosidad) por celda. Se ajusta al
+crear, modificar o eliminar reportes (reconstrucción: services/mantenimiento.py).
+- Zoom menor a ZOOM_MIN: se agrupan las celdas de ZOOM_MIN
+- Zoom mayor a ZOOM_MAX: el tile es chico; se agrupan los reportes al vuelo
+  usando la grilla espacial
+Los tiles calculados se guardan en cache_tiles.
+"""
+
+import math
+from collections import defaultdict
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from typing import Union
+
+from services.cache import cache_tiles
+from services.grilla_espacial import condicion_caja
+
+ZOOM_MIN = 10
+ZOOM_MAX = 16
+ZOOM_LIMITE = 22
+
+# 2**BITS_BIN celdas por lado de tile (32 × 32: celdas de 8 px en tiles de 256 px)
+BITS_BIN = 5
+BINS_POR_LADO = 2 ** BITS_BIN
+
+PESOS_PELIGROSIDAD = {"baja": 1, "media": 2, "alta": 3}
+
+# Límite de latitud de Web Mercator
+LATITUD_MAXIMA = 85.0511287798
+
+_SQL_PESO = "CASE r.nivel_peligrosidad " + " ".join(
+    f"WHEN '{nivel}' THEN {peso}" for nivel, peso in PESOS_PELIGROSIDAD.items()
+) + " ELSE 1 END"
+
+_SQL_ZOOMS = " UNION ALL ".join(f"SELECT {z} AS zoom" for z in range(ZOOM_MIN, ZOOM_MAX + 1))
+
+# Celda global (en todo el mundo) de cada reporte para cada zoom guardado.
+# Tanto el ajuste incremental como la reconstrucción usan estas mismas
+# expresiones, así una resta cae siempre en la celda de la suma.
+_SQL_CELDAS_REPORTES = f"""
+    SELECT
+        z.zoom,
+        LEAST(FLOOR((r.longitud + 180) / 360 * POW(2, z.zoom + {BITS_BIN})),
+              POW(2, z.zoom + {BITS_BIN}) - 1) AS gx,
+        LEAST(FLOOR((1 - LN(TAN(RADIANS(LEAST(GREATEST(r.latitud, -{LATITUD_MAXIMA}), {LATITUD_MAXIMA})))
+                           + 1 / COS(RADIANS(LEAST(GREATEST(r.latitud, -{LATITUD_MAXIMA}), {LATITUD_MAXIMA})))) / PI())
+                    / 2 * POW(2, z.zoom + {BITS_BIN})),
+              POW(2, z.zoom + {BITS_BIN}) - 1) AS gy,
+        {_SQL_PESO} AS peso
+    FROM reportes_delictivos r
+    CROSS JOIN ({_SQL_ZOOMS}) z
+    WHERE r.latitud IS NOT NULL AND r.longitud IS NOT NULL
+"""
+
+
+async def ajustar_reporte(db: AsyncSession, reporte_id: int, signo: int):
+    """
+    Suma (signo=1) o resta (signo=-1) un reporte en todos los zooms, según sus
+    valores actuales en la tabla: restar antes de modificarlo o borrarlo y
+    sumar después de insertarlo o modificarlo. No hace commit.
+    """
+    await db.execute(text(f"""
+        INSERT INTO heatmap_delitos (zoom, tile_x, tile_y, bin_x, bin_y, cantidad, peso)
+        SELECT
+            c.zoom, c.gx DIV {BINS_POR_LADO}, c.gy DIV {BINS_POR_LADO},
+            c.gx MOD {BINS_POR_LADO}, c.gy MOD {BINS_POR_LADO},
+            :signo, :signo * c.peso
+        FROM ({_SQL_CELDAS_REPORTES} AND r.id = :id) c
+        ON DUPLICATE KEY UPDATE
+            cantidad = cantidad + VALUES(cantidad),
+            peso = peso + VALUES(peso)
+    """), {"id": reporte_id, "signo": signo})
+
+
+async def reconstruir_heatmap(conn: Union[AsyncConnection, AsyncSession]):
+    """Recalcula todas las celdas a partir de reportes_delictivos"""
+    await conn.execute(text("DELETE FROM heatmap_delitos"))
+    await conn.execute(text(f"""
+        INSERT INTO heatmap_delitos (zoom, tile_x, tile_y, bin_x, bin_y, cantidad, peso)
+        SELECT
+            c.zoom, c.gx DIV {BINS_POR_LADO}, c.gy DIV {BINS_POR_LADO},
+            c.gx MOD {BINS_POR_LADO}, c.gy MOD {BINS_POR_LADO},
+            COUNT(*), SUM(c.peso)
+        FROM ({_SQL_CELDAS_REPORTES}) c
+        GROUP BY c.zoom, c.gx, c.gy
+    """))
+
+
+# ========================================
+# LECTURA DE TILES
+# ========================================
+def _lon_de_x(x: float, z: int) -> float:
+    return x / 2 ** z * 360 - 180
+
+
+def _lat_de_y(y: float, z: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** z))))
+
+
+def _xy_global(lat: float, lon: float, z: int):
+    """Coordenadas Mercator normalizadas × 2**z (como _SQL_CELDAS_REPORTES)"""
+    lat = min(max(lat, -LATITUD_MAXIMA), LATITUD_MAXIMA)
+    n = 2 ** z
+    x = (lon + 180) / 360 * n
+    phi = math.radians(lat)
+    y = (1 - math.log(math.tan(phi) + 1 / math.cos(phi)) / math.pi) / 2 * n
+    return min(int(x), n - 1), min(int(y), n - 1)
+
+
+async def _celdas_guardadas(db: AsyncSession, z: int, x: int, y: int) -> list:
+    result = await db.execute(text("""
+        SELECT bin_x, bin_y, cantidad, peso
+        FROM heatmap_delitos
+        WHERE zoom = :zoom AND tile_x = :x AND tile_y = :y AND cantidad > 0
+    """), {"zoom": z, "x": x, "y": y})
+    return [list(r) for r in result.fetchall()]
+
+
+async def _celdas_agrupadas(db: AsyncSession, z: int, x: int, y: int) -> list:
+    """Zoom bajo: une las celdas de ZOOM_MIN que caen en el tile"""
+    d = ZOOM_MIN - z
+    result = await db.execute(text(f"""
+        SELECT
+            ((tile_x * {BINS_POR_LADO} + bin_x) >> :d) - :x * {BINS_POR_LADO} AS bx,
+            ((tile_y * {BINS_POR_LADO} + bin_y) >> :d) - :y * {BINS_POR_LADO} AS by_,
+            CAST(SUM(cantidad) AS SIGNED) AS cantidad,
+            CAST(SUM(peso) AS SIGNED) AS peso
+        FROM heatmap_delitos
+        WHERE zoom = :zoom
+          AND tile_x BETWEEN :x_min AND :x_max
+          AND tile_y BETWEEN :y_min AND :y_max
+          AND cantidad > 0
+        GROUP BY bx, by_
+    """), {
+        "zoom": ZOOM_MIN, "d": d, "x": x, "y": y,
+        "x_min": x << d, "x_max": ((x + 1) << d) - 1,
+        "y_min": y << d, "y_max": ((y + 1) << d) - 1,
+    })
+    return [list(r) for r in result.fetchall()]
+
+
+async def _celdas_al_vuelo(db: AsyncSession, z: int, x: int, y: int) -> list:
+    """Zoom alto: agrupa los reportes del tile (área chica, leída por la grilla)"""
+    caja = (_lat_de_y(y + 1, z), _lon_de_x(x, z), _lat_de_y(y, z), _lon_de_x(x + 1, z))
+    condicion, valores, celdas = condicion_caja(caja)
+    result = await db.execute(text(f"""
+        SELECT r.latitud, r.longitud, r.nivel_peligrosidad
+        FROM reportes_delictivos r
+        WHERE {condicion}
+    """).bindparams(celdas), valores)
+
+    zoom_bins = z + BITS_BIN
+    agrupadas = defaultdict(lambda: [0, 0])
+    for r in result.fetchall():
+        gx, gy = _xy_global(float(r.latitud), float(r.longitud), zoom_bins)
+        bx, by = gx - x * BINS_POR_LADO, gy - y * BINS_POR_LADO
+        # La caja de la grilla puede incluir puntos del borde de tiles vecinos
+        if 0 <= bx < BINS_POR_LADO and 0 <= by < BINS_POR_LADO:
+            celda = agrupadas[(bx, by)]
+            celda[0] += 1
+            celda[1] += PESOS_PELIGROSIDAD.get(r.nivel_peligrosidad, 1)
+    return [[bx, by, c, p] for (bx, by), (c, p) in agrupadas.items()]
+
+
+async def obtener_tile(db: AsyncSession, z: int, x: int, y: int) -> dict:
+    """
+    Celdas no vacías del tile como [bin_x, bin_y, cantidad, peso], con
+    bin_x/bin_y entre 0 y BINS_POR_LADO - 1 (origen arriba a la izquierda)
+    """
+    clave = cache_tiles.clave("delitos", z, x, y)
+    cacheado = cache_tiles.obtener(clave)
+    if cacheado is not None:
+        return cacheado
+    version = cache_tiles.version
+
+    if z < ZOOM_MIN:
+        celdas = await _celdas_agrupadas(db, z, x, y)
+    elif z <= ZOOM_MAX:
+        celdas = await _celdas_guardadas(db, z, x, y)
+    else:
+        celdas = await _celdas_al_vuelo(db, z, x, y)
+
+    tile = {
+        "z": z,
+        "x": x,
+        "y": y,
+        "bins": BINS_POR_LADO,
+        "max_peso": max((c[3] for c in celdas), default=0),
+        "celdas": sorted(celdas),
+    }
+    cache_tiles.guardar(clave, tile, version)
+    return tile
@@ -0,0 +1,154 @@
+"""
+Servicio de mantenimiento del índice de seguridad por avenida
+La tabla indice_seguridad_avenida guarda los totales y el índice ya calculado
+de cada avenida. Se ajusta de forma incremental en cada alta, modificación o
+baja de siniestros y reportes delictivos; la reconstrucción completa está en
+services/mantenimiento.py.
+"""
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from typing import List, Union
+
+from services.motor_seguridad import NIVELES_SEGURIDAD, UMBRALES_NIVEL, motor_seguridad
+
+_SQL_NIVELES = "\n        ".join(
+    f"WHEN indice_peligrosidad <= {umbral} THEN '{nivel}'"
+    for umbral, nivel in zip(UMBRALES_NIVEL, NIVELES_SEGURIDAD)
+)
+
+# Recalcula índice y nivel a partir de los totales de la misma fila, con los
+# pesos y umbrales del motor de puntaje (ver docs/database.md).
+# MySQL evalúa el SET de izquierda a derecha, por eso nivel_seguridad
+# usa el indice_peligrosidad recién asignado.
+_SQL_INDICE = f"""ROUND(
+        ({motor_seguridad.peso_siniestros} * total_siniestros
+         + {motor_seguridad.peso_delitos} * total_delitos)
+        * IF(total_fallecidos > 0, {motor_seguridad.multiplicador_fallecidos}, 1), 2)"""
+
+SQL_RECALCULAR = f"""
+    indice_peligrosidad = {_SQL_INDICE},
+    nivel_seguridad = CASE
+        {_SQL_NIVELES}
+        ELSE '{NIVELES_SEGURIDAD[-1]}'
+    END
+"""
+
+
+async def registrar_avenida(db: AsyncSession, avenida_id: int):
+    """Crea la fila (en cero) de una avenida nueva"""
+    await db.execute(
+        text("INSERT IGNORE INTO indice_seguridad_avenida (avenida_id) VALUES (:id)"),
+        {"id": avenida_id}
+    )
+
+
+async def ajustar_siniestros(
+    db: AsyncSession,
+    avenida_id: int,
+    siniestros: int,
+    fallecidos: int,
+    heridos: int
+):
+    """
+    Suma (o resta, con valores negativos) siniestros, fallecidos y heridos
+    a una avenida y recalcula su índice. No hace commit.
+    """
+    await registrar_avenida(db, avenida_id)
+    query = text(f"""
+        UPDATE indice_seguridad_avenida
+        SET total_siniestros = total_siniestros + :siniestros,
+            total_fallecidos = total_fallecidos + :fallecidos,
+            total_heridos = total_heridos + :heridos,
+            {SQL_RECALCULAR}
+        WHERE avenida_id = :avenida_id
+    """)
+    await db.execute(query, {
+        "avenida_id": avenida_id,
+        "siniestros": siniestros,
+        "fallecidos": fallecidos or 0,
+        "heridos": heridos or 0
+    })
+
+
+async def avenidas_de_reporte(db: AsyncSession, reporte_id: int) -> List[int]:
+    """Avenidas a las que se asigna un reporte delictivo según su celda"""
+    query = text("""
+        SELECT ac.avenida_id
+        FROM reportes_delictivos rd
+        INNER JOIN avenida_celdas ac
+            ON ac.celda_lat = rd.celda_lat AND ac.celda_lon = rd.celda_lon
+        WHERE rd.id = :id
+    """)
+    result = await db.execute(query, {"id": reporte_id})
+    return [r.avenida_id for r in result.fetchall()]
+
+
+async def ajustar_delitos(db: AsyncSession, avenida_ids: List[int], delitos: int):
+    """Suma (o resta) delitos a varias avenidas y recalcula su índice. No hace commit."""
+    if not avenida_ids:
+        return
+    query = text(f"""
+        UPDATE indice_seguridad_avenida
+        SET total_delitos = total_delitos + :delitos,
+            {SQL_RECALCULAR}
+        WHERE avenida_id IN :avenida_ids
+    """).bindparams(bindparam("avenida_ids", expanding=True))
+    await db.execute(query, {"avenida_ids": list(avenida_ids), "delitos": delitos})
+
+
+async def reconstruir_indice_seguridad(conn: Union[AsyncConnection, AsyncSession]):
+    """
+    Recalcula la tabla completa desde siniestros y reportes_delictivos.
+    Recorre ambas tablas enteras: ver services/mantenimiento.py.
+    """
+    await conn.execute(text("""
+        INSERT INTO indice_seguridad_avenida (
+            avenida_id, total_siniestros, total_fallecidos, total_heridos, total_delitos
+        )
+        SELECT
+            a.id,
+            COALESCE(s.total_siniestros, 0),
+            COALESCE(s.total_fallecidos, 0),
+            COALESCE(s.total_heridos, 0),
+            COALESCE(d.total_delitos, 0)
+        FROM avenidas a
+        LEFT JOIN (
+            SELECT
+                avenida_id,
+                COUNT(*) AS total_siniestros,
+                SUM(victimas_fatales) AS total_fallecidos,
+                SUM(heridos) AS total_heridos
+            FROM siniestros
+            GROUP BY avenida_id
+        ) s ON s.avenida_id = a.id
+        LEFT JOIN (
+            SELECT ac.avenida_id, COUNT(*) AS total_delitos
+            FROM avenida_celdas ac
+            INNER JOIN reportes_delictivos rd
+                ON rd.celda_lat = ac.celda_lat AND rd.celda_lon = ac.celda_lon
+            GROUP BY ac.avenida_id
+        ) d ON d.avenida_id = a.id
+        ON DUPLICATE KEY UPDATE
+            total_siniestros = VALUES(total_siniestros),
+            total_fallecidos = VALUES(total_fallecidos),
+            total_heridos = VALUES(total_heridos),
+            total_delitos = VALUES(total_delitos)
+    """))
+    await recalcular_indices(conn)
+
+
+async def recalcular_indices(conn: Union[AsyncConnection, AsyncSession]):
+    """Índice y nivel de todas las avenidas desde sus totales (una fila por avenida)"""
+    await conn.execute(text(f"UPDATE indice_seguridad_avenida SET {SQL_RECALCULAR}"))
+
+
+async def pesos_desactualizados(conn: Union[AsyncConnection, AsyncSession]) -> bool:
+    """True si algún índice guardado no coincide con los pesos de la configuración"""
+    result = await conn.execute(text(f"""
+        SELECT EXISTS (
+            SELECT 1 FROM indice_seguridad_avenida
+            WHERE indice_peligrosidad <> {_SQL_INDICE}
+        )
+    """))
+    return bool(result.scalar())
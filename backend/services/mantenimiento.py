@@ -0,0 +1,110 @@
+"""
+Reconstrucción de las tablas agregadas
+avenida_celdas, indice_seguridad_avenida, resumen_siniestros_hora,
+resumen_avenida_dia y heatmap_delitos se mantienen de forma incremental con
+cada escritura. Reconstruirlas recorre siniestros y reportes_delictivos
+completas, por eso no se hace en cada inicio:
+- Al iniciar, solo las tablas vacías (primer arranque o tabla nueva), salvo
+  con RECONSTRUIR_AGREGADOS_AL_INICIAR
+- A pedido: POST /admin/agregados/reconstruir, `python -m services.mantenimiento`
+  o al terminar database/import_data.py
+GET_LOCK serializa la reconstrucción entre workers y procesos: el resto espera
+y, al obtener el bloqueo, vuelve a revisar qué falta.
+"""
+
+import argparse
+import asyncio
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from typing import List
+
+from services import indice_seguridad
+from services.grilla_espacial import reconstruir_celdas
+from services.heatmap import reconstruir_heatmap
+from services.resumen_temporal import reconstruir_resumen_temporal, reconstruir_resumen_diario
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_BLOQUEO = "rutasegura_agregados"
+
+# Segundos que un worker espera a que otro termine de reconstruir
+ESPERA_BLOQUEO_SEGUNDOS = 600
+
+# (tabla, función, tablas de las que se calcula), en orden de dependencia
+AGREGADOS = (
+    ("avenida_celdas", reconstruir_celdas, ()),
+    ("indice_seguridad_avenida", indice_seguridad.reconstruir_indice_seguridad, ("avenida_celdas",)),
+    ("resumen_siniestros_hora", reconstruir_resumen_temporal, ()),
+    ("resumen_avenida_dia", reconstruir_resumen_diario, ("avenida_celdas",)),
+    ("heatmap_delitos", reconstruir_heatmap, ()),
+)
+
+
+async def _vacia(conn: AsyncConnection, tabla: str) -> bool:
+    result = await conn.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {tabla})"))
+    return bool(result.scalar())
+
+
+async def _pendientes(conn: AsyncConnection, forzar: bool) -> List[str]:
+    """Tablas a reconstruir: vacías o calculadas desde una que se reconstruye"""
+    pendientes: List[str] = []
+    for tabla, _, origenes in AGREGADOS:
+        if forzar or any(o in pendientes for o in origenes) or await _vacia(conn, tabla):
+            pendientes.append(tabla)
+    return pendientes
+
+
+async def reconstruir_agregados(
+    engine: AsyncEngine,
+    forzar: bool = False,
+    espera: int = ESPERA_BLOQUEO_SEGUNDOS
+) -> List[str]:
+    """
+    Reconstruye las tablas agregadas vacías (todas con forzar) y recalcula el
+    índice si cambiaron los pesos de la configuración. Devuelve las tablas
+    reconstruidas. Lanza TimeoutError si otro proceso retiene el bloqueo.
+    """
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT GET_LOCK(:nombre, :espera)"),
+            {"nombre": NOMBRE_BLOQUEO, "espera": espera}
+        )
+        if result.scalar() != 1:
+            raise TimeoutError("Otro proceso está reconstruyendo las tablas agregadas")
+        # El bloqueo es de la sesión: se confirma para leer lo que dejó el worker anterior
+        await conn.commit()
+        try:
+            pendientes = await _pendientes(conn, forzar)
+            for tabla, reconstruir, _ in AGREGADOS:
+                if tabla in pendientes:
+                    await reconstruir(conn)
+            if "indice_seguridad_avenida" not in pendientes and await indice_seguridad.pesos_desactualizados(conn):
+                await indice_seguridad.recalcular_indices(conn)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        finally:
+            await conn.execute(text("DO RELEASE_LOCK(:nombre)"), {"nombre": NOMBRE_BLOQUEO})
+            await conn.commit()
+
+    if pendientes:
+        logger.info("Tablas agregadas reconstruidas: %s", ", ".join(pendientes))
+    return pendientes
+
+
+async def _main(forzar: bool):
+    from config.database import engine
+    try:
+        tablas = await reconstruir_agregados(engine, forzar)
+    finally:
+        await engine.dispose()
+    print(f"✓ Reconstruidas: {', '.join(tablas) or 'ninguna'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye las tablas agregadas")
+    parser.add_argument("--forzar", action="store_true",
+                        help="reconstruye todas, no solo las vacías")
+    asyncio.run(_main(parser.parse_args().forzar))
@@ -0,0 +1,294 @@
+"""
+Métricas en formato de texto de Prometheus (GET /metrics)
+- Latencia por ruta (histograma), respuestas por código y pedidos en curso,
+  medidos por MiddlewareMetricas
+- Pool de conexiones de SQLAlchemy: ocupadas, libres, overflow y espera
+- Retraso (lag) del event loop, medido por una tarea de fondo
+- Aciertos y fallos de todas las cachés CacheTTL
+- Duración de las consultas SQL por sitio de llamada (config/instrumentacion.py)
+- Ocupación del pool de hash de passwords
+"""
+
+import asyncio
+import bisect
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from config.database import engine
+from config.instrumentacion import BUCKETS_MS, espera_pool, estadisticas_consultas
+from config.settings import settings
+from services.auth import estado_pool_passwords
+from services.cache import caches_registradas
+
+PREFIJO = "rutasegura"
+
+# Límite superior (segundos) de los buckets de latencia HTTP y lag del event loop
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Ruta de los pedidos que no coinciden con ningún endpoint (evita una serie por URL)
+RUTA_DESCONOCIDA = "(sin ruta)"
+
+
+class Histograma:
+    """Cuentas por bucket (no acumuladas), suma y cantidad"""
+
+    def __init__(self, limites=BUCKETS_SEGUNDOS):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, valor: float):
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+
+# ========================================
+# PEDIDOS HTTP
+# ========================================
+class MetricasHttp:
+    def __init__(self):
+        self.latencias: Dict[Tuple[str, str], Histograma] = defaultdict(Histograma)
+        self.respuestas: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.en_curso: Dict[str, int] = defaultdict(int)
+
+    def registrar(self, metodo: str, ruta: str, codigo: int, segundos: float):
+        self.latencias[(metodo, ruta)].observar(segundos)
+        self.respuestas[(metodo, ruta, codigo)] += 1
+
+
+metricas_http = MetricasHttp()
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mide cada pedido HTTP hasta el último byte enviado
+    (incluye respuestas en streaming). La ruta es la plantilla del endpoint
+    (p. ej. /siniestros/{siniestro_id}), no la URL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        codigo = 500
+
+        async def enviar(mensaje):
+            nonlocal codigo
+            if mensaje["type"] == "http.response.start":
+                codigo = mensaje["status"]
+            await send(mensaje)
+
+        metricas_http.en_curso[metodo] += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            metricas_http.en_curso[metodo] -= 1
+            # El router de FastAPI deja en el scope la ruta que coincidió
+            ruta = getattr(scope.get("route"), "path", None) or RUTA_DESCONOCIDA
+            metricas_http.registrar(metodo, ruta, codigo, time.perf_counter() - inicio)
+
+
+# ========================================
+# LAG DEL EVENT LOOP
+# ========================================
+class LagEventLoop:
+    def __init__(self):
+        self.ultimo = 0.0
+        self.maximo = 0.0
+        self.histograma = Histograma()
+
+    def registrar(self, segundos: float):
+        self.ultimo = segundos
+        self.maximo = max(self.maximo, segundos)
+        self.histograma.observar(segundos)
+
+
+lag_event_loop = LagEventLoop()
+_tarea_lag: Optional[asyncio.Task] = None
+
+
+async def _ciclo_lag(intervalo: float):
+    # Cuánto más de lo pedido tarda en volver un sleep: tiempo en que el loop
+    # estuvo ocupado con otra cosa (código bloqueante, ráfagas de tareas)
+    loop = asyncio.get_running_loop()
+    while True:
+        inicio = loop.time()
+        await asyncio.sleep(intervalo)
+        lag_event_loop.registrar(max(0.0, loop.time() - inicio - intervalo))
+
+
+def iniciar_medicion_lag():
+    """Lanza la tarea de fondo (llamar desde el lifespan)"""
+    global _tarea_lag
+    if _tarea_lag is None:
+        _tarea_lag = asyncio.create_task(_ciclo_lag(settings.METRICAS_LAG_INTERVALO_SEGUNDOS))
+
+
+async def detener_medicion_lag():
+    global _tarea_lag
+    if _tarea_lag is not None:
+        _tarea_lag.cancel()
+        try:
+            await _tarea_lag
+        except asyncio.CancelledError:
+            pass
+        _tarea_lag = None
+
+
+# ========================================
+# FORMATO DE TEXTO
+# ========================================
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, bool):
+        return str(int(valor))
+    if isinstance(valor, int):
+        return str(valor)
+    return repr(float(valor))
+
+
+class Exposicion:
+    """Arma el texto de exposición, una familia de métricas por vez"""
+
+    def __init__(self):
+        self.lineas: List[str] = []
+
+    def familia(self, nombre: str, tipo: str, ayuda: str) -> str:
+        nombre = f"{PREFIJO}_{nombre}"
+        self.lineas.append(f"# HELP {nombre} {ayuda}")
+        self.lineas.append(f"# TYPE {nombre} {tipo}")
+        return nombre
+
+    def muestra(self, nombre: str, valor, **etiquetas):
+        if etiquetas:
+            texto = ",".join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items())
+            self.lineas.append(f"{nombre}{{{texto}}} {_numero(valor)}")
+        else:
+            self.lineas.append(f"{nombre} {_numero(valor)}")
+
+    def histograma(self, nombre: str, limites, cuentas, suma: float, cantidad: int, **etiquetas):
+        """cuentas: por bucket y sin acumular; el último es +Inf"""
+        acumulado = 0
+        for limite, cuenta in zip(list(limites) + ["+Inf"], cuentas):
+            acumulado += cuenta
+            le = limite if limite == "+Inf" else _numero(limite)
+            self.muestra(f"{nombre}_bucket", acumulado, **etiquetas, le=le)
+        self.muestra(f"{nombre}_sum", suma, **etiquetas)
+        self.muestra(f"{nombre}_count", cantidad, **etiquetas)
+
+    def texto(self) -> str:
+        return "\n".join(self.lineas) + "\n"
+
+
+BUCKETS_MS_EN_SEGUNDOS = tuple(ms / 1000 for ms in BUCKETS_MS)
+
+
+def _metricas_http(exp: Exposicion):
+    nombre = exp.familia("http_request_duration_seconds", "histogram", "Latencia de los pedidos HTTP por ruta")
+    for (metodo, ruta), h in sorted(metricas_http.latencias.items()):
+        exp.histograma(nombre, h.limites, h.cuentas, h.suma, h.cantidad, method=metodo, route=ruta)
+
+    nombre = exp.familia("http_responses_total", "counter", "Respuestas HTTP por ruta y código")
+    for (metodo, ruta, codigo), cantidad in sorted(metricas_http.respuestas.items()):
+        exp.muestra(nombre, cantidad, method=metodo, route=ruta, status=codigo)
+
+    nombre = exp.familia("http_requests_in_flight", "gauge", "Pedidos HTTP en curso")
+    for metodo, cantidad in sorted(metricas_http.en_curso.items()):
+        exp.muestra(nombre, cantidad, method=metodo)
+
+
+def _metricas_pool(exp: Exposicion):
+    pool = engine.sync_engine.pool
+
+    nombre = exp.familia("db_pool_size", "gauge", "Conexiones fijas del pool")
+    exp.muestra(nombre, pool.size())
+    nombre = exp.familia("db_pool_checked_out", "gauge", "Conexiones del pool en uso")
+    exp.muestra(nombre, pool.checkedout())
+    nombre = exp.familia("db_pool_checked_in", "gauge", "Conexiones del pool libres")
+    exp.muestra(nombre, pool.checkedin())
+    # QueuePool.overflow() es negativo mientras no se abrieron todas las fijas
+    nombre = exp.familia("db_pool_overflow", "gauge", "Conexiones abiertas por encima del tamaño del pool")
+    exp.muestra(nombre, max(pool.overflow(), 0))
+
+    nombre = exp.familia("db_pool_wait_seconds", "histogram", "Espera por una conexión libre del pool")
+    exp.histograma(
+        nombre, BUCKETS_MS_EN_SEGUNDOS, espera_pool.histograma_ms,
+        espera_pool.total_ms / 1000, espera_pool.cantidad
+    )
+    nombre = exp.familia("db_pool_wait_max_seconds", "gauge", "Mayor espera por una conexión del pool")
+    exp.muestra(nombre, espera_pool.max_ms / 1000)
+
+
+def _metricas_event_loop(exp: Exposicion):
+    nombre = exp.familia("event_loop_lag_seconds", "gauge", "Último retraso medido del event loop")
+    exp.muestra(nombre, lag_event_loop.ultimo)
+    nombre = exp.familia("event_loop_lag_max_seconds", "gauge", "Mayor retraso medido del event loop")
+    exp.muestra(nombre, lag_event_loop.maximo)
+    h = lag_event_loop.histograma
+    nombre = exp.familia("event_loop_lag_distribution_seconds", "histogram", "Retrasos medidos del event loop")
+    exp.histograma(nombre, h.limites, h.cuentas, h.suma, h.cantidad)
+
+
+def _metricas_caches(exp: Exposicion):
+    aciertos = exp.familia("cache_hits_total", "counter", "Aciertos de caché")
+    for cache in caches_registradas:
+        exp.muestra(aciertos, cache.aciertos, cache=cache.nombre)
+    fallos = exp.familia("cache_misses_total", "counter", "Fallos de caché")
+    for cache in caches_registradas:
+        exp.muestra(fallos, cache.fallos, cache=cache.nombre)
+    entradas = exp.familia("cache_entries", "gauge", "Entradas guardadas en caché")
+    for cache in caches_registradas:
+        exp.muestra(entradas, len(cache), cache=cache.nombre)
+
+
+def _metricas_sql(exp: Exposicion):
+    # Agrupado por sitio (no por SQL) para acotar la cantidad de series
+    por_sitio: Dict[str, List] = {}
+    for e in estadisticas_consultas.consultas():
+        acumulado = por_sitio.setdefault(e.sitio, [[0] * len(e.histograma_ms), 0.0, 0, 0])
+        acumulado[0] = [a + b for a, b in zip(acumulado[0], e.histograma_ms)]
+        acumulado[1] += e.total_ms
+        acumulado[2] += e.cantidad
+        acumulado[3] += e.lentas
+
+    nombre = exp.familia("sql_statement_duration_seconds", "histogram", "Duración de las sentencias SQL por sitio de llamada")
+    for sitio, (cuentas, total_ms, cantidad, _) in sorted(por_sitio.items()):
+        exp.histograma(nombre, BUCKETS_MS_EN_SEGUNDOS, cuentas, total_ms / 1000, cantidad, sitio=sitio)
+
+    nombre = exp.familia("sql_slow_statements_total", "counter", "Sentencias SQL que superaron SQL_LENTA_UMBRAL_MS")
+    for sitio, (_, _, _, lentas) in sorted(por_sitio.items()):
+        exp.muestra(nombre, lentas, sitio=sitio)
+
+
+def _metricas_passwords(exp: Exposicion):
+    estado = estado_pool_passwords()
+    nombre = exp.familia("password_pool_running", "gauge", "Hashes de password en ejecución")
+    exp.muestra(nombre, estado["ejecutando"])
+    nombre = exp.familia("password_pool_queued", "gauge", "Hashes de password en espera")
+    exp.muestra(nombre, estado["en_cola"])
+    nombre = exp.familia("password_pool_rejected_total", "counter", "Pedidos rechazados con 429 por cola llena")
+    exp.muestra(nombre, estado["rechazados"])
+
+
+def generar_metricas() -> str:
+    """Texto de exposición con todas las métricas"""
+    exp = Exposicion()
+    _metricas_http(exp)
+    _metricas_pool(exp)
+    _metricas_event_loop(exp)
+    _metricas_caches(exp)
+    _metricas_sql(exp)
+    _metricas_passwords(exp)
+    return exp.texto()
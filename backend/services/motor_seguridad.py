@@ -0,0 +1,92 @@
+"""
+Motor de puntaje del índice de seguridad
+Calcula índice y nivel de seguridad de muchas avenidas (o tramos) a la vez,
+sobre arreglos de NumPy con los totales por columna en lugar de fila por fila.
+Los pesos salen de la configuración (INDICE_PESO_*); services/indice_seguridad.py
+usa la misma fórmula en SQL para mantener la tabla indice_seguridad_avenida.
+"""
+
+import numpy as np
+from typing import Optional
+
+from config.settings import settings
+
+NIVELES_SEGURIDAD = ("Muy Segura", "Segura", "Moderada", "Peligrosa", "Muy Peligrosa")
+
+# Índice máximo (inclusive) de cada nivel; por encima del último, "Muy Peligrosa"
+UMBRALES_NIVEL = (0.0, 10.0, 25.0, 50.0)
+
+
+class MotorSeguridad:
+    """
+    Índice = (peso_siniestros × siniestros + peso_delitos × delitos),
+    multiplicado por multiplicador_fallecidos si hubo víctimas fatales
+    """
+
+    def __init__(self, peso_siniestros: float, peso_delitos: float, multiplicador_fallecidos: float):
+        self.peso_siniestros = float(peso_siniestros)
+        self.peso_delitos = float(peso_delitos)
+        self.multiplicador_fallecidos = float(multiplicador_fallecidos)
+        self._niveles = np.array(NIVELES_SEGURIDAD, dtype=object)
+
+    def con_pesos(
+        self,
+        peso_siniestros: Optional[float] = None,
+        peso_delitos: Optional[float] = None,
+        multiplicador_fallecidos: Optional[float] = None
+    ) -> "MotorSeguridad":
+        """Copia con los pesos indicados reemplazados"""
+        return MotorSeguridad(
+            self.peso_siniestros if peso_siniestros is None else peso_siniestros,
+            self.peso_delitos if peso_delitos is None else peso_delitos,
+            self.multiplicador_fallecidos if multiplicador_fallecidos is None else multiplicador_fallecidos,
+        )
+
+    def es_predeterminado(self) -> bool:
+        """True si usa los mismos pesos que la tabla materializada"""
+        return (
+            self.peso_siniestros == motor_seguridad.peso_siniestros
+            and self.peso_delitos == motor_seguridad.peso_delitos
+            and self.multiplicador_fallecidos == motor_seguridad.multiplicador_fallecidos
+        )
+
+    def indices(self, siniestros, delitos, fallecidos) -> np.ndarray:
+        """Índice de cada posición, redondeado a 2 decimales como en SQL"""
+        indices = self.peso_siniestros * np.asarray(siniestros, dtype=np.float64)
+        indices += self.peso_delitos * np.asarray(delitos, dtype=np.float64)
+        indices *= np.where(np.asarray(fallecidos) > 0, self.multiplicador_fallecidos, 1.0)
+        return np.round(indices, 2, out=indices)
+
+    def codigos_nivel(self, indices) -> np.ndarray:
+        """Posición en NIVELES_SEGURIDAD de cada índice (umbrales superados)"""
+        indices = np.asarray(indices)
+        codigos = np.zeros(indices.shape, dtype=np.intp)
+        # Con pocos umbrales, sumar comparaciones es más rápido que searchsorted
+        for umbral in UMBRALES_NIVEL:
+            codigos += indices > umbral
+        return codigos
+
+    def niveles(self, indices) -> np.ndarray:
+        return self._niveles[self.codigos_nivel(indices)]
+
+
+def top_k(valores, k: int, descendente: bool = True) -> np.ndarray:
+    """
+    Posiciones de los k mayores (o menores) valores, ya ordenadas.
+    argpartition separa los k primeros en O(n) y solo esos se ordenan.
+    """
+    valores = np.asarray(valores)
+    if k <= 0 or len(valores) == 0:
+        return np.empty(0, dtype=np.intp)
+    clave = -valores if descendente else valores
+    if k < len(valores):
+        candidatos = np.argpartition(clave, k - 1)[:k]
+        return candidatos[np.argsort(clave[candidatos], kind="stable")]
+    return np.argsort(clave, kind="stable")
+
+
+motor_seguridad = MotorSeguridad(
+    settings.INDICE_PESO_SINIESTROS,
+    settings.INDICE_PESO_DELITOS,
+    settings.INDICE_MULTIPLICADOR_FALLECIDOS
+)
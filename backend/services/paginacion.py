@@ -0,0 +1,100 @@
+"""
+Paginación por cursor (keyset)
+El cursor es un token opaco con los valores de ordenamiento de la última fila
+devuelta; la página siguiente se busca con WHERE (claves) < (cursor) sobre un
+índice compuesto, por lo que cualquier página cuesta lo mismo que la primera.
+"""
+
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, List, Optional, Sequence
+
+
+def _a_json(valor: Any) -> Any:
+    if isinstance(valor, timedelta):
+        return {"td": int(valor.total_seconds())}
+    if isinstance(valor, datetime):
+        return {"dt": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"d": valor.isoformat()}
+    if isinstance(valor, time):
+        return {"t": valor.isoformat()}
+    return valor
+
+
+def _desde_json(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        if "td" in valor:
+            return timedelta(seconds=int(valor["td"]))
+        if "dt" in valor:
+            return datetime.fromisoformat(valor["dt"])
+        if "d" in valor:
+            return date.fromisoformat(valor["d"])
+        if "t" in valor:
+            return time.fromisoformat(valor["t"])
+    return valor
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """Convierte los valores de ordenamiento de una fila en un cursor opaco"""
+    crudo = json.dumps([_a_json(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, cantidad: int) -> Optional[List[Any]]:
+    """
+    Devuelve los valores del cursor, o None si el cursor está vacío (primera página).
+    Lanza ValueError si el cursor no es válido.
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        crudo = base64.urlsafe_b64decode(cursor + relleno).decode("utf-8")
+        valores = [_desde_json(v) for v in json.loads(crudo)]
+    except Exception as e:
+        raise ValueError("Cursor inválido") from e
+    if len(valores) != cantidad:
+        raise ValueError("Cursor inválido")
+    return valores
+
+
+def condicion_keyset(
+    columnas: Sequence[str],
+    prefijo: str = "cursor",
+    valores: Optional[Sequence[Any]] = None,
+    nulables: Sequence[str] = ()
+) -> str:
+    """
+    Condición SQL para ordenamiento descendente por varias columnas:
+    (a < :c0) OR (a = :c0 AND b < :c1) OR (a = :c0 AND b = :c1 AND c < :c2)
+    Se expande en OR (en lugar de comparar tuplas) para que MySQL use el índice.
+
+    Las columnas de `nulables` pueden valer NULL, que con = y < nunca es
+    verdadero. En orden descendente MySQL deja los NULL al final: después de un
+    valor siguen los menores y los NULL, y después de un NULL solo otros NULL
+    (desempata la columna siguiente). Para esas columnas hacen falta los
+    `valores` del cursor.
+    """
+    def es_nulo(i: int) -> bool:
+        return columnas[i] in nulables and valores[i] is None
+
+    def igual(i: int) -> str:
+        return f"{columnas[i]} IS NULL" if es_nulo(i) else f"{columnas[i]} = :{prefijo}{i}"
+
+    partes = []
+    for i, columna in enumerate(columnas):
+        if es_nulo(i):
+            # Ningún valor va después de NULL en esta columna
+            continue
+        menor = f"{columna} < :{prefijo}{i}"
+        if columna in nulables:
+            menor = f"({menor} OR {columna} IS NULL)"
+        partes.append("(" + " AND ".join([igual(j) for j in range(i)] + [menor]) + ")")
+    return "(" + " OR ".join(partes) + ")"
+
+
+def parametros_keyset(valores: Sequence[Any], prefijo: str = "cursor") -> dict:
+    """Parámetros con nombre para condicion_keyset (los NULL no se usan)"""
+    return {f"{prefijo}{i}": v for i, v in enumerate(valores) if v is not None}
@@ -0,0 +1,121 @@
+"""
+Planes de consulta para los reportes adaptativos
+Algunos reportes eligen su SQL según las tablas y columnas disponibles.
+La detección contra information_schema se hace una sola vez (al iniciar o al
+refrescar) y cada request ejecuta directamente la consulta elegida.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from typing import Dict, Union
+
+from config.esquema import tabla_existe, columna_existe
+
+# ========================================
+# Variantes de /reportes/siniestros-por-zona
+# ========================================
+SQL_ZONA_POR_ZONAS = """
+  SELECT z.nombre AS zona, COUNT(*) AS total
+  FROM siniestros s
+  JOIN zonas z ON s.zona_id = z.id
+  GROUP BY z.nombre
+  ORDER BY total DESC;
+"""
+
+SQL_ZONA_POR_AVENIDAS = """
+  SELECT a.nombre AS zona,
+         COUNT(*) AS total_siniestros,
+         COALESCE(SUM(s.victimas_fatales), 0) AS total_fallecidos,
+         COALESCE(SUM(s.heridos), 0) AS total_heridos
+  FROM siniestros s
+  JOIN avenidas a ON s.avenida_id = a.id
+  GROUP BY a.nombre
+  ORDER BY total_siniestros DESC;
+"""
+
+SQL_ZONA_POR_TIPO = """
+  SELECT s.tipo_id AS zona, COUNT(*) AS total
+  FROM siniestros s
+  GROUP BY s.tipo_id
+  ORDER BY total DESC;
+"""
+
+SQL_ZONA_POR_FECHA = """
+  SELECT DATE(fecha) AS zona, COUNT(*) AS total
+  FROM siniestros
+  GROUP BY DATE(fecha)
+  ORDER BY total DESC
+  LIMIT 50;
+"""
+
+# ========================================
+# Variantes de /reportes/estadisticas-por-tipo
+# ========================================
+SQL_TIPO_CON_CATALOGO = """
+  SELECT
+    t.nombre AS tipo,
+    COUNT(*) AS total,
+    COALESCE(SUM(s.victimas_fatales), 0) AS fallecidos,
+    COALESCE(SUM(s.heridos), 0) AS heridos,
+    COALESCE(AVG(s.nivel_gravedad), 0) AS gravedad_media
+  FROM siniestros s
+  JOIN tipos_siniestro t ON s.tipo_id = t.id
+  GROUP BY t.nombre
+  ORDER BY total DESC;
+"""
+
+SQL_TIPO_SIN_CATALOGO = """
+  SELECT
+    s.tipo_id AS tipo,
+    COUNT(*) AS total,
+    COALESCE(SUM(s.victimas_fatales), 0) AS fallecidos,
+    COALESCE(SUM(s.heridos), 0) AS heridos
+  FROM siniestros s
+  GROUP BY s.tipo_id
+  ORDER BY total DESC;
+"""
+
+# Consultas elegidas, por nombre de reporte
+_planes: Dict[str, str] = {}
+
+
+async def detectar_planes(conn: Union[AsyncConnection, AsyncSession]) -> Dict[str, str]:
+    """Inspecciona el esquema y elige la consulta de cada reporte adaptativo"""
+    planes = {}
+
+    if await tabla_existe(conn, "zonas") and await columna_existe(conn, "siniestros", "zona_id"):
+        planes["siniestros-por-zona"] = SQL_ZONA_POR_ZONAS
+    elif await tabla_existe(conn, "avenidas") and await columna_existe(conn, "siniestros", "avenida_id"):
+        planes["siniestros-por-zona"] = SQL_ZONA_POR_AVENIDAS
+    elif await columna_existe(conn, "siniestros", "tipo_id"):
+        planes["siniestros-por-zona"] = SQL_ZONA_POR_TIPO
+    else:
+        planes["siniestros-por-zona"] = SQL_ZONA_POR_FECHA
+
+    if await tabla_existe(conn, "tipos_siniestro"):
+        planes["estadisticas-por-tipo"] = SQL_TIPO_CON_CATALOGO
+    else:
+        planes["estadisticas-por-tipo"] = SQL_TIPO_SIN_CATALOGO
+
+    _planes.clear()
+    _planes.update(planes)
+    return dict(_planes)
+
+
+async def obtener_plan(conn: Union[AsyncConnection, AsyncSession], reporte: str) -> str:
+    """Devuelve la consulta elegida; si aún no se detectó, la detecta ahora"""
+    if reporte not in _planes:
+        await detectar_planes(conn)
+    return _planes[reporte]
+
+
+def describir_planes() -> Dict[str, str]:
+    """Nombre de la variante elegida para cada reporte"""
+    nombres = {
+        SQL_ZONA_POR_ZONAS: "zonas",
+        SQL_ZONA_POR_AVENIDAS: "avenidas",
+        SQL_ZONA_POR_TIPO: "tipo_id",
+        SQL_ZONA_POR_FECHA: "fecha",
+        SQL_TIPO_CON_CATALOGO: "tipos_siniestro",
+        SQL_TIPO_SIN_CATALOGO: "tipo_id",
+    }
+    return {reporte: nombres[sql] for reporte, sql in _planes.items()}
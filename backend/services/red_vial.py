@@ -0,0 +1,316 @@
+"""
+Red vial en memoria y cálculo de la ruta más segura
+Los tramos de avenida (tabla tramos_avenida) forman un grafo: dos tramos se
+conectan cuando comparten un extremo con las mismas coordenadas. Se carga al
+iniciar y se vuelve a cargar si cambian los tramos (p. ej. tras
+database/import_data.py), lo que se revisa cada CATALOGOS_TTL_SEGUNDOS; el peligro de cada avenida sale de indice_seguridad_avenida y se
+refresca de forma incremental (solo las filas modificadas) antes de calcular
+una ruta, cuando hubo escrituras desde el último refresco.
+
+Costo de un tramo: longitud_m × (1 + peso_peligro × indice_peligrosidad / ESCALA_PELIGRO).
+Con peso_peligro = 0 la ruta es la más corta; al subirlo se aceptan desvíos
+más largos para evitar avenidas peligrosas. Como el costo nunca es menor que
+la longitud, la distancia en línea recta es una heurística admisible para A*.
+"""
+
+import heapq
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from typing import Dict, List, Optional, Tuple, Union
+
+from config.settings import settings
+from services import catalogos
+from services.cache import cache_reportes
+from services.grilla_espacial import RADIO_TIERRA_M, TAMANO_CELDA, celda, distancia_m
+from services.motor_seguridad import UMBRALES_NIVEL
+
+# indice_peligrosidad con el que un tramo cuesta el doble con peso_peligro = 1
+# (el límite de una avenida "Segura")
+ESCALA_PELIGRO = UMBRALES_NIVEL[1]
+
+# Las filas de indice_seguridad_avenida modificadas en este margen antes del
+# último refresco se vuelven a leer (cubre transacciones confirmadas tarde)
+MARGEN_REFRESCO = timedelta(seconds=60)
+
+# Anillos de celdas (≈ 1.1 km) en los que se busca un primer nodo cercano
+ANILLOS_MAXIMOS = 5
+
+
+def _distancia_fuera(lat: float, lon: float, c_lat: int, c_lon: int, anillo: int) -> float:
+    """
+    Cota inferior de la distancia de (lat, lon) a cualquier punto fuera de los
+    anillos 0..anillo: la distancia al paralelo o meridiano del borde más cercano
+    """
+    tamano = float(TAMANO_CELDA)
+    margen_lat = min(lat - (c_lat - anillo - 0.5) * tamano, (c_lat + anillo + 0.5) * tamano - lat)
+    margen_lon = min(lon - (c_lon - anillo - 0.5) * tamano, (c_lon + anillo + 0.5) * tamano - lon)
+    hasta_paralelo = RADIO_TIERRA_M * math.radians(max(margen_lat, 0.0))
+    seno = math.cos(math.radians(lat)) * math.sin(math.radians(max(margen_lon, 0.0)))
+    hasta_meridiano = RADIO_TIERRA_M * math.asin(min(seno, 1.0))
+    return min(hasta_paralelo, hasta_meridiano)
+
+
+class RedVial:
+    def __init__(self):
+        self.nodos: List[Tuple[float, float]] = []
+        # Por nodo: (nodo vecino, índice del tramo)
+        self.adyacencia: List[List[Tuple[int, int]]] = []
+        # Por tramo: (tramo_id, avenida_id, longitud_m)
+        self.tramos: List[Tuple[int, int, float]] = []
+        self.celdas: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.peligro: Dict[int, float] = {}
+        self.nivel: Dict[int, str] = {}
+        self.refrescado_hasta: Optional[datetime] = None
+        self.version_refresco: Optional[int] = None
+        self.refrescado_en = 0.0
+        # (cantidad, id máximo) de tramos_avenida al cargar
+        self.firma_tramos: Optional[Tuple[int, int]] = None
+
+    def nodo(self, lat: float, lon: float, indices: Dict[Tuple[float, float], int]) -> int:
+        clave = (lat, lon)
+        nodo = indices.get(clave)
+        if nodo is None:
+            nodo = indices[clave] = len(self.nodos)
+            self.nodos.append(clave)
+            self.adyacencia.append([])
+            self.celdas[(celda(lat), celda(lon))].append(nodo)
+        return nodo
+
+    def nodo_cercano(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        """Nodo más cercano a (lat, lon) y su distancia en metros"""
+        c_lat, c_lon = celda(lat), celda(lon)
+        mejor = None
+        anillo = 0
+        # Sin ningún nodo dentro de ANILLOS_MAXIMOS, el punto está lejos de la red
+        while mejor is not None or anillo <= ANILLOS_MAXIMOS:
+            for d_lat in range(-anillo, anillo + 1):
+                for d_lon in range(-anillo, anillo + 1):
+                    if max(abs(d_lat), abs(d_lon)) != anillo:
+                        continue
+                    for nodo in self.celdas.get((c_lat + d_lat, c_lon + d_lon), ()):
+                        distancia = distancia_m(lat, lon, *self.nodos[nodo])
+                        if mejor is None or distancia < mejor[1]:
+                            mejor = (nodo, distancia)
+            # Un nodo de un anillo siguiente puede estar más cerca que uno de la
+            # esquina de este: se corta recién cuando ninguno puede mejorarlo
+            if mejor is not None and mejor[1] <= _distancia_fuera(lat, lon, c_lat, c_lon, anillo):
+                break
+            anillo += 1
+        return mejor
+
+    def factores(self, peso_peligro: float) -> Dict[int, float]:
+        """Multiplicador de la longitud de los tramos de cada avenida"""
+        return {
+            avenida_id: 1 + peso_peligro * peligro / ESCALA_PELIGRO
+            for avenida_id, peligro in self.peligro.items()
+        }
+
+    def buscar(self, origen: int, destino: int, peso_peligro: float):
+        """
+        A* de origen a destino. Devuelve (costo, [(nodo, tramo por el que se
+        llegó)], nodos explorados), o None si no hay camino.
+        """
+        nodos, adyacencia, tramos = self.nodos, self.adyacencia, self.tramos
+        factores = self.factores(peso_peligro)
+        lat_dest, lon_dest = nodos[destino]
+        # Distancia en línea recta al destino, una vez por nodo
+        estimaciones: Dict[int, float] = {}
+        costos = {origen: 0.0}
+        previo: Dict[int, Tuple[int, int]] = {}
+        abiertos = [(0.0, 0.0, origen)]
+        cerrados = set()
+
+        while abiertos:
+            _, costo, nodo = heapq.heappop(abiertos)
+            if nodo in cerrados:
+                continue
+            if nodo == destino:
+                camino = []
+                while nodo in previo:
+                    anterior, tramo = previo[nodo]
+                    camino.append((nodo, tramo))
+                    nodo = anterior
+                camino.append((origen, None))
+                camino.reverse()
+                return costo, camino, len(cerrados)
+            cerrados.add(nodo)
+
+            for vecino, tramo in adyacencia[nodo]:
+                if vecino in cerrados:
+                    continue
+                _, avenida_id, longitud = tramos[tramo]
+                nuevo = costo + longitud * factores.get(avenida_id, 1.0)
+                if nuevo < costos.get(vecino, math.inf):
+                    costos[vecino] = nuevo
+                    previo[vecino] = (nodo, tramo)
+                    estimacion = estimaciones.get(vecino)
+                    if estimacion is None:
+                        estimacion = estimaciones[vecino] = distancia_m(*nodos[vecino], lat_dest, lon_dest)
+                    heapq.heappush(abiertos, (nuevo + estimacion, nuevo, vecino))
+        return None
+
+
+_red = RedVial()
+_cargada = False
+
+
+async def cargar_red_vial(conn: Union[AsyncConnection, AsyncSession]):
+    """(Re)carga los tramos y el peligro de todas las avenidas"""
+    global _red, _cargada
+    firma = await _firma_tramos(conn)
+    result = await conn.execute(text("""
+        SELECT id, avenida_id, lat_origen, lon_origen, lat_destino, lon_destino, doble_mano
+        FROM tramos_avenida
+        ORDER BY id
+    """))
+
+    red = RedVial()
+    red.firma_tramos = firma
+    indices: Dict[Tuple[float, float], int] = {}
+    for t in result.fetchall():
+        origen = red.nodo(float(t.lat_origen), float(t.lon_origen), indices)
+        destino = red.nodo(float(t.lat_destino), float(t.lon_destino), indices)
+        if origen == destino:
+            continue
+        tramo = len(red.tramos)
+        red.tramos.append((t.id, t.avenida_id, distancia_m(*red.nodos[origen], *red.nodos[destino])))
+        red.adyacencia[origen].append((destino, tramo))
+        if t.doble_mano:
+            red.adyacencia[destino].append((origen, tramo))
+
+    await _refrescar_peligro(conn, red)
+    _red = red
+    _cargada = True
+
+
+async def _firma_tramos(conn: Union[AsyncConnection, AsyncSession]) -> Tuple[int, int]:
+    """Cantidad e id máximo de tramos_avenida: cambian al importar tramos"""
+    result = await conn.execute(text("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM tramos_avenida"))
+    cantidad, maximo = result.one()
+    return int(cantidad), int(maximo)
+
+
+async def _refrescar_peligro(conn: Union[AsyncConnection, AsyncSession], red: RedVial):
+    """Lee el índice de las avenidas modificadas desde el último refresco"""
+    version = cache_reportes.version
+    valores = {}
+    filtro = ""
+    if red.refrescado_hasta is not None:
+        filtro = "WHERE ultima_actualizacion >= :desde"
+        valores["desde"] = red.refrescado_hasta - MARGEN_REFRESCO
+
+    result = await conn.execute(text(f"""
+        SELECT avenida_id, indice_peligrosidad, nivel_seguridad, ultima_actualizacion
+        FROM indice_seguridad_avenida
+        {filtro}
+    """), valores)
+    for r in result.fetchall():
+        red.peligro[r.avenida_id] = float(r.indice_peligrosidad)
+        red.nivel[r.avenida_id] = r.nivel_seguridad
+        if r.ultima_actualizacion is not None and (
+            red.refrescado_hasta is None or r.ultima_actualizacion > red.refrescado_hasta
+        ):
+            red.refrescado_hasta = r.ultima_actualizacion
+
+    red.version_refresco = version
+    red.refrescado_en = time.monotonic()
+
+
+async def asegurar_actualizada(db: AsyncSession):
+    """
+    Carga la red si todavía no se cargó y refresca el peligro si hubo
+    escrituras en este proceso (cache_reportes cambió de versión) o si venció
+    CATALOGOS_TTL_SEGUNDOS (escrituras de otros procesos). Al vencer, además,
+    recarga la red si cambiaron los tramos.
+    """
+    if not _cargada:
+        await cargar_red_vial(db)
+        return
+    vencida = time.monotonic() - _red.refrescado_en > settings.CATALOGOS_TTL_SEGUNDOS
+    if vencida and await _firma_tramos(db) != _red.firma_tramos:
+        await cargar_red_vial(db)
+        return
+    if vencida or _red.version_refresco != cache_reportes.version:
+        await _refrescar_peligro(db, _red)
+
+
+def _punto(red: RedVial, nodo: int, lat: float, lon: float, distancia: float) -> dict:
+    lat_nodo, lon_nodo = red.nodos[nodo]
+    return {
+        "latitud": lat,
+        "longitud": lon,
+        "nodo": {"latitud": lat_nodo, "longitud": lon_nodo},
+        "distancia_acceso_m": round(distancia, 1),
+    }
+
+
+async def calcular_ruta(
+    db: AsyncSession,
+    origen_lat: float,
+    origen_lon: float,
+    destino_lat: float,
+    destino_lon: float,
+    peso_peligro: float = 1.0
+) -> dict:
+    """
+    Ruta de menor costo entre los nodos de la red más cercanos a origen y
+    destino. Lanza ValueError si no hay red cargada, si algún punto está
+    lejos de la red o si no hay camino.
+    """
+    inicio = time.perf_counter()
+    await asegurar_actualizada(db)
+    red = _red
+    if not red.tramos:
+        raise ValueError("No hay tramos de avenida cargados")
+
+    acceso_origen = red.nodo_cercano(origen_lat, origen_lon)
+    acceso_destino = red.nodo_cercano(destino_lat, destino_lon)
+    if acceso_origen is None or acceso_destino is None:
+        raise ValueError("El origen o el destino están lejos de la red vial")
+
+    encontrado = red.buscar(acceso_origen[0], acceso_destino[0], peso_peligro)
+    if encontrado is None:
+        raise ValueError("No hay una ruta entre el origen y el destino")
+    costo, camino, explorados = encontrado
+
+    # Tramos consecutivos de la misma avenida se informan juntos
+    recorrido: List[dict] = []
+    distancia_total = 0.0
+    peligro_ponderado = 0.0
+    for _, tramo in camino[1:]:
+        _, avenida_id, longitud = red.tramos[tramo]
+        peligro = red.peligro.get(avenida_id, 0.0)
+        distancia_total += longitud
+        peligro_ponderado += peligro * longitud
+        if recorrido and recorrido[-1]["avenida_id"] == avenida_id:
+            recorrido[-1]["distancia_m"] += longitud
+            recorrido[-1]["tramos"] += 1
+            continue
+        avenida = await catalogos.obtener_avenida(db, avenida_id)
+        recorrido.append({
+            "avenida_id": avenida_id,
+            "avenida_nombre": avenida["nombre"] if avenida else None,
+            "distancia_m": longitud,
+            "tramos": 1,
+            "indice_peligrosidad": peligro,
+            "nivel_seguridad": red.nivel.get(avenida_id, "Muy Segura"),
+        })
+    for paso in recorrido:
+        paso["distancia_m"] = round(paso["distancia_m"], 1)
+
+    return {
+        "origen": _punto(red, acceso_origen[0], origen_lat, origen_lon, acceso_origen[1]),
+        "destino": _punto(red, acceso_destino[0], destino_lat, destino_lon, acceso_destino[1]),
+        "peso_peligro": peso_peligro,
+        "distancia_m": round(distancia_total, 1),
+        "costo": round(costo, 1),
+        "indice_peligrosidad_promedio": round(peligro_ponderado / distancia_total, 2) if distancia_total else 0.0,
+        "recorrido": recorrido,
+        "coordenadas": [list(red.nodos[nodo]) for nodo, _ in camino],
+        "nodos_explorados": explorados,
+        "tiempo_ms": round((time.perf_counter() - inicio) * 1000, 3),
+    }
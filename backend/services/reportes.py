@@ -3,9 +3,18 @@ Servicio para reportes y consultas estadísticas
 Incluye INNER JOIN, GROUP BY y Subconsultas para cumplir requisitos del TP
 """
 
+import numpy as np
+from datetime import date
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from services.resumen_temporal import FECHA_SIN_DATO, HORA_SIN_DATO
+from services.motor_seguridad import MotorSeguridad, UMBRALES_NIVEL, motor_seguridad, top_k
+from services import catalogos
+
+# Días de la semana ISO (1 = lunes), con los nombres de calcular_dia_semana
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
 
 # ========================================
 # CONSULTA 1: INNER JOIN
@@ -136,12 +145,15 @@ async def obtener_estadisticas_por_tipo(db: AsyncSession) -> List[Dict]:
     ]
 
 # ========================================
-# CONSULTA 4: SUBCONSULTA CORRELACIONADA
+# CONSULTA 4: AGREGACIÓN CONDICIONAL
 # ========================================
 async def obtener_analisis_vehiculos(db: AsyncSession) -> List[Dict]:
     """
-    Consulta con SUBCONSULTA CORRELACIONADA
-    Análisis de vehículos con subconsulta para siniestros graves
+    Análisis de vehículos en una sola pasada
+    JOIN con siniestros (por clave primaria) y agregación condicional para los
+    siniestros graves, en lugar de una subconsulta correlacionada que volvía a
+    recorrer vehiculos_involucrados por cada tipo de vehículo.
+    Ver database/benchmark_vehiculos.py para la comparación de tiempos.
     """
     query = text("""
         SELECT 
@@ -150,14 +162,9 @@ async def obtener_analisis_vehiculos(db: AsyncSession) -> List[Dict]:
             COUNT(*) AS total_vehiculos,
             SUM(CASE WHEN v.es_fallecido = TRUE THEN 1 ELSE 0 END) AS fallecidos,
             ROUND(SUM(CASE WHEN v.es_fallecido = TRUE THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS tasa_mortalidad,
-            (
-                SELECT COUNT(*)
-                FROM vehiculos_involucrados v2
-                INNER JOIN siniestros s2 ON v2.siniestro_id = s2.id
-                WHERE v2.tipo_vehiculo = v.tipo_vehiculo
-                AND s2.nivel_gravedad = 'alta'
-            ) AS siniestros_gravedad_alta
+            SUM(CASE WHEN s.nivel_gravedad = 'alta' THEN 1 ELSE 0 END) AS siniestros_gravedad_alta
         FROM vehiculos_involucrados v
+        LEFT JOIN siniestros s ON s.id = v.siniestro_id
         GROUP BY v.tipo_vehiculo
         ORDER BY fallecidos DESC, total_vehiculos DESC
     """)
@@ -208,17 +215,18 @@ async def obtener_resumen_general(db: AsyncSession) -> Dict:
     }
 
 async def obtener_siniestros_por_mes(db: AsyncSession) -> List[Dict]:
-    """Distribución de siniestros por mes"""
-    query = text("""
+    """Distribución de siniestros por mes (lee resumen_siniestros_hora)"""
+    query = text(f"""
         SELECT 
-            YEAR(fecha) AS anio,
-            MONTH(fecha) AS mes,
-            MONTHNAME(fecha) AS nombre_mes,
-            COUNT(*) AS cantidad,
-            SUM(victimas_fatales) AS fallecidos,
-            SUM(heridos) AS heridos
-        FROM siniestros
-        GROUP BY YEAR(fecha), MONTH(fecha), MONTHNAME(fecha)
+            anio,
+            mes,
+            MONTHNAME(NULLIF(MIN(fecha), '{FECHA_SIN_DATO}')) AS nombre_mes,
+            CAST(SUM(cantidad) AS SIGNED) AS cantidad,
+            CAST(SUM(fallecidos) AS SIGNED) AS fallecidos,
+            CAST(SUM(heridos) AS SIGNED) AS heridos
+        FROM resumen_siniestros_hora
+        WHERE cantidad > 0
+        GROUP BY anio, mes
         ORDER BY anio, mes
     """)
     
@@ -238,15 +246,16 @@ async def obtener_siniestros_por_mes(db: AsyncSession) -> List[Dict]:
     ]
 
 async def obtener_siniestros_por_dia_semana(db: AsyncSession) -> List[Dict]:
-    """Distribución de siniestros por día de la semana"""
+    """Distribución de siniestros por día de la semana (lee resumen_siniestros_hora)"""
     query = text("""
         SELECT 
             dia_semana,
-            COUNT(*) AS cantidad,
-            SUM(victimas_fatales) AS fallecidos,
-            SUM(heridos) AS heridos,
-            ROUND(AVG(victimas_fatales + heridos), 2) AS promedio_victimas
-        FROM siniestros
+            CAST(SUM(cantidad) AS SIGNED) AS cantidad,
+            CAST(SUM(fallecidos) AS SIGNED) AS fallecidos,
+            CAST(SUM(heridos) AS SIGNED) AS heridos,
+            ROUND((SUM(fallecidos) + SUM(heridos)) / SUM(cantidad), 2) AS promedio_victimas
+        FROM resumen_siniestros_hora
+        WHERE cantidad > 0
         GROUP BY dia_semana
         ORDER BY cantidad DESC
     """)
@@ -256,7 +265,7 @@ async def obtener_siniestros_por_dia_semana(db: AsyncSession) -> List[Dict]:
     
     return [
         {
-            "dia_semana": r.dia_semana,
+            "dia_semana": DIAS_SEMANA[r.dia_semana - 1] if r.dia_semana else None,
             "cantidad": r.cantidad,
             "fallecidos": r.fallecidos,
             "heridos": r.heridos,
@@ -266,21 +275,22 @@ async def obtener_siniestros_por_dia_semana(db: AsyncSession) -> List[Dict]:
     ]
 
 async def obtener_horarios_criticos(db: AsyncSession) -> List[Dict]:
-    """Horarios con mayor cantidad de siniestros"""
-    query = text("""
+    """Horarios con mayor cantidad de siniestros (lee resumen_siniestros_hora)"""
+    query = text(f"""
         SELECT 
-            HOUR(hora) AS hora,
-            COUNT(*) AS cantidad,
-            SUM(victimas_fatales) AS fallecidos,
-            SUM(heridos) AS heridos,
+            NULLIF(hora, {HORA_SIN_DATO}) AS hora,
+            CAST(SUM(cantidad) AS SIGNED) AS cantidad,
+            CAST(SUM(fallecidos) AS SIGNED) AS fallecidos,
+            CAST(SUM(heridos) AS SIGNED) AS heridos,
             CASE 
-                WHEN HOUR(hora) BETWEEN 6 AND 9 THEN 'Hora Pico Mañana'
-                WHEN HOUR(hora) BETWEEN 17 AND 20 THEN 'Hora Pico Tarde'
-                WHEN HOUR(hora) BETWEEN 22 AND 23 OR HOUR(hora) BETWEEN 0 AND 5 THEN 'Madrugada'
+                WHEN hora BETWEEN 6 AND 9 THEN 'Hora Pico Mañana'
+                WHEN hora BETWEEN 17 AND 20 THEN 'Hora Pico Tarde'
+                WHEN hora BETWEEN 22 AND 23 OR hora BETWEEN 0 AND 5 THEN 'Madrugada'
                 ELSE 'Horario Normal'
             END AS clasificacion
-        FROM siniestros
-        GROUP BY HOUR(hora)
+        FROM resumen_siniestros_hora
+        WHERE cantidad > 0
+        GROUP BY hora
         ORDER BY cantidad DESC
     """)
     
@@ -324,85 +334,208 @@ async def obtener_top_marcas_involucradas(db: AsyncSession, limit: int = 10) ->
         for r in rows
         
     ]
-async def calcular_indice_seguridad_por_avenida(db: AsyncSession) -> List[Dict]:
-    query = text("""
-        SELECT 
-            a.id as avenida_id,
-            a.nombre as avenida_nombre,
-            a.zona,
-            a.tipo as tipo_via,
-            COUNT(DISTINCT s.id) as total_siniestros,
-            SUM(s.victimas_fatales) as total_fallecidos,
-            SUM(s.heridos) as total_heridos,
-            (
-                SELECT COUNT(*)
-                FROM reportes_delictivos rd
-                WHERE ROUND(rd.latitud, 2) = ROUND(a.latitud_aprox, 2)
-                OR a.nombre LIKE CONCAT('%', SUBSTRING_INDEX(rd.descripcion_breve, ' ', 3), '%')
-            ) as total_delitos
-        FROM avenidas a
-        LEFT JOIN siniestros s ON a.id = s.avenida_id
-        GROUP BY a.id, a.nombre, a.zona, a.tipo
+# ========================================
+# Índice de seguridad (tabla indice_seguridad_avenida)
+# ========================================
+SQL_INDICE_SEGURIDAD = """
+    SELECT 
+        a.id as avenida_id,
+        a.nombre as avenida_nombre,
+        a.zona,
+        a.tipo as tipo_via,
+        isa.total_siniestros,
+        isa.total_delitos,
+        isa.total_fallecidos,
+        isa.total_heridos,
+        isa.indice_peligrosidad,
+        isa.nivel_seguridad
+    FROM indice_seguridad_avenida isa
+    INNER JOIN avenidas a ON a.id = isa.avenida_id
+"""
+
+def _fila_indice(r) -> Dict:
+    return {
+        "avenida_id": r.avenida_id,
+        "avenida_nombre": r.avenida_nombre,
+        "zona": r.zona,
+        "tipo_via": r.tipo_via,
+        "total_siniestros": r.total_siniestros,
+        "total_delitos": r.total_delitos,
+        "total_fallecidos": r.total_fallecidos,
+        "total_heridos": r.total_heridos,
+        "indice_peligrosidad": float(r.indice_peligrosidad),
+        "nivel_seguridad": r.nivel_seguridad
+    }
+
+async def _ranking_con_pesos(
+    db: AsyncSession,
+    motor: MotorSeguridad,
+    limit: Optional[int],
+    descendente: bool,
+    minimo: Optional[float] = None,
+    maximo: Optional[float] = None
+) -> List[Dict]:
+    """
+    Recalcula el índice de todas las avenidas con otros pesos (motor de
+    puntaje) y devuelve las primeras según el índice, en el rango
+    (minimo, maximo]
+    """
+    result = await db.execute(text(SQL_INDICE_SEGURIDAD))
+    filas = result.fetchall()
+    siniestros = np.fromiter((r.total_siniestros for r in filas), dtype=np.float64, count=len(filas))
+    delitos = np.fromiter((r.total_delitos for r in filas), dtype=np.float64, count=len(filas))
+    fallecidos = np.fromiter((r.total_fallecidos for r in filas), dtype=np.float64, count=len(filas))
+    indices = motor.indices(siniestros, delitos, fallecidos)
+
+    candidatas = np.ones(len(filas), dtype=bool)
+    if minimo is not None:
+        candidatas &= indices > minimo
+    if maximo is not None:
+        candidatas &= indices <= maximo
+    posiciones = np.flatnonzero(candidatas)
+    orden = posiciones[top_k(indices[posiciones], len(posiciones) if limit is None else limit, descendente)]
+
+    niveles = motor.niveles(indices[orden])
+    resultado = []
+    for posicion, nivel in zip(orden, niveles):
+        fila = _fila_indice(filas[posicion])
+        fila["indice_peligrosidad"] = float(indices[posicion])
+        fila["nivel_seguridad"] = nivel
+        resultado.append(fila)
+    return resultado
+
+async def calcular_indice_seguridad_por_avenida(
+    db: AsyncSession,
+    motor: Optional[MotorSeguridad] = None
+) -> List[Dict]:
+    """
+    Índice de seguridad de todas las avenidas, de la más peligrosa a la más segura.
+    Lee la tabla indice_seguridad_avenida, que se mantiene al escribir
+    siniestros y reportes delictivos (ver services/indice_seguridad.py).
+    Con otros pesos (motor) el índice se recalcula al vuelo.
+    """
+    if motor is not None and not motor.es_predeterminado():
+        return await _ranking_con_pesos(db, motor, None, descendente=True)
+
+    query = text(SQL_INDICE_SEGURIDAD + """
+        ORDER BY isa.indice_peligrosidad DESC
     """)
     
     result = await db.execute(query)
-    rows = result.fetchall()
-    
-    resultados = []
-    peso_siniestros = 3.0
-    peso_delitos = 2.0
-    
-    for r in rows:
-        total_siniestros = r.total_siniestros if r.total_siniestros else 0
-        total_delitos = r.total_delitos if r.total_delitos else 0
-        total_fallecidos = r.total_fallecidos if r.total_fallecidos else 0
-        total_heridos = r.total_heridos if r.total_heridos else 0
-        
-        indice_peligrosidad = (peso_siniestros * total_siniestros) + (peso_delitos * total_delitos)
-        
-        if total_fallecidos > 0:
-            indice_peligrosidad = indice_peligrosidad * 1.5
-        
-        if indice_peligrosidad == 0:
-            nivel_seguridad = "Muy Segura"
-        elif indice_peligrosidad <= 10:
-            nivel_seguridad = "Segura"
-        elif indice_peligrosidad <= 25:
-            nivel_seguridad = "Moderada"
-        elif indice_peligrosidad <= 50:
-            nivel_seguridad = "Peligrosa"
-        else:
-            nivel_seguridad = "Muy Peligrosa"
-        
-        resultados.append({
-            "avenida_id": r.avenida_id,
-            "avenida_nombre": r.avenida_nombre,
-            "zona": r.zona,
-            "tipo_via": r.tipo_via,
-            "total_siniestros": total_siniestros,
-            "total_delitos": total_delitos,
-            "total_fallecidos": total_fallecidos,
-            "total_heridos": total_heridos,
-            "indice_peligrosidad": round(indice_peligrosidad, 2),
-            "nivel_seguridad": nivel_seguridad
+    return [_fila_indice(r) for r in result.fetchall()]
+
+async def calcular_indice_seguridad_periodo(
+    db: AsyncSession,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    vida_media_dias: Optional[float] = None,
+    motor: Optional[MotorSeguridad] = None
+) -> List[Dict]:
+    """
+    Índice de seguridad de todas las avenidas con los siniestros y delitos
+    entre desde y hasta (inclusive), de la más peligrosa a la más segura.
+    Con vida_media_dias, cada día pesa 0.5 ^ (antigüedad / vida_media_dias),
+    con la antigüedad contada hasta `hasta` (o hasta hoy); los totales
+    devueltos son los ponderados. Suma el resumen diario por avenida
+    (resumen_avenida_dia); los siniestros sin fecha no se cuentan.
+    """
+    motor = motor or motor_seguridad
+    condiciones = [f"fecha <> '{FECHA_SIN_DATO}'"]
+    valores = {}
+    if desde is not None:
+        condiciones.append("fecha >= :desde")
+        valores["desde"] = desde
+    if hasta is not None:
+        condiciones.append("fecha <= :hasta")
+        valores["hasta"] = hasta
+
+    peso = "1"
+    if vida_media_dias is not None:
+        peso = "POW(0.5, GREATEST(DATEDIFF(:referencia, fecha), 0) / :vida_media)"
+        valores["referencia"] = hasta or date.today()
+        valores["vida_media"] = vida_media_dias
+
+    result = await db.execute(text(f"""
+        SELECT
+            avenida_id,
+            SUM(siniestros * {peso}) AS siniestros,
+            SUM(fallecidos * {peso}) AS fallecidos,
+            SUM(heridos * {peso}) AS heridos,
+            SUM(delitos * {peso}) AS delitos
+        FROM resumen_avenida_dia
+        WHERE {" AND ".join(condiciones)}
+        GROUP BY avenida_id
+    """), valores)
+    sumas = result.fetchall()
+
+    # Todas las avenidas, también las que no tuvieron hechos en el período
+    avenidas = await catalogos.listar_avenidas(db)
+    posiciones = {a["id"]: i for i, a in enumerate(avenidas)}
+    totales = np.zeros((4, len(avenidas)))
+    for s in sumas:
+        i = posiciones.get(s.avenida_id)
+        if i is not None:
+            totales[:, i] = (s.siniestros, s.fallecidos, s.heridos, s.delitos)
+    siniestros, fallecidos, heridos, delitos = totales
+
+    indices = motor.indices(siniestros, delitos, fallecidos)
+    orden = top_k(indices, len(avenidas))
+    niveles = motor.niveles(indices[orden])
+
+    # Sin decaimiento los totales son enteros
+    if vida_media_dias is None:
+        totales = totales.astype(np.int64)
+    else:
+        totales = np.round(totales, 2)
+    resultado = []
+    for i, nivel in zip(orden, niveles):
+        avenida = avenidas[i]
+        resultado.append({
+            "avenida_id": avenida["id"],
+            "avenida_nombre": avenida["nombre"],
+            "zona": avenida["zona"],
+            "tipo_via": avenida["tipo"],
+            "total_siniestros": totales[0, i].item(),
+            "total_delitos": totales[3, i].item(),
+            "total_fallecidos": totales[1, i].item(),
+            "total_heridos": totales[2, i].item(),
+            "indice_peligrosidad": float(indices[i]),
+            "nivel_seguridad": nivel
         })
-    
-    resultados_ordenados = sorted(resultados, key=lambda x: x["indice_peligrosidad"], reverse=True)
-    
-    return resultados_ordenados
+    return resultado
 
-async def obtener_rutas_mas_seguras(db: AsyncSession, limit: int = 5) -> List[Dict]:
-    todas_avenidas = await calcular_indice_seguridad_por_avenida(db)
-    
-    rutas_seguras = [av for av in todas_avenidas if av["indice_peligrosidad"] <= 10]
-    
-    rutas_seguras_ordenadas = sorted(rutas_seguras, key=lambda x: x["indice_peligrosidad"])
-    
-    return rutas_seguras_ordenadas[:limit]
+async def obtener_rutas_mas_seguras(
+    db: AsyncSession,
+    limit: int = 5,
+    motor: Optional[MotorSeguridad] = None
+) -> List[Dict]:
+    """Avenidas "Muy Segura" y "Segura", de la más segura a la menos"""
+    if motor is not None and not motor.es_predeterminado():
+        return await _ranking_con_pesos(db, motor, limit, descendente=False, maximo=UMBRALES_NIVEL[1])
 
-async def obtener_zonas_peligrosas_analisis(db: AsyncSession, limit: int = 5) -> List[Dict]:
-    todas_avenidas = await calcular_indice_seguridad_por_avenida(db)
+    query = text(SQL_INDICE_SEGURIDAD + f"""
+        WHERE isa.indice_peligrosidad <= {UMBRALES_NIVEL[1]}
+        ORDER BY isa.indice_peligrosidad ASC
+        LIMIT :limit
+    """)
     
-    zonas_peligrosas = [av for av in todas_avenidas if av["indice_peligrosidad"] > 25]
+    result = await db.execute(query, {"limit": limit})
+    return [_fila_indice(r) for r in result.fetchall()]
+
+async def obtener_zonas_peligrosas_analisis(
+    db: AsyncSession,
+    limit: int = 5,
+    motor: Optional[MotorSeguridad] = None
+) -> List[Dict]:
+    """Avenidas "Peligrosa" y "Muy Peligrosa", de la más peligrosa a la menos"""
+    if motor is not None and not motor.es_predeterminado():
+        return await _ranking_con_pesos(db, motor, limit, descendente=True, minimo=UMBRALES_NIVEL[2])
+
+    query = text(SQL_INDICE_SEGURIDAD + f"""
+        WHERE isa.indice_peligrosidad > {UMBRALES_NIVEL[2]}
+        ORDER BY isa.indice_peligrosidad DESC
+        LIMIT :limit
+    """)
     
-    return zonas_peligrosas[:limit]
+    result = await db.execute(query, {"limit": limit})
+    return [_fila_indice(r) for r in result.fetchall()]
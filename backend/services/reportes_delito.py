@@ -5,6 +5,23 @@ from datetime import datetime
 import logging
 
 from schemas.reporte_delito import ReporteDelictivoCreate, ReporteDelictivoUpdate
+from services.grilla_espacial import (
+    TAMANO_CELDA,
+    SQL_CELDA_LAT,
+    SQL_CELDA_LON,
+    SQL_DISTANCIA_M,
+    Caja,
+    caja_de_radio,
+    condicion_caja,
+    vincular_celda_reporte
+)
+from services import indice_seguridad
+from services import heatmap
+from services import resumen_temporal
+from services.cache import cache_reportes, cache_tiles
+from services.paginacion import condicion_keyset, parametros_keyset
+from services import catalogos
+from services.respuestas import respuesta_creada, respuesta_actualizada, cambios_de, ahora, fila_o_none
 
 
 async def crear_reporte_delito(db: AsyncSession, reporte: ReporteDelictivoCreate) -> dict:
@@ -13,11 +30,12 @@ async def crear_reporte_delito(db: AsyncSession, reporte: ReporteDelictivoCreate
         INSERT INTO reportes_delictivos (
             latitud, longitud, direccion_aproximada, tipo_delito,
             descripcion_breve, fecha_reporte, hora_aproximada,
-            nivel_peligrosidad, usuario_id
+            nivel_peligrosidad, usuario_id, celda_lat, celda_lon
         ) VALUES (
             :latitud, :longitud, :direccion_aproximada, :tipo_delito,
             :descripcion_breve, :fecha_reporte, :hora_aproximada,
-            :nivel_peligrosidad, :usuario_id
+            :nivel_peligrosidad, :usuario_id,
+            ROUND(:latitud / :tamano_celda), ROUND(:longitud / :tamano_celda)
         )
     """)
     
@@ -30,14 +48,29 @@ async def crear_reporte_delito(db: AsyncSession, reporte: ReporteDelictivoCreate
         "fecha_reporte": reporte.fecha_reporte,
         "hora_aproximada": reporte.hora_aproximada,
         "nivel_peligrosidad": reporte.nivel_peligrosidad,
-        "usuario_id": reporte.usuario_id
+        "usuario_id": reporte.usuario_id,
+        "tamano_celda": TAMANO_CELDA
     }
     
     result = await db.execute(query, valores)
-    await db.commit()
-    
     reporte_id = result.lastrowid
-    return await obtener_reporte_delito_por_id(db, reporte_id)
+    await vincular_celda_reporte(db, reporte_id)
+    await indice_seguridad.ajustar_delitos(
+        db, await indice_seguridad.avenidas_de_reporte(db, reporte_id), 1
+    )
+    await heatmap.ajustar_reporte(db, reporte_id, 1)
+    await resumen_temporal.ajustar_delitos_dia(db, reporte_id, 1)
+    await db.commit()
+    cache_reportes.invalidar()
+    cache_tiles.invalidar()
+    
+    registrado = ahora()
+    return respuesta_creada(
+        cambios_de(valores, excluir=("tamano_celda",)), "id", reporte_id,
+        fecha_registro=registrado,
+        ultima_modificacion=registrado,
+        usuario_nombre=await catalogos.nombre_usuario(db, reporte.usuario_id)
+    )
 
 
 async def obtener_reporte_delito_por_id(db: AsyncSession, reporte_id: int) -> Optional[dict]:
@@ -82,12 +115,25 @@ async def obtener_todos_reportes_delito(
     skip: int = 0,
     limit: int = 100,
     tipo_delito: Optional[str] = None,
-    nivel_peligrosidad: Optional[str] = None
+    nivel_peligrosidad: Optional[str] = None,
+    despues_de: Optional[list] = None
 ) -> List[dict]:
-    """Obtiene lista de reportes de delitos con filtros opcionales"""
+    """
+    Obtiene lista de reportes de delitos con filtros opcionales.
+    Con despues_de ([fecha_reporte, fecha_registro, id] de la última fila)
+    pagina por keyset e ignora skip.
+    """
     where_clauses = []
     valores = {"skip": skip, "limit": limit}
     
+    if despues_de is not None:
+        where_clauses.append(condicion_keyset(
+            ["r.fecha_reporte", "r.fecha_registro", "r.id"],
+            valores=despues_de, nulables=("r.fecha_registro",)
+        ))
+        valores.update(parametros_keyset(despues_de))
+        valores["skip"] = 0
+    
     if tipo_delito:
         where_clauses.append("r.tipo_delito = :tipo_delito")
         valores["tipo_delito"] = tipo_delito
@@ -110,7 +156,7 @@ async def obtener_todos_reportes_delito(
         FROM reportes_delictivos r
         INNER JOIN usuarios u ON r.usuario_id = u.id
         {where_sql}
-        ORDER BY r.fecha_reporte DESC, r.fecha_registro DESC
+        ORDER BY r.fecha_reporte DESC, r.fecha_registro DESC, r.id DESC
         LIMIT :limit OFFSET :skip
     """)
     
@@ -181,6 +227,41 @@ async def actualizar_reporte_delito(
     if not campos_actualizar:
         return await obtener_reporte_delito_por_id(db, reporte_id)
     
+    # Sin RETURNING en MySQL: la fila se lee antes de modificarla, no después
+    result = await db.execute(text("""
+        SELECT 
+            id, latitud, longitud, direccion_aproximada,
+            tipo_delito, descripcion_breve, fecha_reporte,
+            hora_aproximada, nivel_peligrosidad, usuario_id,
+            fecha_registro, ultima_modificacion
+        FROM reportes_delictivos
+        WHERE id = :id
+        FOR UPDATE
+    """), {"id": reporte_id})
+    actual = fila_o_none(result.fetchone())
+    if actual is None:
+        await db.rollback()
+        return None
+    
+    # MySQL evalúa el SET de izquierda a derecha: la celda se calcula
+    # con las coordenadas ya actualizadas
+    cambia_ubicacion = "latitud" in valores or "longitud" in valores
+    if cambia_ubicacion:
+        campos_actualizar.append(f"celda_lat = {SQL_CELDA_LAT}")
+        campos_actualizar.append(f"celda_lon = {SQL_CELDA_LON}")
+        valores["tamano_celda"] = TAMANO_CELDA
+        avenidas_anteriores = await indice_seguridad.avenidas_de_reporte(db, reporte_id)
+    
+    # El mapa de calor depende de la ubicación y del nivel de peligrosidad
+    cambia_heatmap = cambia_ubicacion or "nivel_peligrosidad" in valores
+    if cambia_heatmap:
+        await heatmap.ajustar_reporte(db, reporte_id, -1)
+    
+    # El resumen diario depende de la ubicación (avenidas) y de la fecha
+    cambia_resumen = cambia_ubicacion or "fecha_reporte" in valores
+    if cambia_resumen:
+        await resumen_temporal.ajustar_delitos_dia(db, reporte_id, -1)
+    
     query = text(f"""
         UPDATE reportes_delictivos
         SET {', '.join(campos_actualizar)}
@@ -188,9 +269,26 @@ async def actualizar_reporte_delito(
     """)
     
     await db.execute(query, valores)
+    if cambia_ubicacion:
+        await vincular_celda_reporte(db, reporte_id)
+        await indice_seguridad.ajustar_delitos(db, avenidas_anteriores, -1)
+        await indice_seguridad.ajustar_delitos(
+            db, await indice_seguridad.avenidas_de_reporte(db, reporte_id), 1
+        )
+    if cambia_heatmap:
+        await heatmap.ajustar_reporte(db, reporte_id, 1)
+    if cambia_resumen:
+        await resumen_temporal.ajustar_delitos_dia(db, reporte_id, 1)
     await db.commit()
-    
-    return await obtener_reporte_delito_por_id(db, reporte_id)
+    cache_reportes.invalidar()
+    if cambia_heatmap:
+        cache_tiles.invalidar()
+    
+    return respuesta_actualizada(
+        actual, cambios_de(valores, excluir=("id", "tamano_celda")),
+        ultima_modificacion=ahora(),
+        usuario_nombre=await catalogos.nombre_usuario(db, actual["usuario_id"])
+    )
 
 
 async def eliminar_reporte_delito(
@@ -213,9 +311,16 @@ async def eliminar_reporte_delito(
         if not es_admin and reporte.usuario_id != usuario_id:
             raise PermissionError("No tienes permiso para eliminar este reporte")
         
+        avenidas = await indice_seguridad.avenidas_de_reporte(db, reporte_id)
+        await heatmap.ajustar_reporte(db, reporte_id, -1)
+        await resumen_temporal.ajustar_delitos_dia(db, reporte_id, -1)
+        
         query_eliminar = text("DELETE FROM reportes_delictivos WHERE id = :reporte_id")
         await db.execute(query_eliminar, {"reporte_id": reporte_id})
+        await indice_seguridad.ajustar_delitos(db, avenidas, -1)
         await db.commit()
+        cache_reportes.invalidar()
+        cache_tiles.invalidar()
         
         return True
     
@@ -260,6 +365,97 @@ async def contar_reportes_delito(
     return row.total if row else 0
 
 
+# ========================================
+# BÚSQUEDA ESPACIAL (grilla + haversine)
+# ========================================
+async def _buscar_en_caja(
+    db: AsyncSession,
+    caja: Caja,
+    tipo_delito: Optional[str],
+    nivel_peligrosidad: Optional[str],
+    limite: int,
+    centro: Optional[tuple] = None,
+    radio_m: Optional[float] = None
+) -> List[dict]:
+    condicion, valores, celdas = condicion_caja(caja)
+    where_clauses = [condicion]
+    valores["limite"] = limite
+    
+    if tipo_delito:
+        where_clauses.append("r.tipo_delito = :tipo_delito")
+        valores["tipo_delito"] = tipo_delito
+    
+    if nivel_peligrosidad:
+        where_clauses.append("r.nivel_peligrosidad = :nivel_peligrosidad")
+        valores["nivel_peligrosidad"] = nivel_peligrosidad
+    
+    if centro is not None:
+        # Filtro exacto por distancia sobre los candidatos de la caja
+        distancia_sql = f", {SQL_DISTANCIA_M} AS distancia_m"
+        having_sql = "HAVING distancia_m <= :radio_m"
+        orden_sql = "distancia_m, r.id"
+        valores.update({"lat_centro": centro[0], "lon_centro": centro[1], "radio_m": radio_m})
+    else:
+        distancia_sql = ""
+        having_sql = ""
+        orden_sql = "r.fecha_reporte DESC, r.id DESC"
+    
+    query = text(f"""
+        SELECT 
+            r.id, r.latitud, r.longitud, r.direccion_aproximada,
+            r.tipo_delito, r.descripcion_breve, r.fecha_reporte,
+            r.hora_aproximada, r.nivel_peligrosidad, r.usuario_id,
+            r.fecha_registro, r.ultima_modificacion,
+            u.nombre as usuario_nombre
+            {distancia_sql}
+        FROM reportes_delictivos r
+        INNER JOIN usuarios u ON r.usuario_id = u.id
+        WHERE {" AND ".join(where_clauses)}
+        {having_sql}
+        ORDER BY {orden_sql}
+        LIMIT :limite
+    """).bindparams(celdas)
+    
+    result = await db.execute(query, valores)
+    reportes = []
+    for r in result.fetchall():
+        reporte = dict(r._mapping)
+        if "distancia_m" in reporte:
+            reporte["distancia_m"] = round(float(reporte["distancia_m"]), 1)
+        reportes.append(reporte)
+    return reportes
+
+
+async def buscar_reportes_cercanos(
+    db: AsyncSession,
+    lat: float,
+    lon: float,
+    radio_m: float,
+    tipo_delito: Optional[str] = None,
+    nivel_peligrosidad: Optional[str] = None,
+    limite: int = 500
+) -> List[dict]:
+    """
+    Reportes a no más de radio_m metros de (lat, lon), del más cercano al más
+    lejano, con su distancia_m. Solo se leen las celdas que cubren el círculo.
+    """
+    return await _buscar_en_caja(
+        db, caja_de_radio(lat, lon, radio_m), tipo_delito, nivel_peligrosidad, limite,
+        centro=(lat, lon), radio_m=radio_m
+    )
+
+
+async def buscar_reportes_en_caja(
+    db: AsyncSession,
+    caja: Caja,
+    tipo_delito: Optional[str] = None,
+    nivel_peligrosidad: Optional[str] = None,
+    limite: int = 500
+) -> List[dict]:
+    """Reportes dentro del rectángulo (min_lat, min_lon, max_lat, max_lon), más recientes primero"""
+    return await _buscar_en_caja(db, caja, tipo_delito, nivel_peligrosidad, limite)
+
+
 async def obtener_estadisticas_delitos(db: AsyncSession) -> dict:
     """Obtiene estadísticas generales de reportes de delitos"""
     query = text("""
@@ -0,0 +1,34 @@
+"""
+Respuestas de escritura sin releer la fila
+Tras un INSERT o UPDATE la respuesta se arma con los valores ya validados,
+el id generado (lastrowid) o la fila leída antes de modificarla, y los
+nombres relacionados que resuelven los catálogos en memoria.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+
+def respuesta_creada(valores: dict, campo_id: str, nuevo_id: int, **extra) -> dict:
+    """Fila recién insertada: id generado + valores insertados + campos extra"""
+    return {campo_id: nuevo_id, **valores, **extra}
+
+
+def respuesta_actualizada(actual: dict, cambios: dict, **extra) -> dict:
+    """Fila actual con los cambios aplicados + campos extra"""
+    return {**actual, **cambios, **extra}
+
+
+def cambios_de(valores: dict, excluir=("id",)) -> dict:
+    """Valores del UPDATE sin los parámetros que no son columnas (el id del WHERE, etc.)"""
+    return {k: v for k, v in valores.items() if k not in excluir}
+
+
+def ahora() -> datetime:
+    """Marca de tiempo para fecha_registro / ultima_modificacion de la respuesta"""
+    return datetime.now().replace(microsecond=0)
+
+
+def fila_o_none(fila) -> Optional[dict]:
+    """Convierte una fila de SQLAlchemy en dict"""
+    return dict(fila._mapping) if fila is not None else None
@@ -0,0 +1,188 @@
+"""
+Resumen temporal de siniestros (fecha × hora × avenida × tipo)
+La tabla resumen_siniestros_hora guarda cantidad, fallecidos y heridos por
+franja; año, mes y día de la semana se guardan ya calculados. Se ajusta en
+cada alta, modificación o baja de siniestros; la reconstrucción completa está
+en services/mantenimiento.py.
+Los reportes temporales agrupan estas franjas en lugar de aplicar YEAR(),
+HOUR() o WEEKDAY() a cada siniestro.
+
+Resumen diario por avenida (fecha × avenida)
+La tabla resumen_avenida_dia guarda siniestros, fallecidos, heridos y delitos
+por día y avenida (un delito cuenta para las avenidas de su celda, como en
+indice_seguridad_avenida). Sirve el índice de seguridad por período y con
+decaimiento temporal sin recorrer siniestros ni reportes_delictivos.
+"""
+
+from collections import defaultdict
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from typing import List, Union
+
+# Valores de clave para siniestros sin fecha u hora (la clave no admite NULL)
+FECHA_SIN_DATO = "1000-01-01"
+HORA_SIN_DATO = 24
+
+COLUMNAS_FRANJA = ["fecha", "hora", "avenida_id", "tipo_id", "cantidad", "fallecidos", "heridos"]
+
+
+def franja(fecha, hora, avenida_id: int, tipo_id: int, cantidad: int, fallecidos: int, heridos: int) -> dict:
+    """Ajuste de una franja; hora puede ser time, timedelta o None"""
+    return {
+        "fecha": fecha,
+        "hora": hora,
+        "avenida_id": avenida_id,
+        "tipo_id": tipo_id,
+        "cantidad": cantidad,
+        "fallecidos": fallecidos or 0,
+        "heridos": heridos or 0,
+    }
+
+
+async def ajustar_franjas(db: AsyncSession, franjas: List[dict]):
+    """
+    Suma (o resta, con valores negativos) a varias franjas en una sola
+    sentencia. No hace commit.
+    """
+    if not franjas:
+        return
+
+    filas_sql = []
+    valores = {}
+    for n, f in enumerate(franjas):
+        filas_sql.append(f"""(
+            COALESCE(:fecha_{n}, '{FECHA_SIN_DATO}'), COALESCE(HOUR(:hora_{n}), {HORA_SIN_DATO}),
+            :avenida_id_{n}, :tipo_id_{n},
+            YEAR(:fecha_{n}), MONTH(:fecha_{n}), WEEKDAY(:fecha_{n}) + 1,
+            :cantidad_{n}, :fallecidos_{n}, :heridos_{n}
+        )""")
+        valores.update({f"{c}_{n}": f[c] for c in COLUMNAS_FRANJA})
+
+    query = text(f"""
+        INSERT INTO resumen_siniestros_hora (
+            fecha, hora, avenida_id, tipo_id, anio, mes, dia_semana,
+            cantidad, fallecidos, heridos
+        ) VALUES {", ".join(filas_sql)}
+        ON DUPLICATE KEY UPDATE
+            cantidad = cantidad + VALUES(cantidad),
+            fallecidos = fallecidos + VALUES(fallecidos),
+            heridos = heridos + VALUES(heridos)
+    """)
+    await db.execute(query, valores)
+    await _ajustar_dias_siniestros(db, franjas)
+
+
+async def reconstruir_resumen_temporal(conn: Union[AsyncConnection, AsyncSession]):
+    """Recalcula todas las franjas a partir de siniestros"""
+    await conn.execute(text("DELETE FROM resumen_siniestros_hora"))
+    await conn.execute(text(f"""
+        INSERT INTO resumen_siniestros_hora (
+            fecha, hora, avenida_id, tipo_id, anio, mes, dia_semana,
+            cantidad, fallecidos, heridos
+        )
+        SELECT
+            f.fecha, f.hora, f.avenida_id, f.tipo_id,
+            YEAR(NULLIF(f.fecha, '{FECHA_SIN_DATO}')),
+            MONTH(NULLIF(f.fecha, '{FECHA_SIN_DATO}')),
+            WEEKDAY(NULLIF(f.fecha, '{FECHA_SIN_DATO}')) + 1,
+            f.cantidad, f.fallecidos, f.heridos
+        FROM (
+            SELECT
+                COALESCE(fecha, '{FECHA_SIN_DATO}') AS fecha,
+                COALESCE(HOUR(hora), {HORA_SIN_DATO}) AS hora,
+                avenida_id,
+                tipo_id,
+                COUNT(*) AS cantidad,
+                COALESCE(SUM(victimas_fatales), 0) AS fallecidos,
+                COALESCE(SUM(heridos), 0) AS heridos
+            FROM siniestros
+            GROUP BY
+                COALESCE(fecha, '{FECHA_SIN_DATO}'),
+                COALESCE(HOUR(hora), {HORA_SIN_DATO}),
+                avenida_id,
+                tipo_id
+        ) f
+    """))
+
+
+# ========================================
+# RESUMEN DIARIO POR AVENIDA
+# ========================================
+async def _ajustar_dias_siniestros(db: AsyncSession, franjas: List[dict]):
+    """Suma las franjas, agrupadas por fecha y avenida, al resumen diario"""
+    dias = defaultdict(lambda: [0, 0, 0])
+    for f in franjas:
+        totales = dias[(f["fecha"], f["avenida_id"])]
+        totales[0] += f["cantidad"]
+        totales[1] += f["fallecidos"] or 0
+        totales[2] += f["heridos"] or 0
+
+    filas_sql = []
+    valores = {}
+    for n, ((fecha, avenida_id), (cantidad, fallecidos, heridos)) in enumerate(dias.items()):
+        filas_sql.append(
+            f"(COALESCE(:fecha_{n}, '{FECHA_SIN_DATO}'), :avenida_id_{n}, "
+            f":siniestros_{n}, :fallecidos_{n}, :heridos_{n})"
+        )
+        valores.update({
+            f"fecha_{n}": fecha,
+            f"avenida_id_{n}": avenida_id,
+            f"siniestros_{n}": cantidad,
+            f"fallecidos_{n}": fallecidos,
+            f"heridos_{n}": heridos,
+        })
+
+    await db.execute(text(f"""
+        INSERT INTO resumen_avenida_dia (fecha, avenida_id, siniestros, fallecidos, heridos)
+        VALUES {", ".join(filas_sql)}
+        ON DUPLICATE KEY UPDATE
+            siniestros = siniestros + VALUES(siniestros),
+            fallecidos = fallecidos + VALUES(fallecidos),
+            heridos = heridos + VALUES(heridos)
+    """), valores)
+
+
+async def ajustar_delitos_dia(db: AsyncSession, reporte_id: int, signo: int):
+    """
+    Suma (signo=1) o resta (signo=-1) un reporte delictivo en el día de su
+    fecha_reporte, para cada avenida de su celda: restar antes de modificarlo
+    o borrarlo y sumar después de insertarlo o modificarlo. No hace commit.
+    """
+    await db.execute(text("""
+        INSERT INTO resumen_avenida_dia (fecha, avenida_id, delitos)
+        SELECT rd.fecha_reporte, ac.avenida_id, :signo
+        FROM reportes_delictivos rd
+        INNER JOIN avenida_celdas ac
+            ON ac.celda_lat = rd.celda_lat AND ac.celda_lon = rd.celda_lon
+        WHERE rd.id = :id AND rd.fecha_reporte IS NOT NULL
+        ON DUPLICATE KEY UPDATE delitos = delitos + VALUES(delitos)
+    """), {"id": reporte_id, "signo": signo})
+
+
+async def reconstruir_resumen_diario(conn: Union[AsyncConnection, AsyncSession]):
+    """Recalcula el resumen diario a partir de siniestros y reportes_delictivos"""
+    await conn.execute(text("DELETE FROM resumen_avenida_dia"))
+    await conn.execute(text(f"""
+        INSERT INTO resumen_avenida_dia (fecha, avenida_id, siniestros, fallecidos, heridos)
+        SELECT
+            COALESCE(fecha, '{FECHA_SIN_DATO}'),
+            avenida_id,
+            COUNT(*),
+            COALESCE(SUM(victimas_fatales), 0),
+            COALESCE(SUM(heridos), 0)
+        FROM siniestros
+        GROUP BY COALESCE(fecha, '{FECHA_SIN_DATO}'), avenida_id
+    """))
+    await conn.execute(text("""
+        INSERT INTO resumen_avenida_dia (fecha, avenida_id, delitos)
+        SELECT d.fecha_reporte, d.avenida_id, d.delitos
+        FROM (
+            SELECT rd.fecha_reporte, ac.avenida_id, COUNT(*) AS delitos
+            FROM reportes_delictivos rd
+            INNER JOIN avenida_celdas ac
+                ON ac.celda_lat = rd.celda_lat AND ac.celda_lon = rd.celda_lon
+            WHERE rd.fecha_reporte IS NOT NULL
+            GROUP BY rd.fecha_reporte, ac.avenida_id
+        ) d
+        ON DUPLICATE KEY UPDATE delitos = VALUES(delitos)
+    """))
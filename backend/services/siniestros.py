@@ -3,12 +3,21 @@ Servicio para gestión de siniestros
 Incluye consultas complejas con INNER JOIN y subconsultas
 """
 
-from sqlalchemy import text, select, delete
+from sqlalchemy import text, select, delete, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from datetime import datetime
+from collections import defaultdict
 import logging
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
 from schemas.siniestro import SiniestroCreate, SiniestroUpdate
+from services import indice_seguridad
+from services import resumen_temporal
+from services.cache import cache_reportes
+from services.paginacion import condicion_keyset, parametros_keyset
+from services import catalogos
+from services.respuestas import respuesta_creada, respuesta_actualizada, cambios_de, ahora
 
 
 # ========================================
@@ -97,16 +106,212 @@ async def crear_siniestro(db: AsyncSession, siniestro: SiniestroCreate) -> dict:
     }
     
     result = await db.execute(query, valores)
+    await indice_seguridad.ajustar_siniestros(
+        db, siniestro.avenida_id, 1, siniestro.victimas_fatales, siniestro.heridos
+    )
+    await resumen_temporal.ajustar_franjas(db, [resumen_temporal.franja(
+        siniestro.fecha, siniestro.hora, siniestro.avenida_id, siniestro.tipo_id,
+        1, siniestro.victimas_fatales, siniestro.heridos
+    )])
     await db.commit()
+    cache_reportes.invalidar()
+    
+    registrado = ahora()
+    return respuesta_creada(
+        valores, "id", result.lastrowid,
+        fecha_registro=registrado,
+        ultima_modificacion=registrado,
+        **await catalogos.nombres_siniestro(
+            db, siniestro.avenida_id, siniestro.tipo_id, siniestro.usuario_id
+        )
+    )
+
+
+# Filas por sentencia INSERT en la carga masiva
+TAMANO_LOTE_BULK = 500
+
+COLUMNAS_INSERT = [
+    "fecha", "hora", "avenida_id", "tipo_id", "nivel_gravedad",
+    "victimas_fatales", "heridos", "num_vehiculos", "dia_semana",
+    "es_fin_de_semana", "usuario_id", "observaciones"
+]
+
+
+async def _ids_existentes(db: AsyncSession, tabla: str, ids: set) -> set:
+    """Devuelve cuáles de los ids existen en la tabla (una sola consulta)"""
+    if not ids:
+        return set()
+    query = text(f"SELECT id FROM {tabla} WHERE id IN :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    result = await db.execute(query, {"ids": list(ids)})
+    return {r.id for r in result.fetchall()}
+
+
+def _insert_siniestros(lote: List[Tuple[int, SiniestroCreate]], derivados: dict):
+    """INSERT multi-fila (sentencia y valores) de los siniestros del lote"""
+    filas_sql = []
+    valores = {}
+    for n, (_, siniestro) in enumerate(lote):
+        dia_semana, fin_de_semana = derivados.get(siniestro.fecha, (None, False))
+        fila_valores = {
+            "fecha": siniestro.fecha,
+            "hora": siniestro.hora,
+            "avenida_id": siniestro.avenida_id,
+            "tipo_id": siniestro.tipo_id,
+            "nivel_gravedad": siniestro.nivel_gravedad,
+            "victimas_fatales": siniestro.victimas_fatales,
+            "heridos": siniestro.heridos,
+            "num_vehiculos": siniestro.num_vehiculos,
+            "dia_semana": dia_semana,
+            "es_fin_de_semana": fin_de_semana,
+            "usuario_id": siniestro.usuario_id,
+            "observaciones": siniestro.observaciones
+        }
+        filas_sql.append("(" + ", ".join(f":{c}_{n}" for c in COLUMNAS_INSERT) + ")")
+        valores.update({f"{c}_{n}": v for c, v in fila_valores.items()})
+    query = text(f"""
+        INSERT INTO siniestros ({", ".join(COLUMNAS_INSERT)})
+        VALUES {", ".join(filas_sql)}
+    """)
+    return query, valores
+
+
+def _motivo_rechazo(error: DBAPIError) -> str:
+    """Mensaje del servidor (sin el código) para una fila rechazada"""
+    argumentos = getattr(error.orig, "args", ())
+    return f"Rechazada por la base de datos: {argumentos[-1] if argumentos else error.orig}"
+
+
+async def crear_siniestros_bulk(db: AsyncSession, filas: List[dict], usuario_id: int) -> dict:
+    """
+    Inserta muchos siniestros en una sola transacción, registrados a nombre
+    de usuario_id (el usuario autenticado; se ignora el de cada fila).
+    
+    - Valida cada fila con SiniestroCreate y verifica las claves foráneas
+      con una consulta por tabla; las filas inválidas se informan y se omiten.
+    - Calcula dia_semana/es_fin_de_semana una vez por fecha distinta.
+    - Inserta en sentencias multi-fila de TAMANO_LOTE_BULK filas, cada una
+      en un SAVEPOINT; si la base rechaza el lote, se reintenta fila por fila
+      y solo las filas rechazadas se informan como error.
+    - Devuelve el id (o el error) de cada fila sin volver a leerlas.
+    """
+    resultados = [None] * len(filas)
+    validos = []
+    
+    for indice, fila in enumerate(filas):
+        if isinstance(fila, dict):
+            fila = {**fila, "usuario_id": usuario_id}
+        try:
+            validos.append((indice, SiniestroCreate.model_validate(fila)))
+        except ValidationError as e:
+            detalle = e.errors()[0]
+            campo = ".".join(str(c) for c in detalle.get("loc", ()))
+            resultados[indice] = {"indice": indice, "error": f"{campo}: {detalle.get('msg')}"}
+    
+    # Claves foráneas: una consulta por catálogo para todo el lote
+    avenidas = await _ids_existentes(db, "avenidas", {s.avenida_id for _, s in validos})
+    tipos = await _ids_existentes(db, "tipos_siniestro", {s.tipo_id for _, s in validos})
+    
+    insertables = []
+    for indice, siniestro in validos:
+        if siniestro.avenida_id not in avenidas:
+            error = f"avenida_id {siniestro.avenida_id} no existe"
+        elif siniestro.tipo_id not in tipos:
+            error = f"tipo_id {siniestro.tipo_id} no existe"
+        else:
+            insertables.append((indice, siniestro))
+            continue
+        resultados[indice] = {"indice": indice, "error": error}
+    
+    # Campos derivados de la fecha, calculados una vez por fecha distinta
+    derivados = {
+        fecha: (calcular_dia_semana(fecha), es_fin_de_semana(fecha))
+        for fecha in {s.fecha for _, s in insertables if s.fecha}
+    }
+    
+    totales_avenida = defaultdict(lambda: [0, 0, 0])
+    # (fecha, hora, avenida_id, tipo_id) -> [cantidad, fallecidos, heridos]
+    totales_franja = defaultdict(lambda: [0, 0, 0])
+    insertados = 0
+    
+    def registrar(indice: int, siniestro: SiniestroCreate, siniestro_id: int):
+        nonlocal insertados
+        insertados += 1
+        resultados[indice] = {"indice": indice, "id": siniestro_id}
+        for totales in (
+            totales_avenida[siniestro.avenida_id],
+            totales_franja[(
+                siniestro.fecha,
+                siniestro.hora.replace(minute=0, second=0, microsecond=0) if siniestro.hora else None,
+                siniestro.avenida_id,
+                siniestro.tipo_id
+            )]
+        ):
+            totales[0] += 1
+            totales[1] += siniestro.victimas_fatales or 0
+            totales[2] += siniestro.heridos or 0
     
-    siniestro_id = result.lastrowid
-    return await obtener_siniestro_por_id(db, siniestro_id)
+    try:
+        # Con varios primarios (Galera, replicación multi-origen) los ids
+        # de una sentencia avanzan de a auto_increment_increment
+        result = await db.execute(text("SELECT @@auto_increment_increment"))
+        incremento = int(result.scalar() or 1)
+        
+        for inicio in range(0, len(insertables), TAMANO_LOTE_BULK):
+            lote = insertables[inicio:inicio + TAMANO_LOTE_BULK]
+            try:
+                # SAVEPOINT: si la base rechaza una fila, se deshace solo el lote
+                async with db.begin_nested():
+                    result = await db.execute(*_insert_siniestros(lote, derivados))
+            except DBAPIError:
+                # Fila por fila, para informar cuáles se rechazan y guardar el resto
+                for indice, siniestro in lote:
+                    try:
+                        async with db.begin_nested():
+                            result = await db.execute(*_insert_siniestros([(indice, siniestro)], derivados))
+                    except DBAPIError as e:
+                        resultados[indice] = {"indice": indice, "error": _motivo_rechazo(e)}
+                        continue
+                    registrar(indice, siniestro, result.lastrowid)
+                continue
+            
+            # En un INSERT multi-fila, lastrowid es el id de la primera fila
+            # e InnoDB asigna el resto de la sentencia sin huecos, cada
+            # auto_increment_increment
+            primer_id = result.lastrowid
+            for n, (indice, siniestro) in enumerate(lote):
+                registrar(indice, siniestro, primer_id + n * incremento)
+        
+        for avenida_id, (cantidad, fallecidos, heridos) in totales_avenida.items():
+            await indice_seguridad.ajustar_siniestros(db, avenida_id, cantidad, fallecidos, heridos)
+        
+        franjas = [
+            resumen_temporal.franja(*clave, *totales)
+            for clave, totales in totales_franja.items()
+        ]
+        for inicio in range(0, len(franjas), TAMANO_LOTE_BULK):
+            await resumen_temporal.ajustar_franjas(db, franjas[inicio:inicio + TAMANO_LOTE_BULK])
+        
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    
+    if insertados:
+        cache_reportes.invalidar()
+    
+    return {
+        "insertados": insertados,
+        "errores": len(filas) - insertados,
+        "resultados": resultados
+    }
 
 
 async def obtener_siniestro_por_id(db: AsyncSession, siniestro_id: int) -> Optional[dict]:
     """
-    Obtiene siniestro por ID con INNER JOIN
-    Incluye nombre de avenida, tipo y usuario
+    Obtiene siniestro por ID con INNER JOIN a usuarios
+    Los nombres de avenida y tipo salen del catálogo en memoria
     """
     query = text("""
         SELECT 
@@ -115,12 +320,8 @@ async def obtener_siniestro_por_id(db: AsyncSession, siniestro_id: int) -> Optio
             s.num_vehiculos, s.dia_semana, s.es_fin_de_semana,
             s.usuario_id, s.observaciones, s.fecha_registro,
             s.ultima_modificacion,
-            a.nombre as avenida_nombre,
-            t.nombre as tipo_nombre,
             u.nombre as usuario_nombre
         FROM siniestros s
-        INNER JOIN avenidas a ON s.avenida_id = a.id
-        INNER JOIN tipos_siniestro t ON s.tipo_id = t.id
         INNER JOIN usuarios u ON s.usuario_id = u.id
         WHERE s.id = :id
     """)
@@ -131,7 +332,7 @@ async def obtener_siniestro_por_id(db: AsyncSession, siniestro_id: int) -> Optio
     if not siniestro:
         return None
     
-    return {
+    resultado = {
         "id": siniestro.id,
         "fecha": siniestro.fecha,
         "hora": siniestro.hora,
@@ -147,26 +348,35 @@ async def obtener_siniestro_por_id(db: AsyncSession, siniestro_id: int) -> Optio
         "observaciones": siniestro.observaciones,
         "fecha_registro": siniestro.fecha_registro,
         "ultima_modificacion": siniestro.ultima_modificacion,
-        "avenida_nombre": siniestro.avenida_nombre,
-        "tipo_nombre": siniestro.tipo_nombre,
         "usuario_nombre": siniestro.usuario_nombre
     }
+    (resultado,) = await catalogos.decorar_siniestros(db, [resultado])
+    return resultado
 
 
-async def obtener_todos_siniestros(
-    db: AsyncSession, 
-    skip: int = 0, 
-    limit: int = 100,
+# Columnas y JOIN comunes a los listados de siniestros
+# (avenida_nombre y tipo_nombre se completan con catalogos.decorar_siniestros)
+SQL_SELECT_SINIESTROS = """
+        SELECT 
+            s.id, s.fecha, s.hora, s.avenida_id, s.tipo_id,
+            s.nivel_gravedad, s.victimas_fatales, s.heridos,
+            s.num_vehiculos, s.dia_semana, s.es_fin_de_semana,
+            s.usuario_id, s.observaciones, s.fecha_registro,
+            s.ultima_modificacion,
+            u.nombre as usuario_nombre
+        FROM siniestros s
+        INNER JOIN usuarios u ON s.usuario_id = u.id
+"""
+
+
+def _filtros_siniestros(
     avenida_id: Optional[int] = None,
     tipo_id: Optional[int] = None,
     nivel_gravedad: Optional[str] = None
-) -> List[dict]:
-    """
-    Obtiene lista de siniestros con filtros opcionales
-    Usa INNER JOIN para traer información completa
-    """
+) -> Tuple[List[str], dict]:
+    """Condiciones WHERE y valores para los filtros opcionales de los listados"""
     where_clauses = []
-    valores = {"skip": skip, "limit": limit}
+    valores = {}
     
     if avenida_id:
         where_clauses.append("s.avenida_id = :avenida_id")
@@ -180,33 +390,54 @@ async def obtener_todos_siniestros(
         where_clauses.append("s.nivel_gravedad = :nivel_gravedad")
         valores["nivel_gravedad"] = nivel_gravedad
     
+    return where_clauses, valores
+
+
+async def obtener_todos_siniestros(
+    db: AsyncSession, 
+    skip: int = 0, 
+    limit: int = 100,
+    avenida_id: Optional[int] = None,
+    tipo_id: Optional[int] = None,
+    nivel_gravedad: Optional[str] = None,
+    despues_de: Optional[list] = None
+) -> List[dict]:
+    """
+    Obtiene lista de siniestros con filtros opcionales
+    Solo une usuarios; avenida y tipo se completan desde el catálogo en memoria
+    
+    Si se pasa despues_de ([fecha, hora, id] de la última fila de la página
+    anterior) pagina por keyset sobre idx_siniestros_fecha_hora_id e ignora skip.
+    """
+    where_clauses = []
+    valores = {"skip": skip, "limit": limit}
+    
+    if despues_de is not None:
+        where_clauses.append(condicion_keyset(
+            ["s.fecha", "s.hora", "s.id"], valores=despues_de, nulables=("s.fecha", "s.hora")
+        ))
+        valores.update(parametros_keyset(despues_de))
+        valores["skip"] = 0
+    
+    filtros, valores_filtros = _filtros_siniestros(avenida_id, tipo_id, nivel_gravedad)
+    where_clauses.extend(filtros)
+    valores.update(valores_filtros)
+    
     where_sql = ""
     if where_clauses:
         where_sql = "WHERE " + " AND ".join(where_clauses)
     
     query = text(f"""
-        SELECT 
-            s.id, s.fecha, s.hora, s.avenida_id, s.tipo_id,
-            s.nivel_gravedad, s.victimas_fatales, s.heridos,
-            s.num_vehiculos, s.dia_semana, s.es_fin_de_semana,
-            s.usuario_id, s.observaciones, s.fecha_registro,
-            s.ultima_modificacion,
-            a.nombre as avenida_nombre,
-            t.nombre as tipo_nombre,
-            u.nombre as usuario_nombre
-        FROM siniestros s
-        INNER JOIN avenidas a ON s.avenida_id = a.id
-        INNER JOIN tipos_siniestro t ON s.tipo_id = t.id
-        INNER JOIN usuarios u ON s.usuario_id = u.id
+        {SQL_SELECT_SINIESTROS}
         {where_sql}
-        ORDER BY s.fecha DESC, s.hora DESC
+        ORDER BY s.fecha DESC, s.hora DESC, s.id DESC
         LIMIT :limit OFFSET :skip
     """)
     
     result = await db.execute(query, valores)
     siniestros = result.fetchall()
     
-    return [
+    filas = [
         {
             "id": s.id,
             "fecha": s.fecha,
@@ -223,12 +454,42 @@ async def obtener_todos_siniestros(
             "observaciones": s.observaciones,
             "fecha_registro": s.fecha_registro,
             "ultima_modificacion": s.ultima_modificacion,
-            "avenida_nombre": s.avenida_nombre,
-            "tipo_nombre": s.tipo_nombre,
             "usuario_nombre": s.usuario_nombre
         }
         for s in siniestros
     ]
+    return await catalogos.decorar_siniestros(db, filas)
+
+
+async def iterar_siniestros(
+    db: AsyncSession,
+    avenida_id: Optional[int] = None,
+    tipo_id: Optional[int] = None,
+    nivel_gravedad: Optional[str] = None,
+    tamano_lote: int = 1000
+) -> AsyncIterator[List[dict]]:
+    """
+    Recorre todos los siniestros que cumplen los filtros, en lotes.
+    Usa un cursor del lado del servidor (stream_results/yield_per), por lo que
+    la memoria no depende de la cantidad de filas.
+    """
+    where_clauses, valores = _filtros_siniestros(avenida_id, tipo_id, nivel_gravedad)
+    
+    where_sql = ""
+    if where_clauses:
+        where_sql = "WHERE " + " AND ".join(where_clauses)
+    
+    query = text(f"""
+        {SQL_SELECT_SINIESTROS}
+        {where_sql}
+        ORDER BY s.fecha DESC, s.hora DESC, s.id DESC
+    """)
+    
+    # Con el cursor abierto no se puede usar la conexión: el catálogo se carga antes
+    await catalogos.asegurar_cargado(db)
+    result = await db.stream(query, valores, execution_options={"yield_per": tamano_lote})
+    async for lote in result.mappings().partitions():
+        yield await catalogos.decorar_siniestros(db, [dict(fila) for fila in lote], recargar=False)
 
 
 async def actualizar_siniestro(db: AsyncSession, siniestro_id: int, siniestro_update: SiniestroUpdate) -> Optional[dict]:
@@ -290,6 +551,26 @@ async def actualizar_siniestro(db: AsyncSession, siniestro_id: int, siniestro_up
     if not campos_actualizar:
         return await obtener_siniestro_por_id(db, siniestro_id)
     
+    # Fila previa: ajusta el índice de seguridad y arma la respuesta
+    # (MySQL no tiene RETURNING, así que se lee antes de modificarla)
+    query_anterior = text("""
+        SELECT 
+            id, fecha, hora, avenida_id, tipo_id,
+            nivel_gravedad, victimas_fatales, heridos,
+            num_vehiculos, dia_semana, es_fin_de_semana,
+            usuario_id, observaciones, fecha_registro,
+            ultima_modificacion
+        FROM siniestros
+        WHERE id = :id
+        FOR UPDATE
+    """)
+    result = await db.execute(query_anterior, {"id": siniestro_id})
+    anterior = result.fetchone()
+    
+    if not anterior:
+        await db.rollback()
+        return None
+    
     query = text(f"""
         UPDATE siniestros
         SET {', '.join(campos_actualizar)}
@@ -297,9 +578,42 @@ async def actualizar_siniestro(db: AsyncSession, siniestro_id: int, siniestro_up
     """)
     
     await db.execute(query, valores)
-    await db.commit()
     
-    return await obtener_siniestro_por_id(db, siniestro_id)
+    await indice_seguridad.ajustar_siniestros(
+        db, anterior.avenida_id, -1, -(anterior.victimas_fatales or 0), -(anterior.heridos or 0)
+    )
+    await indice_seguridad.ajustar_siniestros(
+        db,
+        valores.get("avenida_id", anterior.avenida_id),
+        1,
+        valores.get("victimas_fatales", anterior.victimas_fatales),
+        valores.get("heridos", anterior.heridos)
+    )
+    await resumen_temporal.ajustar_franjas(db, [
+        resumen_temporal.franja(
+            anterior.fecha, anterior.hora, anterior.avenida_id, anterior.tipo_id,
+            -1, -(anterior.victimas_fatales or 0), -(anterior.heridos or 0)
+        ),
+        resumen_temporal.franja(
+            valores.get("fecha", anterior.fecha),
+            valores.get("hora", anterior.hora),
+            valores.get("avenida_id", anterior.avenida_id),
+            valores.get("tipo_id", anterior.tipo_id),
+            1,
+            valores.get("victimas_fatales", anterior.victimas_fatales),
+            valores.get("heridos", anterior.heridos)
+        ),
+    ])
+    await db.commit()
+    cache_reportes.invalidar()
+    
+    siniestro = respuesta_actualizada(
+        dict(anterior._mapping), cambios_de(valores), ultima_modificacion=ahora()
+    )
+    siniestro.update(await catalogos.nombres_siniestro(
+        db, siniestro["avenida_id"], siniestro["tipo_id"], siniestro["usuario_id"]
+    ))
+    return siniestro
 
 
 async def eliminar_siniestro(db: AsyncSession, siniestro_id: int, usuario_id: int, es_admin: bool = False) -> bool:
@@ -313,7 +627,8 @@ async def eliminar_siniestro(db: AsyncSession, siniestro_id: int, usuario_id: in
     try:
         # Primero verificar si el siniestro existe y obtener el usuario que lo creó
         query_verificar = text("""
-            SELECT usuario_id FROM siniestros WHERE id = :siniestro_id
+            SELECT usuario_id, fecha, hora, avenida_id, tipo_id, victimas_fatales, heridos
+            FROM siniestros WHERE id = :siniestro_id
         """)
         result = await db.execute(query_verificar, {"siniestro_id": siniestro_id})
         siniestro = result.fetchone()
@@ -328,7 +643,15 @@ async def eliminar_siniestro(db: AsyncSession, siniestro_id: int, usuario_id: in
         # Eliminar el siniestro
         query_eliminar = text("DELETE FROM siniestros WHERE id = :siniestro_id")
         await db.execute(query_eliminar, {"siniestro_id": siniestro_id})
+        await indice_seguridad.ajustar_siniestros(
+            db, siniestro.avenida_id, -1, -(siniestro.victimas_fatales or 0), -(siniestro.heridos or 0)
+        )
+        await resumen_temporal.ajustar_franjas(db, [resumen_temporal.franja(
+            siniestro.fecha, siniestro.hora, siniestro.avenida_id, siniestro.tipo_id,
+            -1, -(siniestro.victimas_fatales or 0), -(siniestro.heridos or 0)
+        )])
         await db.commit()
+        cache_reportes.invalidar()
         
         return True
 
@@ -6,6 +6,9 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from schemas.tipo_siniestro import TipoSiniestroCreate, TipoSiniestroUpdate
+from services.cache import cache_reportes
+from services import catalogos
+from services.respuestas import respuesta_creada, respuesta_actualizada, cambios_de
 
 async def crear_tipo_siniestro(db: AsyncSession, tipo: TipoSiniestroCreate) -> dict:
     """Crea un nuevo tipo de siniestro"""
@@ -22,9 +25,11 @@ async def crear_tipo_siniestro(db: AsyncSession, tipo: TipoSiniestroCreate) -> d
     
     result = await db.execute(query, valores)
     await db.commit()
+    cache_reportes.invalidar()
     
-    tipo_id = result.lastrowid
-    return await obtener_tipo_siniestro_por_id(db, tipo_id)
+    nuevo = respuesta_creada(valores, "id", result.lastrowid)
+    catalogos.guardar_tipo(nuevo)
+    return nuevo
 
 async def obtener_tipo_siniestro_por_id(db: AsyncSession, tipo_id: int) -> Optional[dict]:
     """Obtiene tipo de siniestro por ID"""
@@ -48,28 +53,15 @@ async def obtener_tipo_siniestro_por_id(db: AsyncSession, tipo_id: int) -> Optio
     }
 
 async def obtener_todos_tipos_siniestro(db: AsyncSession) -> List[dict]:
-    """Obtiene todos los tipos de siniestro"""
-    query = text("""
-        SELECT id, nombre, gravedad, descripcion
-        FROM tipos_siniestro
-        ORDER BY gravedad DESC, nombre
-    """)
-    
-    result = await db.execute(query)
-    tipos = result.fetchall()
-    
-    return [
-        {
-            "id": t.id,
-            "nombre": t.nombre,
-            "gravedad": t.gravedad,
-            "descripcion": t.descripcion
-        }
-        for t in tipos
-    ]
+    """Obtiene todos los tipos de siniestro (desde el catálogo en memoria)"""
+    return await catalogos.listar_tipos(db)
 
 async def actualizar_tipo_siniestro(db: AsyncSession, tipo_id: int, tipo_update: TipoSiniestroUpdate) -> Optional[dict]:
     """Actualiza tipo de siniestro"""
+    actual = await catalogos.obtener_tipo(db, tipo_id) or await obtener_tipo_siniestro_por_id(db, tipo_id)
+    if actual is None:
+        return None
+    
     campos_actualizar = []
     valores = {"id": tipo_id}
     
@@ -86,7 +78,7 @@ async def actualizar_tipo_siniestro(db: AsyncSession, tipo_id: int, tipo_update:
         valores["descripcion"] = tipo_update.descripcion
     
     if not campos_actualizar:
-        return await obtener_tipo_siniestro_por_id(db, tipo_id)
+        return actual
     
     query = text(f"""
         UPDATE tipos_siniestro
@@ -96,8 +88,11 @@ async def actualizar_tipo_siniestro(db: AsyncSession, tipo_id: int, tipo_update:
     
     await db.execute(query, valores)
     await db.commit()
+    cache_reportes.invalidar()
     
-    return await obtener_tipo_siniestro_por_id(db, tipo_id)
+    tipo = respuesta_actualizada(actual, cambios_de(valores))
+    catalogos.guardar_tipo(tipo)
+    return tipo
 
 async def eliminar_tipo_siniestro(db: AsyncSession, tipo_id: int) -> bool:
     """Elimina tipo de siniestro"""
@@ -108,5 +103,7 @@ async def eliminar_tipo_siniestro(db: AsyncSession, tipo_id: int) -> bool:
     
     result = await db.execute(query, {"id": tipo_id})
     await db.commit()
+    cache_reportes.invalidar()
+    catalogos.quitar_tipo(tipo_id)
     
     return result.rowcount > 0
\ No newline at end of file
@@ -6,12 +6,14 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from schemas.usuario import UsuarioCreate, UsuarioUpdate
-from services.auth import hashear_password
+from services.auth import hashear_password_async
+from services.cache import cache_usuarios, cache_nombres_usuarios
+from services.respuestas import respuesta_creada, respuesta_actualizada, cambios_de
 from datetime import date
 
 async def crear_usuario(db: AsyncSession, usuario: UsuarioCreate) -> dict:
     """Crea un nuevo usuario"""
-    password_hash = hashear_password(usuario.password)
+    password_hash = await hashear_password_async(usuario.password)
     
     query = text("""
         INSERT INTO usuarios (email, password_hash, nombre, rol, fecha_registro, activo)
@@ -29,17 +31,21 @@ async def crear_usuario(db: AsyncSession, usuario: UsuarioCreate) -> dict:
     
     result = await db.execute(query, valores)
     await db.commit()
+    # Puede haber un resultado negativo cacheado para este email
+    cache_usuarios.invalidar()
     
-    # Obtener el usuario creado
-    usuario_id = result.lastrowid
-    return await obtener_usuario_por_id(db, usuario_id)
+    return respuesta_creada(
+        cambios_de(valores, excluir=("password_hash",)), "id", result.lastrowid,
+        ultimo_acceso=None
+    )
 
-async def obtener_usuario_por_id(db: AsyncSession, usuario_id: int) -> Optional[dict]:
-    """Obtiene usuario por ID"""
-    query = text("""
+async def obtener_usuario_por_id(db: AsyncSession, usuario_id: int, bloquear: bool = False) -> Optional[dict]:
+    """Obtiene usuario por ID (con bloquear, lo bloquea hasta el fin de la transacción)"""
+    query = text(f"""
         SELECT id, email, nombre, rol, fecha_registro, activo, ultimo_acceso
         FROM usuarios
         WHERE id = :id
+        {"FOR UPDATE" if bloquear else ""}
     """)
     
     result = await db.execute(query, {"id": usuario_id})
@@ -108,6 +114,12 @@ async def actualizar_usuario(db: AsyncSession, usuario_id: int, usuario_update:
     if not campos_actualizar:
         return await obtener_usuario_por_id(db, usuario_id)
     
+    # Sin RETURNING en MySQL: la fila se lee antes de modificarla, no después
+    actual = await obtener_usuario_por_id(db, usuario_id, bloquear=True)
+    if actual is None:
+        await db.rollback()
+        return None
+    
     query = text(f"""
         UPDATE usuarios
         SET {', '.join(campos_actualizar)}
@@ -116,8 +128,10 @@ async def actualizar_usuario(db: AsyncSession, usuario_id: int, usuario_update:
     
     await db.execute(query, valores)
     await db.commit()
+    cache_usuarios.invalidar()
+    cache_nombres_usuarios.invalidar()
     
-    return await obtener_usuario_por_id(db, usuario_id)
+    return respuesta_actualizada(actual, cambios_de(valores))
 
 async def eliminar_usuario(db: AsyncSession, usuario_id: int) -> bool:
     """Elimina usuario (soft delete - marca como inactivo)"""
@@ -129,5 +143,6 @@ async def eliminar_usuario(db: AsyncSession, usuario_id: int) -> bool:
     
     result = await db.execute(query, {"id": usuario_id})
     await db.commit()
+    cache_usuarios.invalidar()
     
     return result.rowcount > 0
\ No newline at end of file
@@ -2,10 +2,13 @@
 Servicio para gestión de vehículos involucrados
 """
 
-from sqlalchemy import text
+from collections import defaultdict
+from sqlalchemy import bindparam, text
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Dict, List, Optional
 from schemas.vehiculo import VehiculoCreate, VehiculoUpdate
+from services.cache import cache_reportes
+from services.respuestas import respuesta_creada, respuesta_actualizada, cambios_de
 
 async def crear_vehiculo(db: AsyncSession, vehiculo: VehiculoCreate) -> dict:
     """Crea un nuevo vehículo involucrado"""
@@ -28,16 +31,17 @@ async def crear_vehiculo(db: AsyncSession, vehiculo: VehiculoCreate) -> dict:
     
     result = await db.execute(query, valores)
     await db.commit()
+    cache_reportes.invalidar()
     
-    vehiculo_id = result.lastrowid
-    return await obtener_vehiculo_por_id(db, vehiculo_id)
+    return respuesta_creada(valores, "vehiculo_id", result.lastrowid)
 
-async def obtener_vehiculo_por_id(db: AsyncSession, vehiculo_id: int) -> Optional[dict]:
-    """Obtiene vehículo por ID"""
-    query = text("""
+async def obtener_vehiculo_por_id(db: AsyncSession, vehiculo_id: int, bloquear: bool = False) -> Optional[dict]:
+    """Obtiene vehículo por ID (con bloquear, lo bloquea hasta el fin de la transacción)"""
+    query = text(f"""
         SELECT vehiculo_id, siniestro_id, tipo_vehiculo, marca, modelo, rol, es_fallecido
         FROM vehiculos_involucrados
         WHERE vehiculo_id = :id
+        {"FOR UPDATE" if bloquear else ""}
     """)
     
     result = await db.execute(query, {"id": vehiculo_id})
@@ -81,6 +85,43 @@ async def obtener_vehiculos_por_siniestro(db: AsyncSession, siniestro_id: int) -
         for v in vehiculos
     ]
 
+async def obtener_vehiculos_por_siniestros(db: AsyncSession, siniestro_ids: List[int]) -> Dict[int, List[dict]]:
+    """
+    Vehículos de varios siniestros en una sola consulta, agrupados por siniestro_id.
+    Los siniestros sin vehículos no aparecen en el resultado.
+    """
+    if not siniestro_ids:
+        return {}
+    
+    query = text("""
+        SELECT vehiculo_id, siniestro_id, tipo_vehiculo, marca, modelo, rol, es_fallecido
+        FROM vehiculos_involucrados
+        WHERE siniestro_id IN :ids
+        ORDER BY siniestro_id, vehiculo_id
+    """).bindparams(bindparam("ids", expanding=True))
+    
+    result = await db.execute(query, {"ids": list(set(siniestro_ids))})
+    
+    por_siniestro = defaultdict(list)
+    for v in result.fetchall():
+        por_siniestro[v.siniestro_id].append({
+            "vehiculo_id": v.vehiculo_id,
+            "siniestro_id": v.siniestro_id,
+            "tipo_vehiculo": v.tipo_vehiculo,
+            "marca": v.marca,
+            "modelo": v.modelo,
+            "rol": v.rol,
+            "es_fallecido": bool(v.es_fallecido)
+        })
+    return por_siniestro
+
+async def anidar_vehiculos(db: AsyncSession, siniestros: List[dict]) -> List[dict]:
+    """Agrega "vehiculos" a cada siniestro, con una sola consulta para todos"""
+    por_siniestro = await obtener_vehiculos_por_siniestros(db, [s["id"] for s in siniestros])
+    for s in siniestros:
+        s["vehiculos"] = por_siniestro.get(s["id"], [])
+    return siniestros
+
 async def actualizar_vehiculo(db: AsyncSession, vehiculo_id: int, vehiculo_update: VehiculoUpdate) -> Optional[dict]:
     """Actualiza vehículo"""
     campos_actualizar = []
@@ -109,6 +150,12 @@ async def actualizar_vehiculo(db: AsyncSession, vehiculo_id: int, vehiculo_updat
     if not campos_actualizar:
         return await obtener_vehiculo_por_id(db, vehiculo_id)
     
+    # Sin RETURNING en MySQL: la fila se lee antes de modificarla, no después
+    actual = await obtener_vehiculo_por_id(db, vehiculo_id, bloquear=True)
+    if actual is None:
+        await db.rollback()
+        return None
+    
     query = text(f"""
         UPDATE vehiculos_involucrados
         SET {', '.join(campos_actualizar)}
@@ -117,8 +164,9 @@ async def actualizar_vehiculo(db: AsyncSession, vehiculo_id: int, vehiculo_updat
     
     await db.execute(query, valores)
     await db.commit()
+    cache_reportes.invalidar()
     
-    return await obtener_vehiculo_por_id(db, vehiculo_id)
+    return respuesta_actualizada(actual, cambios_de(valores))
 
 async def eliminar_vehiculo(db: AsyncSession, vehiculo_id: int) -> bool:
     """Elimina vehículo"""
@@ -129,5 +177,6 @@ async def eliminar_vehiculo(db: AsyncSession, vehiculo_id: int) -> bool:
     
     result = await db.execute(query, {"id": vehiculo_id})
     await db.commit()
+    cache_reportes.invalidar()
     
     return result.rowcount > 0
\ No newline at end of file
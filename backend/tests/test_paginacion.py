@@ -0,0 +1,117 @@
+"""
+Paginación por keyset (services/paginacion.py)
+La condición se ejecuta sobre SQLite, que igual que MySQL deja los NULL al
+final en orden descendente.
+"""
+
+import sqlite3
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from services.paginacion import (
+    codificar_cursor, condicion_keyset, decodificar_cursor, parametros_keyset
+)
+
+COLUMNAS = ["s.fecha", "s.hora", "s.id"]
+NULABLES = ("s.fecha", "s.hora")
+
+FILAS = [
+    (1, "2024-03-01", "10:00"),
+    (2, "2024-03-01", None),
+    (3, None, "08:00"),
+    (4, "2024-03-02", "09:00"),
+    (5, None, None),
+    (6, None, "08:00"),
+    (7, "2024-03-01", "10:00"),
+    (8, None, None),
+    (9, "2024-03-01", None),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE siniestros (id INTEGER PRIMARY KEY, fecha TEXT, hora TEXT)")
+    conn.executemany("INSERT INTO siniestros (id, fecha, hora) VALUES (?, ?, ?)", FILAS)
+    yield conn
+    conn.close()
+
+
+def _pagina(conn, limite, despues_de=None):
+    where, valores = "", {"limit": limite}
+    if despues_de is not None:
+        where = "WHERE " + condicion_keyset(COLUMNAS, valores=despues_de, nulables=NULABLES)
+        valores.update(parametros_keyset(despues_de))
+    return conn.execute(f"""
+        SELECT s.fecha, s.hora, s.id FROM siniestros s
+        {where}
+        ORDER BY s.fecha DESC, s.hora DESC, s.id DESC
+        LIMIT :limit
+    """, valores).fetchall()
+
+
+def _recorrer(conn, limite):
+    """Ids de todas las páginas, pasando el cursor codificado como el router"""
+    ids, cursor = [], None
+    while True:
+        despues_de = decodificar_cursor(cursor, 3) if cursor else None
+        filas = _pagina(conn, limite + 1, despues_de)
+        ids.extend(f[2] for f in filas[:limite])
+        if len(filas) <= limite:
+            return ids
+        cursor = codificar_cursor(filas[limite - 1])
+
+
+@pytest.mark.parametrize("limite", [1, 2, 3, 4, 20])
+def test_recorre_todas_las_filas_con_nulos(conn, limite):
+    esperado = [f[2] for f in _pagina(conn, 100)]
+    assert _recorrer(conn, limite) == esperado
+    assert sorted(esperado) == [f[0] for f in FILAS]
+
+
+def test_pagina_que_termina_en_fecha_nula(conn):
+    # Orden completo: 4, 7, 1, 9, 2, 6, 3, 8, 5
+    ultima = (None, "08:00", 6)
+    assert [f[2] for f in _pagina(conn, 3, list(ultima))] == [3, 8, 5]
+
+
+def test_pagina_que_termina_en_fecha_y_hora_nulas(conn):
+    assert [f[2] for f in _pagina(conn, 10, [None, None, 8])] == [5]
+
+
+def test_sin_nulables_conserva_la_condicion_original():
+    assert condicion_keyset(["a", "b"]) == "((a < :cursor0) OR (a = :cursor0 AND b < :cursor1))"
+
+
+@pytest.mark.parametrize("valores", [
+    [timedelta(hours=10, minutes=30), date(2024, 3, 1), 7],
+    [datetime(2024, 3, 1, 10, 30, 15), None, 12],
+    [time(8, 0), "texto", 1.5],
+    [None, None, 8],
+])
+def test_cursor_ida_y_vuelta(valores):
+    cursor = codificar_cursor(valores)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor, len(valores)) == valores
+
+
+def test_cursor_conserva_tipos():
+    td, dt = decodificar_cursor(codificar_cursor([timedelta(seconds=36000), datetime(2024, 3, 1, 9)]), 2)
+    assert isinstance(td, timedelta) and td == timedelta(hours=10)
+    assert isinstance(dt, datetime) and dt == datetime(2024, 3, 1, 9)
+
+
+def test_cursor_vacio_es_la_primera_pagina():
+    assert decodificar_cursor("", 3) is None
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "e30", "W1s", "W3sidGQiOiJ4eCJ9LDEsMl0"])
+def test_cursor_malformado(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor, 3)
+
+
+def test_cursor_con_otra_cantidad_de_valores():
+    with pytest.raises(ValueError):
+        decodificar_cursor(codificar_cursor([1, 2]), 3)
@@ -0,0 +1,89 @@
+"""
+Red vial en memoria (services/red_vial.py): nodo más cercano por anillos de
+celdas y A* sobre un grafo armado a mano
+"""
+
+import pytest
+
+from services.grilla_espacial import celda, distancia_m
+from services.red_vial import ANILLOS_MAXIMOS, ESCALA_PELIGRO, RedVial
+
+# Centro de una celda (celdas de 0.01°)
+LAT, LON = -12.0, -77.0
+
+
+def _tramo(red, indices, origen, destino, avenida_id, doble_mano=True):
+    """Agrega un tramo como cargar_red_vial"""
+    a = red.nodo(*origen, indices)
+    b = red.nodo(*destino, indices)
+    tramo = len(red.tramos)
+    red.tramos.append((tramo + 1, avenida_id, distancia_m(*origen, *destino)))
+    red.adyacencia[a].append((b, tramo))
+    if doble_mano:
+        red.adyacencia[b].append((a, tramo))
+    return a, b
+
+
+def test_nodo_cercano_en_anillo_exterior():
+    red, indices = RedVial(), {}
+    # Esquina del anillo 1 (≈ 2.2 km) y nodo en línea recta en el anillo 2 (≈ 1.7 km)
+    esquina = red.nodo(LAT - 0.0145, LON - 0.0145, indices)
+    exterior = red.nodo(LAT, LON - 0.016, indices)
+    assert celda(LAT - 0.0145) == celda(LAT) - 1
+    assert celda(LON - 0.016) == celda(LON) - 2
+
+    nodo, distancia = red.nodo_cercano(LAT, LON)
+    assert nodo == exterior
+    assert distancia == pytest.approx(distancia_m(LAT, LON, LAT, LON - 0.016))
+    assert distancia < distancia_m(LAT, LON, *red.nodos[esquina])
+
+
+def test_nodo_cercano_en_la_misma_celda():
+    red, indices = RedVial(), {}
+    cerca = red.nodo(LAT + 0.002, LON, indices)
+    red.nodo(LAT + 0.012, LON, indices)
+    assert red.nodo_cercano(LAT, LON)[0] == cerca
+
+
+def test_nodo_cercano_fuera_de_la_red():
+    red, indices = RedVial(), {}
+    red.nodo(LAT + 0.01 * (ANILLOS_MAXIMOS + 2), LON, indices)
+    assert red.nodo_cercano(LAT, LON) is None
+
+
+@pytest.fixture
+def red_con_desvio():
+    """
+    Directo de origen a destino por la avenida 1 (peligrosa) o desvío un 17 %
+    más largo por la avenida 2 (segura)
+    """
+    red, indices = RedVial(), {}
+    origen, destino, medio = (LAT, LON), (LAT, LON + 0.01), (LAT + 0.003, LON + 0.005)
+    _tramo(red, indices, origen, destino, avenida_id=1)
+    _tramo(red, indices, origen, medio, avenida_id=2)
+    _tramo(red, indices, medio, destino, avenida_id=2)
+    red.peligro = {1: ESCALA_PELIGRO, 2: 0.0}
+    return red, indices[origen], indices[destino], indices[medio]
+
+
+def test_buscar_sin_peso_peligro_toma_la_ruta_mas_corta(red_con_desvio):
+    red, origen, destino, _ = red_con_desvio
+    costo, camino, _ = red.buscar(origen, destino, peso_peligro=0)
+    assert camino == [(origen, None), (destino, 0)]
+    assert costo == pytest.approx(red.tramos[0][2])
+
+
+def test_buscar_con_peso_peligro_evita_la_avenida_peligrosa(red_con_desvio):
+    red, origen, destino, medio = red_con_desvio
+    costo, camino, _ = red.buscar(origen, destino, peso_peligro=1)
+    assert camino == [(origen, None), (medio, 1), (destino, 2)]
+    # La avenida 2 no tiene peligro: el costo es la longitud del desvío
+    assert costo == pytest.approx(red.tramos[1][2] + red.tramos[2][2])
+    assert costo < 2 * red.tramos[0][2]
+
+
+def test_buscar_respeta_el_sentido_de_los_tramos():
+    red, indices = RedVial(), {}
+    a, b = _tramo(red, indices, (LAT, LON), (LAT, LON + 0.01), avenida_id=1, doble_mano=False)
+    assert red.buscar(a, b, peso_peligro=0) is not None
+    assert red.buscar(b, a, peso_peligro=0) is None
@@ -129,19 +129,23 @@ export const tiposSiniestroService = {
 // ========================================
 export const siniestrosService = {
   getAll: async (params = {}) => {
-    const { skip = 0, limit = 100, avenida_id, tipo_id, nivel_gravedad } = params;
+    const { skip = 0, limit = 100, avenida_id, tipo_id, nivel_gravedad, include } = params;
     let url = `/siniestros?skip=${skip}&limit=${limit}`;
 
     if (avenida_id) url += `&avenida_id=${avenida_id}`;
     if (tipo_id) url += `&tipo_id=${tipo_id}`;
     if (nivel_gravedad) url += `&nivel_gravedad=${nivel_gravedad}`;
+    // include: 'vehiculos' trae los vehículos de cada siniestro en la misma respuesta
+    if (include) url += `&include=${include}`;
 
     const response = await api.get(url);
     return response.data;
   },
 
-  getById: async (id) => {
-    const response = await api.get(`/siniestros/${id}`);
+  getById: async (id, { include } = {}) => {
+    let url = `/siniestros/${id}`;
+    if (include) url += `?include=${include}`;
+    const response = await api.get(url);
     return response.data;
   },
 
@@ -286,6 +290,24 @@ export const getReportesDelito = async (skip = 0, limit = 100, tipo_delito = nul
   return api.get(`/reportes-delito?${params.toString()}`);
 };
 
+// Reportes a no más de radiusM metros de (lat, lon), del más cercano al más lejano
+export const getReportesDelitoCercanos = async (lat, lon, radiusM, tipo_delito = null) => {
+  const params = new URLSearchParams({ lat, lon, radius_m: radiusM });
+  if (tipo_delito) {
+    params.append('tipo_delito', tipo_delito);
+  }
+  return api.get(`/reportes-delito/near?${params.toString()}`);
+};
+
+// Reportes dentro del área visible del mapa: [minLon, minLat, maxLon, maxLat]
+export const getReportesDelitoEnArea = async (bbox, tipo_delito = null) => {
+  const params = new URLSearchParams({ bbox: bbox.join(',') });
+  if (tipo_delito) {
+    params.append('tipo_delito', tipo_delito);
+  }
+  return api.get(`/reportes-delito/bbox?${params.toString()}`);
+};
+
 export const getReporteDelitoPorId = async (id) => {
   return api.get(`/reportes-delito/${id}`);
 };
@@ -317,8 +339,9 @@ export default {
   vehiculosService,
   reportesService,
 };
-export const getIndiceSeguridadAvenidas = async () => {
-  return api.get('/reportes/analisis/indice-seguridad');
+// params opcionales: { desde, hasta, vida_media_dias } (fechas YYYY-MM-DD)
+export const getIndiceSeguridadAvenidas = async (params = {}) => {
+  return api.get('/reportes/analisis/indice-seguridad', { params });
 };
 
 export const getRutasMasSeguras = async (limit = 5) => {
@@ -328,3 +351,19 @@ export const getRutasMasSeguras = async (limit = 5) => {
 export const getZonasMasPeligrosas = async (limit = 5) => {
   return api.get(`/reportes/analisis/zonas-peligrosas?limit=${limit}`);
 };
+
+// Ruta más segura entre dos coordenadas (pesoPeligro: 0 = la más corta)
+export const getRutaSegura = async (origen, destino, pesoPeligro = 1) => {
+  return api.post('/reportes/analisis/ruta', {
+    origen_lat: origen.lat,
+    origen_lon: origen.lon,
+    destino_lat: destino.lat,
+    destino_lon: destino.lon,
+    peso_peligro: pesoPeligro,
+  });
+};
+
+// Celdas del mapa de calor de delitos para un tile z/x/y (Web Mercator)
+export const getHeatmapTile = async (z, x, y) => {
+  return api.get(`/reportes/heatmap/${z}/${x}/${y}`);
+};